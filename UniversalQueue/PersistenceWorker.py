@@ -0,0 +1,80 @@
+""" This module implements the PersistenceWorker class, a background thread that writes the queue to disk """
+import logging
+import threading
+
+#seconds a burst of changes is given to land before they are written out together
+COALESCE_WINDOW = 0.25
+
+
+class PersistenceWorker:
+    """
+    Moves the disk writes of the Universal Queue off the request threads.
+
+    The queue marks the worker dirty after every change. The worker then waits a
+    short window so that a burst of changes is written out by a single call to
+    persist, instead of one write per request.
+    """
+
+    def __init__(self, persist, window=COALESCE_WINDOW):
+        """
+        creates a PersistenceWorker object and starts its thread
+
+        @param persist: function that writes the current state of the queue to disk
+        @param window: seconds to wait after the first change before writing
+
+        @attribute dirty: set when there are changes that have not been written yet
+        """
+        self.persist = persist
+        self.window = window
+
+        self.dirty = threading.Event()
+        self.stopping = threading.Event()
+
+        #only one write at a time, whether from the thread or a flush on shutdown
+        self.write_lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self.run, name="PersistenceWorker", daemon=True)
+        self.thread.start()
+
+    def mark_dirty(self):
+        """
+        tells the worker the queue has changed. Returns straight away.
+        """
+        self.dirty.set()
+
+    def run(self):
+        """
+        the worker thread: sleeps until the queue changes, lets the burst land, then writes
+        """
+        while not self.stopping.is_set():
+            self.dirty.wait()
+            #returns early on shutdown so stop() doesn't wait out the window
+            self.stopping.wait(self.window)
+            self.flush()
+
+    def flush(self):
+        """
+        writes any pending changes now, on the calling thread
+        """
+        with self.write_lock:
+            if not self.dirty.is_set():
+                return
+            #cleared before writing so a change made during the write triggers another one
+            self.dirty.clear()
+            try:
+                self.persist()
+            except Exception as e:
+                logging.error("An error occurred while writing the queue: %s", str(e))
+                self.dirty.set()
+                #don't spin on a persistent error such as a full disk
+                self.stopping.wait(self.window)
+
+    def stop(self):
+        """
+        flush-on-shutdown hook: stops the thread and writes whatever is still pending,
+        so every change the server acknowledged ends up on disk
+        """
+        self.stopping.set()
+        self.dirty.set()
+        self.thread.join()
+        self.flush()
@@ -0,0 +1,323 @@
+""" This module implements the PlaybackScheduler class, the thread that plays the Universal Queue """
+import logging
+import threading
+import time
+
+from TrackDeadline import TrackDeadline
+
+#seconds to wait before trying again when spotify can't be reached
+RETRY_DELAY = 2
+
+#weight of the newest play call in the moving average of how long spotify takes to start a song
+LATENCY_WEIGHT = 0.3
+
+#seconds after the device moved on to a pre-queued song before checking it really did
+VERIFY_DELAY = 1.0
+
+
+class PlaybackScheduler:
+    """
+    Owns the play/advance loop of the Universal Queue on a long lived thread, so
+    requests never wait on playback.
+
+    The thread sleeps until there is a song to play, plays the head of the queue,
+    and sleeps until the song ends, the host skips it, or playback is paused.
+    Inserts, removals and the pause controls only wake it up.
+
+    The end of a song is tracked by a TrackDeadline, corrected from spotify's
+    playback progress, and the next song is started early by the time spotify
+    takes to start one, so songs are neither cut off nor followed by a gap.
+
+    In pre-queue mode the next song is pushed into the device's own queue during the
+    last seconds of the current one, and the device moves on to it by itself. The
+    spotify API can't take a song back off the device queue, so when the host removes
+    the pre-queued song the scheduler plays through it and then plays the right song.
+    """
+
+    def __init__(self, queue, retry_delay=RETRY_DELAY, prequeue=False):
+        """
+        creates a PlaybackScheduler object and starts its thread
+
+        @param queue: the UniversalQueue to play. The scheduler reads its data, snapshot(),
+        spotify and position_ms, and calls advance() and record_pause() on it
+        @param retry_delay: seconds to wait before trying again when a spotify call fails
+        @param prequeue: when True the next song is started by the device from its own queue
+
+        @attribute playing: the song spotify was last told to play, None between songs
+        @attribute play_latency: moving average of the seconds a play call takes
+        @attribute prequeued: the song waiting in the device queue, None when there isn't one
+        """
+        self.queue = queue
+        self.retry_delay = retry_delay
+
+        self.condition = threading.Condition()
+        self.paused = False
+        self.stopping = False
+
+        #id of the song the host removed while it was at the head of the queue
+        self.skip_id = None
+
+        self.playing = None
+
+        self.play_latency = 0.0
+
+        self.prequeue = prequeue
+        self.prequeued = None
+
+        #the device moved on to the pre-queued song by itself when the last song ended
+        self.transitioned = False
+
+        #the current song was started by the device rather than by a play call
+        self.on_device = False
+
+        self.thread = threading.Thread(target=self.run, name="PlaybackScheduler", daemon=True)
+        self.thread.start()
+
+    def notify(self):
+        """
+        tells the scheduler the queue has changed. Returns straight away.
+        """
+        with self.condition:
+            self.condition.notify_all()
+
+    def skip(self, id):
+        """
+        ends the song at the head of the queue now, moving on to the next one
+
+        @param id: the id of the song being skipped, so a song that ends at the same
+        moment doesn't make the scheduler skip the one after it as well
+        """
+        with self.condition:
+            self.skip_id = id
+            self.condition.notify_all()
+
+    def pause(self):
+        """
+        stops the timer of the current song. Playback doesn't move on until resume()
+        """
+        with self.condition:
+            self.paused = True
+            self.condition.notify_all()
+
+    def resume(self):
+        """
+        restarts the timer of the current song, or starts the next one
+        """
+        with self.condition:
+            self.paused = False
+            self.condition.notify_all()
+
+    def stop(self):
+        """
+        ends the thread. Spotify is left playing whatever it is playing.
+        """
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+
+    def wait_until_idle(self, timeout=None):
+        """
+        blocks until every song in the queue has been played
+
+        @param timeout: the most seconds to wait, None to wait for as long as it takes
+        @return: True when the queue is empty
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: len(self.queue.data) == 0, timeout)
+
+    def run(self):
+        """
+        the scheduler thread: plays the head of the queue, waits for it to end, advances
+        """
+        while True:
+            song, reason = self.next_song()
+            if song is None:
+                return
+
+            if reason is None:
+                try:
+                    self.start(song)
+                except Exception as e:
+                    logging.error("An error occurred while starting playback: %s", str(e))
+                    with self.condition:
+                        self.condition.wait(self.retry_delay)
+                    continue
+                reason = self.wait(song)
+
+            if reason == "stop":
+                return
+            if reason == "pause":
+                self.record_pause()
+                continue
+            if reason == "restart":
+                continue
+
+            self.playing = None
+            self.transitioned = reason == "end" and self.prequeued is not None
+            self.queue.advance(song)
+            if self.prequeued is not None and len(self.queue.data) == 0:
+                self.drop_prequeued()
+            self.notify()
+
+    def next_song(self):
+        """
+        sleeps until there is a song to play and playback isn't paused
+
+        @return: a (song, reason) tuple. reason is "skip" when the host removed the head
+        while it wasn't playing (e.g. during a pause), None when the song should be played.
+        song is None when the scheduler is stopping.
+        """
+        with self.condition:
+            while True:
+                if self.stopping:
+                    return None, None
+                #peek() is safe without the queue lock, which is never taken while holding the condition
+                song = self.queue.data.peek()
+                if self.skip_id is not None and song is not None:
+                    skipped = song.id == self.skip_id
+                    self.skip_id = None
+                    if skipped:
+                        return song, "skip"
+                    continue
+                if not self.paused and song is not None:
+                    return song, None
+                self.condition.wait()
+
+    def record_pause(self):
+        """
+        saves how far into the song playback was paused, so it resumes from there.
+        Read from the local playback state, which stopped the clock when spotify was paused.
+        """
+        self.queue.record_pause(self.queue.spotify.state.progress_ms())
+
+    def start(self, song):
+        """
+        plays a song on spotify, unless it is the one that was paused part way through
+        or the device already moved on to it from its queue
+        """
+        if self.playing is not song:
+            queued, self.prequeued = self.prequeued, None
+            transitioned, self.transitioned = self.transitioned, False
+            self.on_device = queued is song
+
+            if queued is not None and not transitioned:
+                #moves the device on to the queued song, which takes it off the device queue
+                self.queue.spotify.skip()
+            if queued is not song:
+                started = time.monotonic()
+                self.queue.spotify.play(song.uri)
+                self.play_latency += LATENCY_WEIGHT * (time.monotonic() - started - self.play_latency)
+            else:
+                self.queue.spotify.state.played(song.uri, song.s_len)
+
+            #a song recovered part way through picks up where it was
+            if self.queue.position_ms > 0:
+                self.queue.spotify.seek(self.queue.position_ms)
+            self.playing = song
+
+    def queue_next(self, song):
+        """
+        pushes the song after this one into the device queue, so the device starts it with no gap
+        """
+        songs = self.queue.snapshot().songs
+        if len(songs) < 2 or songs[0] is not song:
+            return
+        upcoming = songs[1]
+        try:
+            self.queue.spotify.queue_next(upcoming.uri)
+        except Exception as e:
+            logging.warning("Could not queue the next song on the device, it will be played when this one ends: %s", str(e))
+            return
+        self.prequeued = upcoming
+
+    def drop_prequeued(self):
+        """
+        the host removed the pre-queued song and nothing follows it: plays through it,
+        which takes it off the device queue, and stops
+        """
+        try:
+            if not self.transitioned:
+                self.queue.spotify.skip()
+            self.queue.spotify.pause()
+        except Exception as e:
+            logging.error("An error occurred while clearing the device queue: %s", str(e))
+        self.prequeued = None
+        self.transitioned = False
+
+    def wait(self, song):
+        """
+        sleeps until it is time to start the next song, the host skips this one, or
+        playback is paused, checking spotify's progress along the way
+
+        @return: "end", "skip", "pause", "stop", or "restart" when the device didn't
+        move on to the pre-queued song and it has to be played
+        """
+        #the device starts a pre-queued song itself, right at the end of this one
+        lead = 0 if self.prequeue else self.play_latency
+        deadline = TrackDeadline(song.s_len, self.queue.position_ms, lead)
+        verify = self.on_device
+        while True:
+            timeout, final = deadline.next_check()
+            if verify:
+                timeout, final = min(timeout, VERIFY_DELAY), False
+            elif final and self.prequeue and self.prequeued is None:
+                self.queue_next(song)
+
+            reason = self.sleep(song, timeout)
+            if reason is not None:
+                return reason
+            if final:
+                return "end"
+            if not self.sample(song, deadline) and verify:
+                logging.warning("The device did not move on to %s from its queue, playing it", song.uri)
+                self.playing = None
+                return "restart"
+            verify = False
+
+    def sleep(self, song, timeout):
+        """
+        sleeps for timeout seconds unless the host skips the song, pauses, or the scheduler stops
+
+        @return: "skip", "pause" or "stop", None when the time is up
+        """
+        wake = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                if self.stopping:
+                    return "stop"
+                if self.skip_id is not None:
+                    skipped = self.skip_id == song.id
+                    self.skip_id = None
+                    if skipped:
+                        return "skip"
+                if self.paused:
+                    return "pause"
+                remaining = wake - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def sample(self, song, deadline):
+        """
+        corrects the deadline of the song from spotify's playback progress. Nothing
+        changes when spotify can't be reached or is playing something else. The
+        sample also reconciles the local playback state.
+
+        @return: False when spotify is playing a different song
+        """
+        requested = time.monotonic()
+        try:
+            info = self.queue.spotify.get_current_playback_info()
+        except Exception as e:
+            logging.warning("Could not check playback progress, keeping the timer: %s", str(e))
+            return True
+        #the progress was read somewhere during the call
+        measured_at = (requested + time.monotonic()) / 2
+
+        if info is None or info.item is None:
+            return True
+        if info.item.id != song.uri:
+            return False
+
+        deadline.correct(info.progress_ms, info.item.duration_ms, measured_at)
+        return True
@@ -0,0 +1,98 @@
+""" This module implements the QueueBroadcaster class which pushes queue changes to every connected website """
+import queue
+import threading
+
+#seconds between keep-alive comments so proxies and browsers don't drop an idle stream
+KEEPALIVE_TIME = 15
+
+
+class QueueBroadcaster:
+    """
+    A publish / subscribe channel for the state of the Universal Queue.
+
+    Every connected website gets its own subscriber mailbox. Only the most recent
+    state is ever kept in a mailbox, so a slow client skips straight to the newest
+    queue instead of replaying every change it missed.
+    """
+
+    def __init__(self):
+        """
+        creates a QueueBroadcaster object
+
+        @attribute subscribers: the set of mailboxes of the currently connected clients
+        @attribute latest: the last published payload, sent to new subscribers straight away
+        """
+        self.subscribers = set()
+        self.latest = None
+        self.lock = threading.Lock()
+
+    def subscribe(self, limit=None):
+        """
+        registers a new client
+
+        @param limit: the most subscribers there may be, no limit when None
+
+        @return: the client's mailbox, already holding the latest payload if there is one,
+        or None when there are limit subscribers already
+        """
+        mailbox = queue.Queue(maxsize=1)
+        with self.lock:
+            if limit is not None and len(self.subscribers) >= limit:
+                return None
+            if self.latest is not None:
+                mailbox.put_nowait(self.latest)
+            self.subscribers.add(mailbox)
+        return mailbox
+
+    def unsubscribe(self, mailbox):
+        """
+        stops sending updates to a client, called when its connection closes
+
+        @param mailbox: the mailbox returned by subscribe()
+        """
+        with self.lock:
+            self.subscribers.discard(mailbox)
+
+    def publish(self, payload):
+        """
+        sends a new queue state to every subscriber, replacing any state
+        they have not picked up yet
+
+        @param payload: the serialized queue (a json string), or a function returning it.
+        A function is called when a subscriber picks the payload up, so a burst of changes
+        is serialized once, and only if someone is listening
+        """
+        with self.lock:
+            self.latest = payload
+            for mailbox in self.subscribers:
+                try:
+                    mailbox.get_nowait()
+                except queue.Empty:
+                    pass
+                mailbox.put_nowait(payload)
+
+    def stream(self, keepalive=KEEPALIVE_TIME, mailbox=None):
+        """
+        generator of Server-Sent Events for one client. Yields the current queue
+        straight away and then again every time it changes.
+
+        @param keepalive: seconds without a change before a keep-alive comment is sent
+        @param mailbox: the client's mailbox, when it was already subscribed
+
+        @return: a generator of text/event-stream chunks
+        """
+        if mailbox is None:
+            mailbox = self.subscribe()
+        try:
+            while True:
+                try:
+                    payload = mailbox.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if callable(payload):
+                    payload = payload()
+                yield f"data: {payload}\n\n"
+        finally:
+            #runs when the client disconnects and the server closes the generator
+            self.unsubscribe(mailbox)
@@ -0,0 +1,74 @@
+""" This module implements the QueueChangelog class, a bounded history of changes to the Universal Queue """
+from collections import deque
+import threading
+
+#how many changes are remembered before clients have to fall back to a full snapshot
+CHANGELOG_SIZE = 256
+
+
+class QueueChangelog:
+    """
+    Remembers the most recent changes to the queue, each tagged with the queue
+    version it produced, so a website can catch up by applying only what it missed.
+
+    A change is a small jsonifiable dictionary, one of
+        {"op": "insert", "song": {...}}   a song was added to the back of the queue
+        {"op": "remove", "id": id}        the host removed a song that was not playing
+        {"op": "advance", "id": id}       the song at the head finished or was skipped
+    """
+
+    def __init__(self, size=CHANGELOG_SIZE):
+        """
+        creates a QueueChangelog object
+
+        @param size: the number of changes to keep, older ones are forgotten
+
+        @attribute entries: (version, change) tuples, oldest first
+        @attribute version: the version produced by the newest change
+        """
+        self.entries = deque(maxlen=size)
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def record(self, version, change):
+        """
+        adds a change to the log
+
+        @param version: the queue version after the change was applied
+        @param change: the change dictionary
+        """
+        with self.lock:
+            self.entries.append((version, change))
+            self.version = version
+
+    def clear(self, version):
+        """
+        forgets every change, used when the whole queue is replaced at once.
+        Clients at an earlier version will be sent a full snapshot.
+
+        @param version: the queue version after the replacement
+        """
+        with self.lock:
+            self.entries.clear()
+            self.version = version
+
+    def since(self, version):
+        """
+        returns the changes a client at a given version needs to be up to date
+
+        @param version: the last version the client has applied
+
+        @return: a (changes, version) tuple where changes is the ordered list of
+        change dictionaries (empty when the client is current), or None when the
+        log no longer reaches back that far or the version is unknown
+        """
+        with self.lock:
+            latest = self.version
+            if version == latest:
+                return [], latest
+            if version > latest or len(self.entries) == 0:
+                return None, latest
+            #the oldest remembered change has to follow directly on from the client's version
+            if self.entries[0][0] > version + 1:
+                return None, latest
+            return [change for v, change in self.entries if v > version], latest
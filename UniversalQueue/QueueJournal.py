@@ -0,0 +1,177 @@
+""" This module implements the QueueJournal class, an append-only log used to persist the Universal Queue """
+import json
+import os
+import threading
+
+#how many records are appended before the log is fsynced to disk
+FSYNC_BATCH = 16
+
+#how many records the log holds before it is compacted into a new snapshot
+COMPACT_EVERY = 1000
+
+
+class QueueJournal:
+    """
+    Persists the queue as a snapshot plus a log of the changes made since it was taken.
+
+    Every change to the queue appends one compact json line to the log, so the cost
+    of persisting a request does not depend on the length of the queue. Every
+    compact_every records the log is folded back into the snapshot, which is
+    replaced atomically (temp file + rename) so a crash never leaves a truncated file.
+
+    The snapshot is the persisted state of the queue,
+        {"version": ..., "idCount": ..., "position_ms": ..., "songs": [...]}
+    (a plain list of songs in files written before the rest was persisted).
+
+    Log records are json objects, one of
+        {"op": "insert", "song": {...}}           the song's persisted fields, including its id
+        {"op": "remove", "id": id}                a song was removed from the queue
+        {"op": "advance", "id": id}               the song at the head finished playing
+        {"op": "position"}                        a checkpoint, e.g. when playback is paused
+    Every record can also carry the queue "version" it produced and "position_ms",
+    how far into the head song playback had got when it was written.
+    """
+
+    def __init__(self, snapshot_file="Write.json", log_file="Write.log",
+                 fsync_every=FSYNC_BATCH, compact_every=COMPACT_EVERY):
+        """
+        creates a QueueJournal object and opens the log for appending
+
+        @param snapshot_file: json file holding the list of queued songs at the last compaction
+        @param log_file: file the change records are appended to
+        @param fsync_every: number of records between fsyncs of the log. When None append()
+        never fsyncs, and whoever owns the journal calls sync() (e.g. a persistence worker)
+        @param compact_every: number of records between compactions
+        """
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file
+        self.fsync_every = fsync_every
+        self.compact_every = compact_every
+
+        #records written since the last fsync and since the last compaction
+        self.unsynced = 0
+        self.logged = 0
+
+        #appends come from request threads while a persistence worker may sync or compact
+        self.lock = threading.RLock()
+
+        self.log = open(self.log_file, "a")
+
+    def append(self, record):
+        """
+        appends one change record to the log. The record is flushed to the
+        operating system straight away and fsynced once a batch is full, unless
+        syncing is left to the owner of the journal (fsync_every is None).
+
+        @param record: a change record as described above
+        """
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.log.write(line)
+            self.log.flush()
+
+            self.unsynced += 1
+            self.logged += 1
+            if self.fsync_every is not None and self.unsynced >= self.fsync_every:
+                self.sync()
+
+    def sync(self):
+        """
+        forces every record appended so far onto the disk
+        """
+        with self.lock:
+            if self.unsynced:
+                self.log.flush()
+                os.fsync(self.log.fileno())
+                self.unsynced = 0
+
+    def needs_compaction(self):
+        """
+        @return: True when enough records have been logged to be worth a new snapshot
+        """
+        return self.logged >= self.compact_every
+
+    def compact(self, state):
+        """
+        writes a new snapshot and empties the log
+
+        @param state: the persisted state of the queue, as described above, or a function
+        returning it. The function is called with the journal locked, so no record can be
+        appended between reading the state and emptying the log
+        """
+        with self.lock:
+            if callable(state):
+                state = state()
+            tmp_file = self.snapshot_file + ".tmp"
+            with open(tmp_file, "w") as json_file:
+                json.dump(state, json_file)
+                json_file.flush()
+                os.fsync(json_file.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+
+            #only start a new log once the snapshot that covers it is safely in place
+            self.log.close()
+            self.log = open(self.log_file, "w")
+            self.unsynced = 0
+            self.logged = 0
+
+    def replay(self):
+        """
+        rebuilds the queue from the snapshot and then every record in the log
+
+        @return: the persisted state of the queue, with the songs in queue order
+        """
+        state = {"version": 0, "idCount": 0, "position_ms": 0}
+        songs = {}
+        try:
+            with open(self.snapshot_file, "r") as json_file:
+                snapshot = json.load(json_file)
+            if isinstance(snapshot, list):
+                snapshot = {"songs": snapshot}
+            for key in state:
+                state[key] = snapshot.get(key, state[key])
+
+            for i, song in enumerate(snapshot["songs"]):
+                #snapshots written before ids were persisted are keyed by position instead
+                key = song.get("id")
+                if key is None:
+                    key = ("snapshot", i)
+                songs[key] = song
+        except FileNotFoundError:
+            pass
+
+        try:
+            with open(self.log_file, "r") as log_file:
+                for line in log_file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        #a crash mid-append can leave a partial last line, everything before it is good
+                        break
+
+                    if record["op"] == "insert":
+                        id = record["song"]["id"]
+                        songs[id] = record["song"]
+                        state["idCount"] = max(state["idCount"], id + 1)
+                    elif record["op"] == "advance":
+                        songs.pop(record["id"], None)
+                        state["position_ms"] = 0
+                    elif record["op"] == "remove":
+                        songs.pop(record["id"], None)
+
+                    state["version"] = record.get("version", state["version"])
+                    state["position_ms"] = record.get("position_ms", state["position_ms"])
+        except FileNotFoundError:
+            pass
+
+        #dictionaries keep insertion order, which is queue order
+        state["songs"] = list(songs.values())
+        return state
+
+    def close(self):
+        """
+        syncs and closes the log
+        """
+        with self.lock:
+            self.sync()
+            self.log.close()
@@ -0,0 +1,94 @@
+""" This module implements the QueueSnapshot class, an immutable, pre-serialized view of the Universal Queue """
+import json
+
+
+class QueueSnapshot:
+    """
+    The queue as it was at one version: its songs, the id counter and the json the
+    website queue displays, serialized once when the snapshot is built.
+
+    The queue hands its changes over as it makes them, and the first read after a
+    burst of changes builds the next snapshot from the last one with the changes
+    applied, see apply(). It is published by replacing a single reference. A snapshot
+    is never changed after it is published, so readers grab the current one and use
+    it without any lock, however long they hold it.
+
+    Songs that were already in the previous snapshot keep their serialized json, so
+    building the next snapshot only serializes the songs that are new.
+    """
+
+    __slots__ = ("version", "epoch", "idCount", "songs", "fragments", "json")
+
+    def __init__(self, version, epoch, idCount=0, songs=(), view=None, previous=None):
+        """
+        creates a QueueSnapshot object
+
+        @param version: the queue version the snapshot shows
+        @param epoch: the epoch of the server run, see UniversalQueue
+        @param idCount: the id counter of the queue
+        @param songs: the songs in queue order
+        @param view: function returning the jsonifiable dictionary the website displays for a song
+        @param previous: the snapshot before this one, whose serialized songs are reused
+
+        @attribute songs: tuple of the songs in queue order
+        @attribute fragments: dictionary from song id to a (song, json string) tuple
+        @attribute json: the json list of song views sent to the website
+        """
+        self.version = version
+        self.epoch = epoch
+        self.idCount = idCount
+        self.songs = tuple(songs)
+
+        reuse = previous.fragments if previous is not None else {}
+        fragments = {}
+        for song in self.songs:
+            fragment = reuse.get(song.id)
+            #the id may belong to a different song after a restore
+            if fragment is None or fragment[0] is not song:
+                fragment = (song, json.dumps(view(song)))
+            fragments[song.id] = fragment
+        self.fragments = fragments
+
+        #what json.dumps() of the list of views would give, without serializing it again
+        self.json = "[" + ", ".join(fragments[song.id][1] for song in self.songs) + "]"
+
+    def apply(self, changes):
+        """
+        replays changes made to the queue since this snapshot. Songs only ever join the
+        queue at the back, so the songs keyed on id in insertion order are the queue order
+
+        @param changes: list of ("insert", song), ("remove", id) or ("restore", songs) tuples,
+        in the order they were made
+        @return: the songs of the queue once the changes are made, in queue order
+        """
+        songs = {song.id: song for song in self.songs}
+        for op, value in changes:
+            if op == "insert":
+                songs[value.id] = value
+            elif op == "remove":
+                songs.pop(value, None)
+            else:
+                songs = {song.id: song for song in value}
+        return songs.values()
+
+    @property
+    def etag(self):
+        """
+        @return: the entity tag of the snapshot, unique across server runs
+        """
+        return f"{self.epoch}-{self.version}"
+
+    def peek(self):
+        """
+        @return: the song at the front of the queue, None when it is empty
+        """
+        return self.songs[0] if self.songs else None
+
+    def __len__(self):
+        return len(self.songs)
+
+    def __iter__(self):
+        return iter(self.songs)
+
+    def __repr__(self):
+        return f"QueueSnapshot(version={self.version}, songs={[song.id for song in self.songs]})"
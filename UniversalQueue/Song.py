@@ -62,6 +62,9 @@ class Song:
                 raise ValueError('status of json not acceptable')
 
         else:
+            # Loading the persisted song snippet into a Python dictionary
+            dict = json.loads(json_data)
+
             self.uri = dict.get('uri')   
             self.s_len = dict.get('s_len')
             self.name = dict.get('name')
@@ -71,6 +74,25 @@ class Song:
             self.id = None
 
 
+    @classmethod
+    def from_dict(cls, song_dict):
+        """
+        creates a song object straight from a persisted song dictionary, skipping the
+        json round trip of the recover flag. Used to bulk restore the queue after a crash.
+
+        @param song_dict: dictionary with the keys written by UniversalQueue.write(),
+        the id is kept when it was persisted
+        """
+        song = cls.__new__(cls)
+        song.uri = song_dict.get('uri')
+        song.s_len = song_dict.get('s_len')
+        song.name = song_dict.get('name')
+        song.album = song_dict.get('album')
+        song.artist = song_dict.get('artist')
+        song.image = song_dict.get('image')
+        song.id = song_dict.get('id')
+        return song
+
     def set_id(self, id):
         """
         setter for the songs unique id. Called when inserting a song into the universal queue
@@ -0,0 +1,175 @@
+""" This module implements the SongQueue class, the ordered container used by the Universal Queue """
+
+
+class _Node:
+    """
+    A single link in the SongQueue, holding one song and its neighbours
+    """
+
+    __slots__ = ("song", "prev", "next")
+
+    def __init__(self, song):
+        self.song = song
+        self.prev = None
+        self.next = None
+
+
+class SongQueue:
+    """
+    Stores songs in submission order as a doubly linked list, with a dictionary
+    from song id to its node so that songs can be found and removed without a scan.
+
+    append, popleft, remove and lookups by id are all O(1). Iterating the queue
+    yields songs from the head (currently playing) to the tail.
+    """
+
+    def __init__(self, songs=()):
+        """
+        creates a SongQueue object
+
+        @param songs: optional iterable of songs (with ids already set) to load in order
+
+        @attribute head: the node of the song at the front of the queue
+        @attribute tail: the node of the song at the back of the queue
+        @attribute index: dictionary mapping song ids to their nodes
+        """
+        self.head = None
+        self.tail = None
+        self.index = {}
+
+        for song in songs:
+            self.append(song)
+
+    def append(self, song):
+        """
+        adds a song to the back of the queue. O(1)
+
+        @param song: a song object with a unique id
+
+        throws a ValueError when a song with the same id is already queued
+        """
+        if song.id in self.index:
+            raise ValueError(f"id {song.id} is already in the queue")
+
+        node = _Node(song)
+        if self.tail is None:
+            self.head = node
+        else:
+            node.prev = self.tail
+            self.tail.next = node
+        self.tail = node
+        self.index[song.id] = node
+
+    def popleft(self):
+        """
+        removes and returns the song at the front of the queue. O(1)
+
+        throws an IndexError when the queue is empty
+        """
+        if self.head is None:
+            raise IndexError("pop from an empty SongQueue")
+
+        song = self.head.song
+        self._unlink(self.head)
+        return song
+
+    def remove(self, id):
+        """
+        removes and returns the song with the given id. O(1)
+
+        @param id: unique id of the song to remove
+
+        throws a ValueError when no song in the queue has that id
+        """
+        node = self.index.get(id)
+        if node is None:
+            raise ValueError(f"id {id} was not a song in the queue")
+
+        self._unlink(node)
+        return node.song
+
+    def get(self, id, default=None):
+        """
+        returns the song with the given id, or default when it is not queued. O(1)
+        """
+        node = self.index.get(id)
+        if node is None:
+            return default
+        return node.song
+
+    def peek(self):
+        """
+        returns the song at the front of the queue without removing it,
+        or None when the queue is empty. O(1)
+        """
+        # a single read of the head, so a popleft on another thread can't leave it None halfway
+        head = self.head
+        if head is None:
+            return None
+        return head.song
+
+    def clear(self):
+        """
+        removes every song from the queue
+        """
+        self.head = None
+        self.tail = None
+        self.index = {}
+
+    def _unlink(self, node):
+        """
+        detaches a node from its neighbours and from the id index
+        """
+        if node.prev is None:
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+
+        if node.next is None:
+            self.tail = node.prev
+        else:
+            node.next.prev = node.prev
+
+        node.prev = None
+        node.next = None
+        del self.index[node.song.id]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __bool__(self):
+        return self.head is not None
+
+    def __contains__(self, id):
+        return id in self.index
+
+    def __iter__(self):
+        node = self.head
+        while node is not None:
+            # grab the next link first so the current song can be removed mid-iteration
+            next_node = node.next
+            yield node.song
+            node = next_node
+
+    def __getitem__(self, position):
+        """
+        returns the song at a position in the queue. The head (0) and tail (-1) are O(1),
+        any other position walks the list.
+        """
+        if position == 0 and self.head is not None:
+            return self.head.song
+        if position == -1 and self.tail is not None:
+            return self.tail.song
+
+        length = len(self)
+        if position < 0:
+            position += length
+        if position < 0 or position >= length:
+            raise IndexError("SongQueue index out of range")
+
+        for i, song in enumerate(self):
+            if i == position:
+                return song
+
+    def __repr__(self):
+        return f"SongQueue({[song.id for song in self]})"
@@ -0,0 +1,198 @@
+""" This module implements the AsyncSpotifyInterface class, the non-blocking counterpart of Spotify_Interface_Class """
+import asyncio
+import logging
+import threading
+
+import tekore as tk
+
+from auth import get_user_token
+from batcher import AsyncTrackBatcher
+from cache import TTLCache
+from playback_checks import PlaybackChecks
+from playback_state import PlaybackState
+from player import get_first_available_device
+from search_cache import SearchCache
+from sender import AsyncPooledSender
+from single_flight import AsyncSingleFlight
+from spotify_interface_class import VERIFY_DELAY
+from tracks import NUM_ITEMS, TRACK_CACHE_SIZE, TrackLookups, search_key, url_results
+
+
+class AsyncSpotifyInterface(TrackLookups, PlaybackChecks):
+    """
+    Wraps a tekore object in asynchronous mode. Every call is awaited on the event
+    loop instead of holding a thread while spotify answers, so a single thread can
+    serve hundreds of searches at once. The caching and checking is shared with
+    Spotify_Interface_Class, only the methods that wait on spotify are coroutines here.
+    """
+
+    def __init__(self, token, device_id=None, sender=None, optimistic=True):
+        """
+        creates an asynchronous spotify tekore object
+
+        @param token: the user token, see auth.get_user_token()
+        @param device_id: the device id of the physical device running the external spotify session
+        @param sender: the tekore sender to send with, an AsyncPooledSender when None
+        @param optimistic: when True play, pause and unpause make a single call and assume it
+        worked, the device is checked in the background a moment later. When False pause and
+        unpause fetch the playback state straight away to confirm it, see Spotify_Interface_Class
+
+        @attribute spotify: The asynchronous spotify tekore object
+        @attribute sender: The keep-alive connection pool the spotify object sends through, with latency metrics
+        @attribute search_cache: SearchCache of return_data results keyed on the normalized query and limit,
+        which also answers a query from the results of one a few letters longer or shorter
+        @attribute search_flight: AsyncSingleFlight sharing one spotify search between identical queries in flight
+        @attribute track_cache: LRU cache of track metadata keyed on track id, filled by searches and lookups
+        @attribute track_batcher: groups track lookups that arrive together into one several-tracks call
+        @attribute state: the PlaybackState of the device, kept from our own commands and samples
+        """
+        self.sender = sender or AsyncPooledSender()
+        self.spotify = tk.Spotify(token, sender=self.sender)
+        self.device_id = device_id
+        self.search_cache = SearchCache()
+        self.search_flight = AsyncSingleFlight()
+        self.track_cache = TTLCache(TRACK_CACHE_SIZE)
+        self.track_batcher = AsyncTrackBatcher(self.spotify.tracks)
+
+        self.optimistic = optimistic
+        self.state = PlaybackState()
+
+        #bumped by every command, so a check that raced with a command doesn't undo it
+        self.commands = 0
+        self.pending_check = None
+        #only ever held between awaits, it is there for PlaybackChecks
+        self.verify_lock = threading.Lock()
+
+    @classmethod
+    async def create(cls):
+        """
+        logs in with creds.config and finds the playback device the same way Spotify_Interface_Class does
+
+        @return: the AsyncSpotifyInterface
+        """
+        token = await asyncio.to_thread(get_user_token)
+        device = await asyncio.to_thread(get_first_available_device, tk.Spotify(token))
+        return cls(token, device.id)
+
+    async def play(self, track_id):
+        """
+        plays a song on the spotify playback
+
+        @param track_id: The id of the song to be played
+        """
+        await self.spotify.playback_start_tracks(track_ids=[track_id], device_id=self.device_id)
+        self.state.played(track_id, self.track_length(track_id))
+        self.commanded()
+        return 0
+
+    async def pause(self):
+        """
+        pauses the spotify playback
+
+        @return: 0 when the playback is paused, 1 otherwise
+        """
+        await self.spotify.playback_pause()
+        self.state.paused()
+        self.commanded()
+        if self.optimistic:
+            return 0
+
+        return self.confirmed(await self.spotify.playback(), playing=False)
+
+    async def unpause(self):
+        """
+        unpauses the spotify playback
+
+        @return: 0 when the playback is playing, 1 otherwise
+        """
+        await self.spotify.playback_resume()
+        self.state.resumed()
+        self.commanded()
+        if self.optimistic:
+            return 0
+
+        return self.confirmed(await self.spotify.playback(), playing=True)
+
+    async def seek(self, position_ms):
+        """
+        moves the spotify playback to a position in the current song
+
+        @param position_ms: the position to seek to in milli seconds
+        """
+        await self.spotify.playback_seek(position_ms, device_id=self.device_id)
+        self.state.seeked(position_ms)
+        self.commanded()
+        return 0
+
+    def schedule_check(self):
+        """
+        starts the check after a burst of optimistic commands
+
+        @return: the task running the check
+        """
+        return asyncio.ensure_future(self.verify())
+
+    async def verify(self):
+        """
+        the lazy check behind optimistic commands: samples the device, which corrects
+        the playback state when the device didn't do what it was told
+        """
+        await asyncio.sleep(VERIFY_DELAY)
+        check = self.start_check()
+        try:
+            await self.get_current_playback_info()
+        except Exception as e:
+            logging.warning("Could not check the playback state: %s", str(e))
+            return
+        self.finish_check(check)
+
+    async def return_data(self, search_string, limit=NUM_ITEMS):
+        """
+        see TrackLookups.return_data()
+        """
+        key = search_key(search_string, limit)
+        data = self.search_cache.lookup(key)
+        if data is not None:
+            return data
+
+        return await self.search_flight.do(key, lambda: self.search(search_string, key))
+
+    async def search(self, search_string, key):
+        """
+        makes the spotify search for return_data()
+
+        @param key: the search_key() the results are cached under
+        """
+        tracks, = await self.spotify.search(query=search_string, types=('track',), limit=key[1])
+        return self.search_results(key, tracks.items)
+
+    async def get_track(self, track_id):
+        """
+        see TrackLookups.get_track()
+        """
+        json_data = self.track_cache.get(track_id)
+        if json_data is None:
+            json_data = self.cache_track(await self.track_batcher.get(track_id))
+        return json_data
+
+    async def from_url(self, url):
+        """
+        see TrackLookups.from_url()
+        """
+        return url_results(await self.get_track(tk.from_url(url)[1]))
+
+    async def get_current_playback_info(self):
+        """
+        fetches what the device is playing and reconciles the playback state with it,
+        unless a command was sent while the sample was on its way
+        """
+        sample = self.start_sample()
+        return self.finish_sample(sample, await self.spotify.playback_currently_playing())
+
+    async def close(self):
+        """
+        closes the connections of the sender, dropping a check that hasn't run yet
+        """
+        if self.pending_check is not None:
+            self.pending_check.cancel()
+        await self.sender.client.aclose()
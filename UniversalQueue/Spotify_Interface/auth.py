@@ -1,11 +1,23 @@
-import tekore as tk
 import os
+import threading
+
+from token_manager import TokenManager
 
 path = os.path.dirname(os.path.abspath(__file__))
 
-def get_user_token():
-    CONFIG_FILE = path + '/creds.config'
-    conf = tk.config_from_file(CONFIG_FILE, return_refresh=True)
-    token = tk.refresh_user_token(*conf[:2], conf[3])
-    return token
+#the token shared by every spotify client in this process, created on first use
+_token = None
+_token_lock = threading.Lock()
 
+def get_user_token():
+    """
+    returns the user token, a TokenManager that keeps itself refreshed in the background
+    and can be handed to tekore in place of a token. The token is read from creds.config
+    the first time it is asked for, and every caller after that shares it.
+    """
+    global _token
+    with _token_lock:
+        if _token is None:
+            CONFIG_FILE = path + '/creds.config'
+            _token = TokenManager.from_config(CONFIG_FILE)
+        return _token
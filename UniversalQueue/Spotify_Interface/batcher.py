@@ -0,0 +1,233 @@
+""" This module implements the TrackBatcher and AsyncTrackBatcher classes, which group concurrent track lookups into one API call """
+import asyncio
+from concurrent.futures import Future
+import threading
+import time
+
+import tekore as tk
+
+#seconds the first lookup of a batch waits for others to join it
+BATCH_WINDOW = 0.005
+
+#the most ids spotify's several-tracks endpoint accepts in one call
+MAX_BATCH = 50
+
+
+def is_bad_request(e):
+    """
+    @return: True when a failed several-tracks call may have failed because of one bad id,
+    so the ids are worth fetching one by one. Timeouts, connection and server errors, and
+    rate limiting would fail every id the same way, so they fail the whole batch
+    """
+    return isinstance(e, tk.ClientError) and not isinstance(e, tk.TooManyRequests)
+
+
+class TrackBatcher:
+    """
+    Micro-batches track lookups. When several guests paste spotify urls at the same
+    moment, the track ids that arrive within a few milliseconds of each other are
+    resolved with a single call to the several-tracks endpoint and the results are
+    handed back to each waiting request.
+
+    The first request of a batch leads it: it waits out the batch window and then
+    makes the call on its own thread, so no extra threads are needed.
+    """
+
+    def __init__(self, fetch_tracks, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        """
+        creates a TrackBatcher object
+
+        @param fetch_tracks: function taking a list of track ids and returning the
+        tracks in the same order (None for ids that don't exist)
+        @param window: seconds to gather ids before calling fetch_tracks
+        @param max_batch: a batch is sent straight away once it holds this many ids
+
+        @attribute pending: track id -> Future of the batch being gathered
+        @attribute active: number of lookups in progress. A lookup that arrives while no
+        other is in progress is sent straight away instead of waiting out the window
+        """
+        self.fetch_tracks = fetch_tracks
+        self.window = window
+        self.max_batch = max_batch
+
+        self.pending = {}
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def get(self, track_id):
+        """
+        looks up one track, blocking until the batch it joined has been resolved
+
+        @param track_id: the spotify id of the track
+        @return: the track returned by fetch_tracks
+        """
+        leader = False
+        batch = None
+        with self.lock:
+            self.active += 1
+            future = self.pending.get(track_id)
+            if future is None:
+                future = Future()
+                leader = len(self.pending) == 0
+                self.pending[track_id] = future
+                #a lone lookup has nobody to wait for
+                if len(self.pending) >= self.max_batch or self.active == 1:
+                    batch = self.take()
+
+        try:
+            if batch is None and leader:
+                time.sleep(self.window)
+                with self.lock:
+                    batch = self.take()
+
+            if batch:
+                self.resolve(batch)
+
+            return future.result()
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def take(self):
+        """
+        hands over the batch being gathered and starts a new one. Called with the lock held.
+        """
+        batch = self.pending
+        self.pending = {}
+        return batch
+
+    def resolve(self, batch):
+        """
+        fetches every track of a batch in one call and completes the waiting futures.
+        When spotify rejects the call the tracks are fetched one by one, so a bad id only
+        fails its own lookup. Any other error fails the whole batch straight away
+
+        @param batch: track id -> Future
+        """
+        track_ids = list(batch)
+        try:
+            tracks = self.fetch_tracks(track_ids)
+        except Exception as e:
+            if len(batch) == 1 or not is_bad_request(e):
+                self.fail(batch, e)
+                return
+            for track_id, future in batch.items():
+                self.resolve({track_id: future})
+            return
+        self.complete(batch, tracks)
+
+    @staticmethod
+    def fail(batch, e):
+        """
+        hands each waiting future the error
+        """
+        for future in batch.values():
+            if not future.done():
+                future.set_exception(e)
+
+    @staticmethod
+    def complete(batch, tracks):
+        """
+        hands each waiting future its track
+
+        @param batch: track id -> Future
+        @param tracks: the tracks fetched for the batch, in the order of its ids
+        """
+        #never leave a request waiting, even if fewer tracks came back than were asked for
+        tracks = list(tracks)
+        tracks += [None] * (len(batch) - len(tracks))
+
+        for (track_id, future), track in zip(batch.items(), tracks):
+            if future.done():
+                continue
+            if track is None:
+                future.set_exception(ValueError(f"no track with id {track_id}"))
+            else:
+                future.set_result(track)
+
+
+class AsyncTrackBatcher(TrackBatcher):
+    """
+    The TrackBatcher of the AsyncSpotifyInterface. Lookups wait on the event loop
+    instead of a thread, and fetch_tracks is a coroutine function.
+
+    The window and the call run in a task of their own rather than in the lookup that
+    started the batch, so a lookup that is cancelled (the guest closed the page) never
+    leaves the others of its batch waiting.
+
+    Everything runs on the one event loop thread, so the lock is never contended.
+    """
+
+    def __init__(self, fetch_tracks, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        """
+        creates an AsyncTrackBatcher object, see TrackBatcher
+
+        @attribute tasks: the tasks gathering or resolving a batch, kept until they finish
+        """
+        super().__init__(fetch_tracks, window, max_batch)
+        self.tasks = set()
+
+    async def get(self, track_id):
+        """
+        looks up one track, waiting until the batch it joined has been resolved
+
+        @param track_id: the spotify id of the track
+        @return: the track returned by fetch_tracks
+        """
+        future = self.pending.get(track_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            leader = len(self.pending) == 0
+            self.pending[track_id] = future
+
+            if len(self.pending) >= self.max_batch:
+                self.start(self.resolve(self.take()))
+            elif leader:
+                self.start(self.gather())
+
+        self.active += 1
+        try:
+            #shielded, cancelling one lookup mustn't cancel a future others share
+            return await asyncio.shield(future)
+        finally:
+            self.active -= 1
+
+    def start(self, coroutine):
+        """
+        runs a coroutine in a task of its own, keeping a reference until it is done
+        """
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def gather(self):
+        """
+        waits for lookups to join the batch and resolves it
+        """
+        #lookups made together get to join, then a lone lookup doesn't wait out the window
+        await asyncio.sleep(0)
+        if len(self.pending) > 1 or self.active > 1:
+            await asyncio.sleep(self.window)
+        batch = self.take()
+        if batch:
+            await self.resolve(batch)
+
+    async def resolve(self, batch):
+        """
+        fetches every track of a batch in one call and completes the waiting futures.
+        When spotify rejects the call the tracks are fetched one by one, so a bad id only
+        fails its own lookup. Any other error fails the whole batch straight away
+
+        @param batch: track id -> asyncio Future
+        """
+        track_ids = list(batch)
+        try:
+            tracks = await self.fetch_tracks(track_ids)
+        except Exception as e:
+            if len(batch) == 1 or not is_bad_request(e):
+                self.fail(batch, e)
+                return
+            for track_id, future in batch.items():
+                await self.resolve({track_id: future})
+            return
+        self.complete(batch, tracks)
@@ -0,0 +1,94 @@
+""" This module implements the TTLCache class, a bounded LRU cache whose entries expire """
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """
+    A least-recently-used cache with a maximum size and a time to live per entry.
+    Safe to share between the Flask request threads.
+    """
+
+    def __init__(self, maxsize, ttl=None, clock=time.monotonic):
+        """
+        creates a TTLCache object
+
+        @param maxsize: the most entries kept, the least recently used is evicted past it
+        @param ttl: seconds an entry stays valid, None for entries that never expire
+        @param clock: function returning the current time in seconds
+
+        @attribute hits: number of lookups answered from the cache
+        @attribute misses: number of lookups that were not cached or had expired
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        #key -> (expiry time, value), oldest use first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        looks up a key, marking it as recently used
+
+        @return: the cached value, or default when it is missing or expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > self.clock():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return default
+
+    def peek(self, key, default=None):
+        """
+        looks up a key without marking it as recently used or counting a hit or miss
+
+        @return: the cached value, or default when it is missing or expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > self.clock():
+                    return value
+            return default
+
+    def set(self, key, value):
+        """
+        caches a value, evicting the least recently used entry when the cache is full
+        """
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        empties the cache, the hit and miss counters are kept
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        @return: a jsonifiable dictionary of the hit and miss counters and the cache size
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self.entries), 'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,129 @@
+""" This module implements the FakeSpotifyInterface class, an in-memory stand-in for Spotify_Interface_Class """
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from batcher import TrackBatcher
+from cache import TTLCache
+from playback_state import PlaybackState
+from search_cache import SearchCache
+from sender import LatencyMetrics
+from single_flight import SingleFlight
+from tracks import TRACK_CACHE_SIZE, TrackLookups
+
+
+
+def made_up_track(track_id, name):
+    """
+    @return: a track shaped like a tekore FullTrack, as much of it as track_data() reads
+    """
+    return SimpleNamespace(id=track_id, duration_ms=180000, name=name, artists=[SimpleNamespace(name='Artist')],
+                           album=SimpleNamespace(name='Album', images=[]))
+
+class FakeSpotifyInterface(TrackLookups):
+    """
+    Plays to no device: every command updates the local PlaybackState straight away
+    and playback samples report it back, so the Universal Queue and its scheduler can
+    be run, tested and benchmarked without spotify or creds.config.
+
+    Searches and track lookups make up tekore-shaped tracks, which go through the same
+    TrackLookups caching as the real interface and are timed by latency metrics, so every
+    route of the server works.
+    """
+
+    def __init__(self, latency=0.0):
+        """
+        creates a FakeSpotifyInterface object
+
+        @param latency: seconds every call takes, to stand in for a round trip to spotify
+
+        @attribute state: the PlaybackState the commands update
+        @attribute calls: how many times each method was called
+        @attribute sender: stands in for the PooledSender, its metrics time every call
+        """
+        self.latency = latency
+        self.state = PlaybackState()
+        self.calls = Counter()
+        self.calls_lock = threading.Lock()
+        self.sender = SimpleNamespace(metrics=LatencyMetrics())
+        self.search_cache = SearchCache()
+        self.search_flight = SingleFlight()
+        self.track_cache = TTLCache(TRACK_CACHE_SIZE)
+        self.track_batcher = TrackBatcher(self.fetch_tracks)
+
+    def call(self, name):
+        """
+        counts a call and waits out the latency
+        """
+        with self.calls_lock:
+            self.calls[name] += 1
+        started = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        self.sender.metrics.record(name, time.perf_counter() - started)
+
+    def play(self, track_id):
+        self.call('play')
+        self.state.played(track_id)
+        return 0
+
+    def pause(self):
+        self.call('pause')
+        self.state.paused()
+        return 0
+
+    def unpause(self):
+        self.call('unpause')
+        self.state.resumed()
+        return 0
+
+    def seek(self, position_ms):
+        self.call('seek')
+        self.state.seeked(position_ms)
+        return 0
+
+    def queue_next(self, track_id):
+        self.call('queue_next')
+        return 0
+
+    def skip(self):
+        self.call('skip')
+        self.state.invalidate()
+        return 0
+
+    def get_current_playback_info(self):
+        """
+        @return: what the PlaybackState says is playing, shaped like a tekore CurrentlyPlaying,
+        or None when nothing has been played
+        """
+        self.call('get_current_playback_info')
+        view = self.state.view()
+        if view['track_id'] is None:
+            self.state.observe(None)
+            return None
+        info = SimpleNamespace(item=SimpleNamespace(id=view['track_id'], duration_ms=view['duration_ms']),
+                               progress_ms=view['progress_ms'], is_playing=view['is_playing'])
+        self.state.observe(info)
+        return info
+
+    def search(self, search_string, key):
+        """
+        @return: limit made up tracks named after the query, see TrackLookups.return_data()
+        """
+        self.call('search')
+        query, limit = key
+        tracks = [made_up_track('%s%d' % (query.replace(' ', ''), i), '%s %d' % (query, i)) for i in range(limit)]
+        return self.search_results(key, tracks)
+
+    def fetch_tracks(self, track_ids):
+        """
+        stands in for the several-tracks call the track batcher makes
+        """
+        self.call('tracks')
+        return [made_up_track(track_id, 'Track ' + track_id) for track_id in track_ids]
+
+    def current_state(self):
+        if self.state.is_stale():
+            self.get_current_playback_info()
+        return self.state
@@ -0,0 +1,93 @@
+""" This module implements the PlaybackChecks mixin, the command counting and reconciling shared by the blocking and the async spotify interfaces """
+import logging
+
+
+class PlaybackChecks:
+    """
+    Keeps the PlaybackState honest without a call to spotify after every command.
+    Every command bumps a counter, so a sample of the device that was on its way
+    while a command was sent is dropped instead of undoing the command. In
+    optimistic mode one check of the device is scheduled after a burst of commands.
+
+    The interfaces mixing this in only differ in how they wait: schedule_check()
+    starts the check, which calls start_check(), samples the device and hands
+    the result to finish_check(). A sample is taken between start_sample() and
+    finish_sample().
+
+    Expects optimistic, state, commands, pending_check and verify_lock attributes.
+    """
+
+    def commanded(self):
+        """
+        called after every command. In optimistic mode a check of the device is
+        scheduled, one check covers a burst of commands.
+        """
+        with self.verify_lock:
+            self.commands += 1
+            if not self.optimistic or self.pending_check is not None:
+                return
+            self.pending_check = self.schedule_check()
+
+    def confirmed(self, current_state, playing):
+        """
+        reconciles the playback state with the sample a confirmed pause or unpause fetched
+
+        @param current_state: the tekore CurrentlyPlayingContext, None when nothing is playing
+        @param playing: whether the command should have left the device playing
+        @return: 0 when the device did what it was told, 1 otherwise
+        """
+        self.state.observe(current_state)
+        is_playing = current_state is not None and current_state.is_playing
+        return 0 if is_playing == playing else 1
+
+    def start_check(self):
+        """
+        called when a scheduled check runs, so the next command schedules a new one
+
+        @return: what finish_check() compares the sample against
+        """
+        with self.verify_lock:
+            self.pending_check = None
+            return self.commands, self.state.is_playing
+
+    def finish_check(self, check):
+        """
+        warns when the device didn't do what it was told. The sample has already
+        corrected the playback state
+
+        @param check: what start_check() returned
+        """
+        commands, expected = check
+        with self.verify_lock:
+            #a newer command has its own check coming
+            if commands == self.commands and self.state.is_playing != expected:
+                logging.warning("Spotify is %s, expected it to be %s",
+                                "playing" if self.state.is_playing else "paused",
+                                "playing" if expected else "paused")
+
+    def start_sample(self):
+        """
+        called just before asking spotify what the device is playing
+
+        @return: what finish_sample() needs
+        """
+        with self.verify_lock:
+            return self.commands, self.state.clock()
+
+    def finish_sample(self, sample, cur_play):
+        """
+        reconciles the playback state with what the device is playing, unless a
+        command was sent while the sample was on its way
+
+        @param sample: what start_sample() returned
+        @param cur_play: the tekore CurrentlyPlaying spotify answered with
+        @return: cur_play
+        """
+        commands, requested = sample
+        #the progress was read somewhere during the call
+        measured_at = (requested + self.state.clock()) / 2
+
+        with self.verify_lock:
+            if commands == self.commands:
+                self.state.observe(cur_play, measured_at)
+        return cur_play
@@ -0,0 +1,146 @@
+""" This module implements the PlaybackState class, the local model of what the spotify device is playing """
+import threading
+import time
+
+#seconds the model is trusted without hearing from spotify
+STALE_AFTER = 30
+
+
+class PlaybackState:
+    """
+    Tracks the current track, its progress and whether it is playing, from the
+    commands we send and the time they were sent. Reads such as "how far into
+    the song are we" are answered locally instead of asking spotify.
+
+    The model is reconciled with spotify whenever a playback sample is taken,
+    and is_stale() tells callers when it is old enough to be worth a sample.
+    """
+
+    def __init__(self, stale_after=STALE_AFTER, clock=time.monotonic):
+        """
+        creates a PlaybackState object for a device that isn't playing anything
+
+        @param stale_after: seconds after the last sample before the model is stale
+        @param clock: function returning the current time in seconds
+
+        @attribute track_id: the id of the track on the device, None when unknown
+        @attribute duration_ms: the length of that track, None when unknown
+        @attribute is_playing: whether the device is playing
+        @attribute observed_at: clock() time of the last sample from spotify
+        """
+        self.stale_after = stale_after
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.track_id = None
+        self.duration_ms = None
+        self.is_playing = False
+        self.observed_at = None
+
+        #progress at the anchor time, playback moves on from there while playing
+        self.position_ms = 0
+        self.anchored_at = clock()
+
+    def played(self, track_id, duration_ms=None, position_ms=0):
+        """
+        a track started playing
+        """
+        with self.lock:
+            self.track_id = track_id
+            self.duration_ms = duration_ms
+            self.anchor(position_ms, True)
+
+    def paused(self):
+        """
+        playback was paused, progress stops where it is
+        """
+        with self.lock:
+            self.anchor(self.progress(), False)
+
+    def resumed(self):
+        """
+        playback was resumed, progress moves on from where it stopped
+        """
+        with self.lock:
+            self.anchor(self.progress(), True)
+
+    def seeked(self, position_ms):
+        """
+        playback was moved to a position in the current track
+        """
+        with self.lock:
+            self.anchor(position_ms, self.is_playing)
+
+    def invalidate(self):
+        """
+        something happened that the model can't follow, such as a skip on the device.
+        The model is stale until the next sample.
+        """
+        with self.lock:
+            self.observed_at = None
+
+    def observe(self, info, measured_at=None):
+        """
+        reconciles the model with a sample from spotify
+
+        @param info: a tekore CurrentlyPlaying, or None when nothing is playing
+        @param measured_at: the clock() time the sample was taken, now when None
+        """
+        measured_at = self.clock() if measured_at is None else measured_at
+        with self.lock:
+            self.observed_at = measured_at
+            if info is None:
+                self.is_playing = False
+                return
+            if info.item is not None:
+                self.track_id = info.item.id
+                self.duration_ms = info.item.duration_ms
+            self.position_ms = info.progress_ms or 0
+            self.anchored_at = measured_at
+            self.is_playing = info.is_playing
+
+    def anchor(self, position_ms, is_playing):
+        """
+        restarts the progress clock from a known position. Called with the lock held.
+        """
+        self.position_ms = position_ms
+        self.anchored_at = self.clock()
+        self.is_playing = is_playing
+
+    def progress(self):
+        """
+        the progress in milli seconds. Called with the lock held.
+        """
+        position_ms = self.position_ms
+        if self.is_playing:
+            position_ms += int((self.clock() - self.anchored_at) * 1000)
+        if self.duration_ms is not None:
+            position_ms = min(position_ms, self.duration_ms)
+        return position_ms
+
+    def progress_ms(self):
+        """
+        @return: how far into the current track playback is, in milli seconds
+        """
+        with self.lock:
+            return self.progress()
+
+    def is_stale(self):
+        """
+        @return: True when spotify hasn't been sampled for stale_after seconds
+        """
+        with self.lock:
+            return self.observed_at is None or self.clock() - self.observed_at > self.stale_after
+
+    def view(self):
+        """
+        @return: a jsonifiable dictionary of the track id, its progress and length, and
+        whether it is playing, for a "now playing" progress bar
+        """
+        with self.lock:
+            return {
+                    'track_id': self.track_id,
+                    'progress_ms': self.progress(),
+                    'duration_ms': self.duration_ms,
+                    'is_playing': self.is_playing,
+                }
@@ -4,13 +4,18 @@ import os
 
 path = os.path.dirname(os.path.abspath(__file__))
 
-config = configparser.RawConfigParser()   
 configFilePath = path + '/creds.config'
-config.read(configFilePath)
 
-device = config.get("DEFAULT", "DEVICE")
+def get_device_name():
+    """
+    returns the DEVICE field of creds.config, read when a device is looked up rather than on import
+    """
+    config = configparser.RawConfigParser()
+    config.read(configFilePath)
+    return config.get("DEFAULT", "DEVICE")
 
 def get_first_available_device(spotify):
+    device = get_device_name()
     available_devices = spotify.playback_devices()
     #Uncomment this for-loop to print the names of available devices on the account 
     #The device needs to running an active spotify session to show up (a song needs to be playing on it)
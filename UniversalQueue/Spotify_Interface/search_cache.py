@@ -0,0 +1,124 @@
+""" This module implements the SearchCache class, the search result cache that also answers queries as they are typed """
+import time
+
+from cache import TTLCache
+from tracks import SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL
+
+#the most letters a query may be shorter or longer than the cached query it is answered from
+PREFIX_SLACK = 3
+
+#queries shorter than this are only answered by an exact repeat, a letter or two matches too much
+MIN_PREFIX = 3
+
+
+def track_matches(json_data, words):
+    """
+    @param json_data: the song data of a track, see tracks.track_data()
+    @param words: the words of a normalized query
+    @return: True when every word of the query starts a word of the track's title, artist or album
+    """
+    track_words = ' '.join((json_data['title'] or '', json_data['artist'] or '', json_data['album'] or '')).lower().split()
+    return all(any(track_word.startswith(word) for track_word in track_words) for word in words)
+
+
+class SearchCache(TTLCache):
+    """
+    The cache of return_data results, keyed on tracks.search_key().
+
+    A guest typing "taylor swift" sends "taylor s", "taylor sw", "taylor swi" as the
+    debounce lets them through. Besides repeats of a query, the cache answers a query
+    from the results of a cached query up to PREFIX_SLACK letters longer or shorter
+    (e.g. "taylor s" from "taylor swi"), when enough of those results match every word
+    of the query to fill the page. Anything else goes to spotify as before. Answers made
+    this way are not cached themselves, so the query is looked up properly once the
+    nearby results expire.
+    """
+
+    def __init__(self, maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, slack=PREFIX_SLACK, clock=time.monotonic):
+        """
+        creates a SearchCache object
+
+        @param maxsize: the most queries kept, see TTLCache
+        @param ttl: seconds the results of a query stay valid
+        @param slack: the most letters a query may differ by from the query it is answered from
+
+        @attribute extensions: key of a query a few letters shorter -> key of the cached query
+        it was cut from, so a shorter query can find a longer one
+        @attribute prefix_hits: lookups that missed but were answered from a nearby query
+        """
+        super().__init__(maxsize, ttl, clock)
+        self.slack = slack
+        self.extensions = TTLCache(maxsize * slack, ttl, clock)
+        self.prefix_hits = 0
+
+    def set(self, key, value):
+        """
+        caches the results of a query, and remembers it under its shorter prefixes
+        """
+        super().set(key, value)
+        for prefix in self.prefixes(key):
+            self.extensions.set(prefix, key)
+
+    def prefixes(self, key):
+        """
+        @return: the keys of the query cut short by 1 to slack letters, down to MIN_PREFIX letters
+        """
+        query, limit = key
+        prefixes = []
+        for cut in range(1, self.slack + 1):
+            prefix = ' '.join(query[:-cut].split())
+            if len(prefix) < MIN_PREFIX:
+                break
+            prefixes.append((prefix, limit))
+        return prefixes
+
+    def lookup(self, key):
+        """
+        @param key: the search_key() of a query
+        @return: the results of the query, from the cache or from a nearby query, None when
+        the query has to go to spotify
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        data = self.nearby(key)
+        if data is not None:
+            with self.lock:
+                self.prefix_hits += 1
+        return data
+
+    def nearby(self, key):
+        """
+        answers a query from a cached query a few letters longer or shorter
+
+        @return: the results, None when no nearby query has enough matching tracks
+        """
+        query, limit = key
+        if len(query) < MIN_PREFIX:
+            return None
+
+        candidates = self.prefixes(key)
+        longer = self.extensions.peek(key)
+        if longer is not None:
+            candidates.insert(0, longer)
+
+        words = query.split()
+        for candidate in candidates:
+            data = self.peek(candidate)
+            if data is None:
+                continue
+            results = [json_data for json_data in data['results'] if track_matches(json_data, words)]
+            if len(results) >= limit:
+                return {'status': 200, 'results': results[:limit]}
+        return None
+
+    def stats(self):
+        """
+        @return: a jsonifiable dictionary of the hit, miss and prefix hit counters and the cache size.
+        Misses include the lookups answered from a nearby query
+        """
+        stats = super().stats()
+        with self.lock:
+            stats['prefix_hits'] = self.prefix_hits
+        return stats
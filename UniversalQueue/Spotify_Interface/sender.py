@@ -0,0 +1,173 @@
+""" This module implements the PooledSender and AsyncPooledSender classes, the keep-alive HTTP senders used by the tekore clients """
+from collections import deque
+import re
+import threading
+import time
+
+import httpx
+import tekore as tk
+
+#connections kept open to the spotify API, enough for the Flask request threads
+POOL_SIZE = 10
+
+#seconds an idle connection is kept alive before it is closed
+KEEPALIVE_EXPIRY = 60
+
+#seconds to wait for a connection, or for spotify to answer, before a call fails
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 10
+
+#how many recent calls per endpoint are kept to compute latency percentiles
+LATENCY_SAMPLES = 256
+
+#spotify ids are 22 base62 characters
+SPOTIFY_ID = re.compile(r"/[0-9A-Za-z]{22}(?=/|$)")
+
+
+class LatencyMetrics:
+    """
+    Records how long calls to each spotify API endpoint take
+    """
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        """
+        creates a LatencyMetrics object
+
+        @param samples: how many recent calls per endpoint are kept for percentiles
+        """
+        self.samples = samples
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, failed=False):
+        """
+        records one call
+
+        @param endpoint: the endpoint name, see endpoint()
+        @param seconds: how long the call took
+        @param failed: True when the call raised or returned an error status
+        """
+        with self.lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0,
+                           'recent': deque(maxlen=self.samples)}
+                self.endpoints[endpoint] = metrics
+            metrics['count'] += 1
+            metrics['errors'] += failed
+            metrics['total'] += seconds
+            metrics['max'] = max(metrics['max'], seconds)
+            metrics['recent'].append(seconds)
+
+    def stats(self):
+        """
+        @return: a jsonifiable dictionary of endpoint -> call count, error count and
+        mean, median, 95th percentile and max latency in milliseconds
+        """
+        with self.lock:
+            stats = {}
+            for endpoint, metrics in self.endpoints.items():
+                recent = sorted(metrics['recent'])
+                stats[endpoint] = {
+                        'count': metrics['count'],
+                        'errors': metrics['errors'],
+                        'mean_ms': round(metrics['total'] / metrics['count'] * 1000, 2),
+                        'p50_ms': round(recent[len(recent) // 2] * 1000, 2),
+                        'p95_ms': round(recent[int(len(recent) * 0.95)] * 1000, 2),
+                        'max_ms': round(metrics['max'] * 1000, 2),
+                    }
+            return stats
+
+
+def pool_options(pool_size=POOL_SIZE, keepalive_expiry=KEEPALIVE_EXPIRY,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+    """
+    @param pool_size: the most connections open at once, all of them kept alive
+    @param keepalive_expiry: seconds an idle connection stays open
+    @param connect_timeout: seconds to wait for a connection from the pool or to spotify
+    @param read_timeout: seconds to wait for spotify to answer
+
+    @return: the keyword arguments of an httpx.Client or httpx.AsyncClient with that pool
+    """
+    return {
+            'limits': httpx.Limits(max_connections=pool_size,
+                                   max_keepalive_connections=pool_size,
+                                   keepalive_expiry=keepalive_expiry),
+            'timeout': httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout),
+        }
+
+
+def endpoint(request):
+    """
+    @param request: a tekore Request
+
+    @return: the method and path of the request with spotify ids replaced by {id},
+    e.g. "GET /v1/tracks/{id}"
+    """
+    path = httpx.URL(request.url).path
+    return f"{request.method} {SPOTIFY_ID.sub('/{id}', path)}"
+
+
+class PooledSender(tk.SyncSender):
+    """
+    A tekore sender over a bounded pool of keep-alive connections, so playback,
+    search and lookup calls reuse an open TCP/TLS connection instead of paying
+    for a new one, with timeouts on every call and latency metrics per endpoint.
+    """
+
+    def __init__(self, client=None, **pool):
+        """
+        creates a PooledSender object
+
+        @param client: an httpx.Client to send with, built from the pool parameters when None
+        @param pool: pool_size, keepalive_expiry, connect_timeout and read_timeout, see pool_options()
+
+        @attribute metrics: the LatencyMetrics of every call sent
+        """
+        super().__init__(client or httpx.Client(**pool_options(**pool)))
+        self.metrics = LatencyMetrics()
+
+    def send(self, request):
+        """
+        sends a request over the pool and records its latency
+        """
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = super().send(request)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            self.metrics.record(endpoint(request), time.perf_counter() - start, failed)
+
+
+class AsyncPooledSender(tk.AsyncSender):
+    """
+    The asynchronous PooledSender, used by the AsyncSpotifyInterface. Calls wait on
+    the event loop instead of holding a thread while spotify answers.
+    """
+
+    def __init__(self, client=None, **pool):
+        """
+        creates an AsyncPooledSender object
+
+        @param client: an httpx.AsyncClient to send with, built from the pool parameters when None
+        @param pool: pool_size, keepalive_expiry, connect_timeout and read_timeout, see pool_options()
+
+        @attribute metrics: the LatencyMetrics of every call sent
+        """
+        super().__init__(client or httpx.AsyncClient(**pool_options(**pool)))
+        self.metrics = LatencyMetrics()
+
+    async def send(self, request):
+        """
+        sends a request over the pool and records its latency
+        """
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = await super().send(request)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            self.metrics.record(endpoint(request), time.perf_counter() - start, failed)
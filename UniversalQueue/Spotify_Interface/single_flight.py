@@ -0,0 +1,88 @@
+""" This module implements the SingleFlight and AsyncSingleFlight classes, which share one call between identical concurrent requests """
+import asyncio
+from concurrent.futures import Future
+import threading
+
+
+class SingleFlight:
+    """
+    Deduplicates calls in flight. When guests search for the same thing at the same
+    moment, the first request makes the call and the others wait for it and share its
+    result (or its error) instead of each going to spotify.
+
+    Only calls that overlap are shared, a call that has finished is forgotten. Keeping
+    results around afterwards is the job of the search cache.
+    """
+
+    def __init__(self):
+        """
+        creates a SingleFlight object
+
+        @attribute pending: key -> Future of the call in flight
+        @attribute shared: number of requests that were handed the result of another request's call
+        """
+        self.pending = {}
+        self.shared = 0
+        self.lock = threading.Lock()
+
+    def do(self, key, fetch):
+        """
+        calls fetch, unless a call for the same key is in flight, and waits for the result
+
+        @param key: identifies the call, e.g. the search_key() of a query
+        @param fetch: function making the call
+        @return: what fetch returned
+        """
+        with self.lock:
+            future = self.pending.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.pending[key] = future
+            else:
+                self.shared += 1
+
+        if leader:
+            try:
+                future.set_result(fetch())
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    del self.pending[key]
+
+        return future.result()
+
+    def stats(self):
+        """
+        @return: a jsonifiable dictionary of the shared and in flight counters
+        """
+        with self.lock:
+            return {'shared': self.shared, 'in_flight': len(self.pending)}
+
+
+class AsyncSingleFlight(SingleFlight):
+    """
+    The SingleFlight of the AsyncSpotifyInterface. fetch is a coroutine function, and
+    requests wait on the event loop instead of a thread.
+
+    The call runs as a task of its own, so a request that is cancelled (the guest
+    closed the page) doesn't cancel the call for the others waiting on it.
+    """
+
+    async def do(self, key, fetch):
+        """
+        awaits fetch(), unless a call for the same key is in flight, and returns the result
+
+        @param key: identifies the call, e.g. the search_key() of a query
+        @param fetch: coroutine function making the call
+        @return: what fetch returned
+        """
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self.pending[key] = task
+            task.add_done_callback(lambda task: self.pending.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
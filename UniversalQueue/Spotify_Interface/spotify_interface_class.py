@@ -1,37 +1,90 @@
 """ This module implements the Universal Queue class """
 import tekore as tk
-from flask import Flask, jsonify, request 
-from flask_cors import CORS, cross_origin
-import json
+import logging
+import threading
 
 from auth import get_user_token
+from batcher import TrackBatcher
+from cache import TTLCache
+from playback_state import PlaybackState
+from playback_checks import PlaybackChecks
 from player import get_first_available_device
+from search_cache import SearchCache
+from sender import PooledSender
+from single_flight import SingleFlight
+from tracks import TRACK_CACHE_SIZE, TrackLookups
 
 # from UniversalQueue.Song import Song
 
-#Method called on startup to retrieve the user token
-token = get_user_token()
-NUM_ITEMS = 5
+#seconds after an optimistic pause or unpause before the device is checked
+VERIFY_DELAY = 1.0
 
-app = Flask(__name__)
-CORS(app) 
+#the interface shared by everything in this process, created by get_shared_interface()
+_shared_interface = None
+_shared_lock = threading.Lock()
 
-class Spotify_Interface_Class:
+class Spotify_Interface_Class(TrackLookups, PlaybackChecks):
     """
-    Serves as a stanard interface / wrapper class around the spotify tekore object
+    Serves as a stanard interface / wrapper class around the spotify tekore object.
+    Searches and lookups are cached by TrackLookups, commands are counted and
+    checked by PlaybackChecks
     """
     
-    def __init__(self): 
+    def __init__(self, optimistic=True, token=None, sender=None): 
         """
         Creates a Spotify tekore object
-        gets the device_id if the tekore object is successfully made for calling all useful methods
+        the device is looked up the first time a playback command needs it, so the
+        object can be made to check the account before any device is running
+
+        @param optimistic: when True play, pause and unpause make a single call and assume it
+        worked, the device is checked in the background a moment later. When False pause and
+        unpause fetch the playback state straight away to confirm it
+        @param token: the user token, the one shared through auth.get_user_token() when None
+        @param sender: the tekore sender to send with, a PooledSender with the default pool
+        size, keep-alive and timeouts when None
 
         @attribute spotify: The spotify tekore object
-        @attribute device_id: The device id of the physical device running the external spotify session
+        @attribute sender: The keep-alive connection pool the spotify object sends through, with latency metrics
+        @attribute device_id: The device id of the physical device running the external spotify session,
+        found on first use
+        @attribute search_cache: SearchCache of return_data results keyed on the normalized query and limit,
+        which also answers a query from the results of one a few letters longer or shorter
+        @attribute search_flight: SingleFlight sharing one spotify search between identical queries in flight
+        @attribute track_cache: LRU cache of track metadata keyed on track id, filled by searches and lookups
+        @attribute track_batcher: groups track lookups that arrive together into one several-tracks call
+        @attribute state: the PlaybackState of the device, kept from our own commands and samples
+        """
+        self.sender = sender or PooledSender()
+        self.spotify = tk.Spotify(token if token is not None else get_user_token(), sender=self.sender)
+        self._device_id = None
+        self.device_lock = threading.Lock()
+        self.search_cache = SearchCache()
+        self.search_flight = SingleFlight()
+        self.track_cache = TTLCache(TRACK_CACHE_SIZE)
+        self.track_batcher = TrackBatcher(self.spotify.tracks)
+
+        self.optimistic = optimistic
+        self.state = PlaybackState()
+
+        #bumped by every command, so a check that raced with a command doesn't undo it
+        self.commands = 0
+        self.pending_check = None
+        self.verify_lock = threading.Lock()
+
+    @property
+    def device_id(self):
+        return self.find_device()
+
+    def find_device(self):
+        """
+        looks up the playback device the first time it is needed, exits when none is running
+
+        @return: the device id
         """
-        self.spotify = tk.Spotify(token)
-        self.device_id = get_first_available_device(self.spotify).id
-        pass
+        with self.device_lock:
+            if self._device_id is None:
+                self._device_id = get_first_available_device(self.spotify).id
+            return self._device_id
 
     def play(self, track_id): 
         """
@@ -43,13 +96,8 @@ class Spotify_Interface_Class:
         #Play the uri of the song on playback
         print(track_id)
         self.spotify.playback_start_tracks(track_ids=[track_id], device_id=self.device_id) 
-        current_track = self.spotify.playback_currently_playing()
-        # introduce a sleep call
-        # if current_track.item.id == track_id:
-            # return 0
-        # else: 
-            # #Should raise an exception here later down the line
-            # return 1
+        self.state.played(track_id, self.track_length(track_id))
+        self.commanded()
         return 0
 
     def pause(self): 
@@ -60,15 +108,14 @@ class Spotify_Interface_Class:
         #pause the playback
         #If you pause while the player is already paused, it causes a 403 error
         self.spotify.playback_pause()
-        current_state = self.spotify.playback()
+        self.state.paused()
+        self.commanded()
+        if self.optimistic:
+            return 0
 
         # Might need to add a sleep call here to make sure the playback actually starts before the check
         # occurs
-
-        if current_state.is_playing == False:
-            return 0
-        else: 
-            return 1
+        return self.confirmed(self.spotify.playback(), playing=False)
 
     def unpause(self):
         """
@@ -77,82 +124,124 @@ class Spotify_Interface_Class:
         """
         #unpause the playback
         self.spotify.playback_resume()
+        self.state.resumed()
+        self.commanded()
+        if self.optimistic:
+            return 0
 
-        current_state = self.spotify.playback()
         # Might need to add a sleep call here to make sure the playback actually starts before the check
         # occurs
-        if current_state.is_playing:
-            return 0
-        else: 
-            return 1
-
-    # @app.route('/return_results', methods=['GET', 'POST'])
-    # @cross_origin()
-    # def return_results(self):
-
-        # response = {'search_string': self.return_data('Get Back The Beatles')}
-        # response = jsonify(response)
-        # print(response)
-        # return response
+        return self.confirmed(self.spotify.playback(), playing=True)
 
-    def return_data(self, search_string):
+    def seek(self, position_ms):
         """
-        unpauses the spotify playback
+        moves the spotify playback to a position in the current song
 
-        @param search_string: The string that is fed into the spotify search API endpoint
+        @param position_ms: the position to seek to in milli seconds
         @attribute spotify: The spotify tekore object
         """
-        #return song objects to the front-end for the user to select from in the UI
+        self.spotify.playback_seek(position_ms, device_id=self.device_id)
+        self.state.seeked(position_ms)
+        self.commanded()
+        return 0
 
-        tracks, = self.spotify.search(query=search_string, types=('track',), limit=NUM_ITEMS)
-        results = []
-        for track in tracks.items: 
-            json_data = {
-                    'id': 0,
-                    'uri' : track.id,
-                    's_len' : track.duration_ms,
-                    'title' : track.name,
-                    'artist': track.artists[0].name,
-                    'album' : track.album.name,
-                    'image' : track.album.images[0].url
-                    }
+    def schedule_check(self):
+        """
+        starts the timer of the check after a burst of optimistic commands
 
-            results.append(json_data)
-        
-        data = {'status': 200, 'results': results}
+        @return: the timer
+        """
+        timer = threading.Timer(VERIFY_DELAY, self.verify)
+        timer.daemon = True
+        timer.start()
+        return timer
 
-        return data 
+    def verify(self):
+        """
+        the lazy check behind optimistic commands: samples the device, which corrects
+        the playback state when the device didn't do what it was told
+        """
+        check = self.start_check()
+        try:
+            self.get_current_playback_info()
+        except Exception as e:
+            logging.warning("Could not check the playback state: %s", str(e))
+            return
+        self.finish_check(check)
+
+    def current_state(self):
+        """
+        @return: the PlaybackState, reconciled with spotify first when it is stale
+        """
+        if self.state.is_stale():
+            try:
+                self.get_current_playback_info()
+            except Exception as e:
+                logging.warning("Could not check the playback state: %s", str(e))
+        return self.state
+
+    def queue_next(self, track_id):
+        """
+        adds a song to the queue of the spotify device, so it starts on the device
+        the moment the current song ends
 
-    def from_url(self, url):
-        response = tk.from_url(url)
+        @param track_id: The id of the song to be queued
+        """
+        self.spotify.playback_queue_add(tk.to_uri('track', track_id), device_id=self.device_id)
+        return 0
 
-        track_id = response[1]
+    def skip(self):
+        """
+        moves the spotify playback on to the next song in the device queue
+        """
+        self.spotify.playback_next(device_id=self.device_id)
+        #the device picks the next song itself
+        self.state.invalidate()
+        self.commanded()
+        return 0
 
-        track = self.spotify.track(track_id)
+    # @app.route('/return_results', methods=['GET', 'POST'])
+    # @cross_origin()
+    # def return_results(self):
 
-        results = []
-        json_data = {
-                'id': 0,
-                'uri' : track_id,
-                's_len' : track.duration_ms,
-                'title' : track.name,
-                'artist': track.artists[0].name,
-                'album' : track.album.name
-                }
+        # response = {'search_string': self.return_data('Get Back The Beatles')}
+        # response = jsonify(response)
+        # print(response)
+        # return response
 
-        results.append(json_data)
-        
-        data = {'status': 200, 'results': results}
+    def search(self, search_string, key):
+        """
+        makes the spotify search for return_data()
 
-        return data 
+        @param key: the search_key() the results are cached under
+        """
+        tracks, = self.spotify.search(query=search_string, types=('track',), limit=key[1])
+        return self.search_results(key, tracks.items)
 
     def get_current_user_info(self):
         cur_user = self.spotify.current_user()
         return  cur_user
 
     def get_current_playback_info(self):
-        cur_play = self.spotify.playback_currently_playing()
-        return  cur_play
+        """
+        fetches what the device is playing and reconciles the playback state with it,
+        unless a command was sent while the sample was on its way
+        """
+        sample = self.start_sample()
+        return self.finish_sample(sample, self.spotify.playback_currently_playing())
+
+
+def get_shared_interface():
+    """
+    returns the Spotify_Interface_Class shared by the server and the startup checks,
+    creating it the first time it is asked for. Importing this module doesn't log in
+    or read creds.config, that happens here.
+    """
+    global _shared_interface
+    with _shared_lock:
+        if _shared_interface is None:
+            _shared_interface = Spotify_Interface_Class()
+        return _shared_interface
 
 
 # s = Spotify_Interface_Class()
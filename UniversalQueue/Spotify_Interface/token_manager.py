@@ -0,0 +1,138 @@
+""" This module implements the TokenManager class, a user token that is refreshed in the background """
+import configparser
+import logging
+import threading
+import time
+
+import tekore as tk
+
+#seconds before the access token expires that it is replaced
+REFRESH_MARGIN = 5 * 60
+
+#seconds to wait before trying again when spotify can't be reached
+RETRY_DELAY = 30
+
+#creds.config keys the access token is persisted under, next to tekore's own keys
+ACCESS_VAR = "SPOTIFY_USER_ACCESS"
+EXPIRES_VAR = "SPOTIFY_USER_ACCESS_EXPIRES"
+
+
+class TokenManager:
+    """
+    Holds the user token and refreshes it on a background thread ahead of its
+    expiry, so calls to spotify never wait on a refresh or fail on an expired token.
+
+    A TokenManager can be given to tekore in place of a token: tekore only asks
+    for str(token), which is the current access token. A refreshed token is
+    swapped in with a single assignment, so a request sees either the old token
+    or the new one, both of which are valid. Every refreshed token is written
+    back to creds.config, and a restart reuses it while it is still valid.
+    """
+
+    def __init__(self, credentials, token, config_file=None, margin=REFRESH_MARGIN, retry_delay=RETRY_DELAY):
+        """
+        creates a TokenManager object and starts its thread
+
+        @param credentials: the tekore Credentials of the app
+        @param token: a valid tekore Token, with its refresh token
+        @param config_file: creds.config, refreshed tokens are written to it. None to not persist
+        @param margin: seconds before expiry to refresh
+        @param retry_delay: seconds to wait before trying again when a refresh fails
+
+        @attribute token: the current tekore Token
+        """
+        self.credentials = credentials
+        self.token = token
+        self.refresh_token = token.refresh_token
+        self.config_file = config_file
+        self.margin = margin
+        self.retry_delay = retry_delay
+
+        #only one refresh at a time, whether from the thread or refresh() called directly
+        self.refresh_lock = threading.Lock()
+        self.stopping = threading.Event()
+
+        self.thread = threading.Thread(target=self.run, name="TokenManager", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def from_config(cls, config_file, **options):
+        """
+        creates a TokenManager from creds.config, reusing the persisted access token
+        when it is still valid for longer than the refresh margin
+
+        @param config_file: creds.config, with the app credentials and a refresh token
+        @param options: margin and retry_delay, see __init__
+        """
+        client_id, client_secret, redirect_uri, refresh_token = tk.config_from_file(config_file, return_refresh=True)
+        credentials = tk.Credentials(client_id, client_secret, redirect_uri)
+
+        config = configparser.RawConfigParser()
+        config.optionxform = str
+        config.read(config_file)
+        access_token = config.get("DEFAULT", ACCESS_VAR, fallback=None)
+        expires_in = config.getint("DEFAULT", EXPIRES_VAR, fallback=0) - int(time.time())
+
+        if access_token and expires_in > options.get("margin", REFRESH_MARGIN):
+            token = tk.Token({"access_token": access_token, "token_type": "Bearer", "expires_in": expires_in,
+                              "refresh_token": refresh_token}, uses_pkce=False)
+            return cls(credentials, token, config_file, **options)
+
+        token = credentials.refresh_user_token(refresh_token)
+        manager = cls(credentials, token, config_file, **options)
+        manager.persist()
+        return manager
+
+    def __str__(self):
+        return self.token.access_token
+
+    @property
+    def access_token(self):
+        return self.token.access_token
+
+    def run(self):
+        """
+        the refresh thread: sleeps until the token is about to expire, then replaces it
+        """
+        while True:
+            if self.stopping.wait(max(self.token.expires_in - self.margin, 0)):
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error("An error occurred while refreshing the spotify token: %s", str(e))
+                if self.stopping.wait(self.retry_delay):
+                    return
+
+    def refresh(self):
+        """
+        fetches a new access token and swaps it in
+        """
+        with self.refresh_lock:
+            token = self.credentials.refresh_user_token(self.refresh_token)
+            #spotify doesn't always hand out a new refresh token
+            self.refresh_token = token.refresh_token or self.refresh_token
+            self.token = token
+            self.persist()
+
+    def persist(self):
+        """
+        writes the current tokens to creds.config, keeping everything else in it
+        """
+        if self.config_file is None:
+            return
+        try:
+            tk.config_to_file(self.config_file, {
+                    tk.user_refresh_var: self.refresh_token,
+                    ACCESS_VAR: self.token.access_token,
+                    EXPIRES_VAR: str(self.token.expires_at),
+                })
+        except OSError as e:
+            logging.error("An error occurred while saving the spotify token: %s", str(e))
+
+    def stop(self):
+        """
+        ends the refresh thread
+        """
+        self.stopping.set()
+        self.thread.join()
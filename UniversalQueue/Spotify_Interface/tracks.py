@@ -0,0 +1,126 @@
+""" This module holds the search and track lookups shared by the blocking, the async and the fake spotify interfaces """
+import tekore as tk
+
+#number of tracks a search returns
+NUM_ITEMS = 5
+
+#search results are shared between guests for this long (seconds), up to this many queries
+SEARCH_CACHE_TTL = 10 * 60
+SEARCH_CACHE_SIZE = 512
+
+#track metadata doesn't change, so tracks are only evicted once this many have been seen
+TRACK_CACHE_SIZE = 4096
+
+
+def search_key(search_string, limit):
+    """
+    @return: the search cache key of a query, "Taylor  Swift" and "taylor swift" are the same search
+    """
+    return (' '.join(search_string.lower().split()), limit)
+
+
+def track_data(track):
+    """
+    breaks a tekore track down into the song data sent to the front-end
+
+    @param track: a tekore FullTrack
+    @return: the song data of the track
+    """
+    return {
+            'id': 0,
+            'uri' : track.id,
+            's_len' : track.duration_ms,
+            'title' : track.name,
+            'artist': track.artists[0].name,
+            'album' : track.album.name,
+            'image' : track.album.images[0].url if track.album.images else None
+            }
+
+
+
+def url_results(json_data):
+    """
+    @param json_data: the song data of the track a url points to
+    @return: the from_url() response, holding a copy so callers can't change what is cached
+    """
+    return {'status': 200, 'results': [dict(json_data)]}
+
+
+class TrackLookups:
+    """
+    The caching and shaping behind return_data(), get_track() and from_url(). The
+    interfaces mixing this in only differ in how they fetch from spotify: search()
+    fetches the tracks of a query and hands them to search_results(), and
+    track_batcher fetches tracks by id. AsyncSpotifyInterface overrides the methods
+    that wait on a fetch with coroutines.
+
+    Expects search_cache, search_flight, track_cache and track_batcher attributes.
+    """
+
+    def return_data(self, search_string, limit=NUM_ITEMS):
+        """
+        searches spotify for tracks. Popular queries, and queries a few letters off a cached
+        one, are answered from the search cache instead of going out to the spotify API.
+        Guests searching for the same thing at the same moment share a single search
+
+        @param search_string: The string that is fed into the spotify search API endpoint
+        @param limit: The number of tracks to return
+        """
+        key = search_key(search_string, limit)
+        data = self.search_cache.lookup(key)
+        if data is not None:
+            return data
+
+        return self.search_flight.do(key, lambda: self.search(search_string, key))
+
+    def search_results(self, key, tracks):
+        """
+        caches the tracks a search found, and the search itself
+
+        @param key: the search_key() the results are cached under
+        @param tracks: the tekore tracks found
+        @return: the return_data() response
+        """
+        data = {'status': 200, 'results': [self.cache_track(track) for track in tracks]}
+        self.search_cache.set(key, data)
+        return data
+
+    def cache_track(self, track):
+        """
+        breaks a tekore track down into the song data sent to the front-end and
+        remembers it in the track cache
+
+        @param track: a tekore FullTrack
+        @return: the song data of the track
+        """
+        json_data = track_data(track)
+        self.track_cache.set(track.id, json_data)
+        return json_data
+
+    def track_length(self, track_id):
+        """
+        @return: the duration of a track in milli seconds, None when it hasn't been seen
+        """
+        json_data = self.track_cache.get(track_id)
+        return json_data['s_len'] if json_data is not None else None
+
+    def get_track(self, track_id):
+        """
+        returns the song data of a track, including its duration and artwork.
+        Tracks the server has already seen in a search or lookup resolve locally,
+        anything else is fetched together with the other lookups made at the same moment.
+
+        @param track_id: the spotify id of the track
+        """
+        json_data = self.track_cache.get(track_id)
+        if json_data is None:
+            json_data = self.cache_track(self.track_batcher.get(track_id))
+        return json_data
+
+    def from_url(self, url):
+        """
+        looks up the track a spotify url points to
+
+        @param url: a spotify track url, parsed locally by tekore
+        """
+        return url_results(self.get_track(tk.from_url(url)[1]))
@@ -0,0 +1,68 @@
+""" This module implements the TrackDeadline class, the adaptive timer of the song that is playing """
+import time
+
+#seconds before the end of a song when playback progress is checked for the last time
+FINAL_WINDOW = 2.0
+
+#the most seconds the next song is started early to make up for how long spotify takes to start it
+MAX_LEAD = 1.0
+
+
+class TrackDeadline:
+    """
+    Keeps track of when the song that is playing will end.
+
+    A timer started when spotify was told to play drifts away from real playback
+    (spotify takes a moment to start, buffers, or was seeked). Instead of trusting
+    it, the scheduler samples spotify's playback progress and corrects the deadline.
+    Samples are taken each time the remaining time halves, so a song costs a handful
+    of API calls and the checks get closer together as the end approaches. The last
+    one lands FINAL_WINDOW seconds before the end, after which the timer is trusted.
+    """
+
+    def __init__(self, duration_ms, position_ms=0, lead=0, clock=time.monotonic):
+        """
+        creates a TrackDeadline object for a song that is starting now
+
+        @param duration_ms: the length of the song
+        @param position_ms: how far into the song playback starts
+        @param lead: seconds before the end to start the next song, the time spotify
+        takes to start a song. Capped at MAX_LEAD
+        @param clock: function returning the current time in seconds
+
+        @attribute deadline: the clock() time at which the song ends
+        @attribute drift: seconds the deadline was moved by the last correction
+        """
+        self.clock = clock
+        self.lead = min(lead, MAX_LEAD)
+        self.deadline = clock() + (duration_ms - position_ms) / 1000
+        self.drift = 0.0
+
+    def remaining(self):
+        """
+        @return: seconds left until the song ends
+        """
+        return self.deadline - self.clock()
+
+    def next_check(self):
+        """
+        @return: a (seconds, final) tuple, how long to sleep before the next progress
+        sample, and whether that sleep runs to the moment the next song should start
+        instead (no more samples)
+        """
+        remaining = self.remaining()
+        if remaining <= FINAL_WINDOW:
+            return max(remaining - self.lead, 0), True
+        return remaining - max(remaining / 2, FINAL_WINDOW), False
+
+    def correct(self, progress_ms, duration_ms, measured_at):
+        """
+        moves the deadline to match a playback progress sample
+
+        @param progress_ms: how far into the song spotify was
+        @param duration_ms: the length of the song according to spotify
+        @param measured_at: the clock() time the sample was taken
+        """
+        deadline = measured_at + (duration_ms - progress_ms) / 1000
+        self.drift = deadline - self.deadline
+        self.deadline = deadline
@@ -2,43 +2,87 @@
 from time import sleep
 
 """ This module allows us to log our errors"""
+import argparse
+import atexit
 import json
 import logging
 import os
 import sys
 
-from flask import Flask, request
+from flask import Blueprint, Flask, Response, current_app, make_response, request
 from flask_cors import CORS, cross_origin
+from werkzeug.local import LocalProxy
 
 path = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(path +"/Spotify_Interface")
 
 import socket
 import threading
-
+import uuid
+
+from PersistenceWorker import PersistenceWorker
+from PlaybackScheduler import PlaybackScheduler
+from QueueBroadcast import QueueBroadcaster
+from QueueChangelog import QueueChangelog
+from QueueJournal import FSYNC_BATCH, QueueJournal
+from QueueSnapshot import QueueSnapshot
 from Song import Song
-from Spotify_Interface.spotify_interface_class import Spotify_Interface_Class
-
-s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-s.connect(("8.8.8.8", 80))
-local_ip = s.getsockname()[0]
-s.close()
-
-print(local_ip)
+from SongQueue import SongQueue
+from spotify_interface_class import get_shared_interface
+
+#port of the Flask server, the website reaches it on REACT_APP_BACKEND_IP
+PORT = 8080
+
+#"waitress" serves the routes from a pool of worker threads, "development" runs
+#Flask's own server, which is meant for debugging only
+SERVERS = ("waitress", "development")
+SERVER = "waitress"
+
+#worker threads of the waitress server
+THREADS = 64
+
+#websites that can watch /queue_stream at once. Every stream holds a worker thread for
+#as long as it is open, so the cap leaves the rest of the pool to the other routes.
+#Websites past it are sent 204 No Content and poll /request_update instead
+MAX_STREAMS = THREADS // 2
+
+#settings of the application, see create_app()
+DEFAULT_CONFIG = {
+        #how the queue create_app() builds is kept, see UniversalQueue
+        "PERSISTENCE": "journal",
+        "WRITE_BEHIND": True,
+        "PREQUEUE": True,
+        #websites that can watch /queue_stream at once, see MAX_STREAMS
+        "MAX_STREAMS": MAX_STREAMS,
+        #the address of the host machine, requests from it are told they are the host
+        "LOCAL_IP": None,
+    }
 
+#the queue and the spotify interface of the application handling the request, see create_app()
+UQ = LocalProxy(lambda: current_app.extensions["universal_queue"])
+SPOTIFY = LocalProxy(lambda: current_app.extensions["spotify"])
 
-app = Flask(__name__)
-CORS(app) 
+routes = Blueprint('routes', __name__)
 
 class UniversalQueue:
     """
     Stores all of the song requests in a queue order
+
+    Flask serves requests on several threads, and the scheduler and persistence
+    threads touch the queue as well. Every change to the queue is made holding
+    self.lock, which is also held while the change is written to disk, and is handed
+    on to the next QueueSnapshot, see stage(). Readers (the website routes,
+    persistence, the scheduler) never take self.lock, so they don't wait on the disk:
+    they grab the snapshot that was published last, which never changes, and only the
+    first read after a change builds the snapshot of the new version. Calls into the
+    scheduler and spotify are made after the lock is released, as the scheduler reads
+    the queue while holding its own lock.
     """
 
-    def __init__(self):
+    def __init__(self, persistence = "file", write_behind = False, prequeue = False, spotify = None):
         """
             creates a Universal Queue object
-            intializes a queue object as an empty list
+            intializes a queue object as an empty SongQueue (ordered, indexed by song id)
             initializes an instance of the spotify interface class
             in order to interact with song playback
 
@@ -46,8 +90,50 @@ class UniversalQueue:
             queue from song requests and false allows
 
             @attribute pause_toggle: a boolean value where true indicates pausing, false is playing                                      
+
+            @attribute broadcaster: pushes the queue to every website listening on /queue_stream
+
+            @attribute version: a counter bumped by every change to the queue, used as the
+            ETag of /request_update together with epoch (unique per server run)
+
+            @attribute changelog: the most recent changes, served by /queue_changes
+
+            @attribute position_ms: where playback of the head song starts or resumes from,
+            see playback_position() for where it has got to
+
+            @attribute scheduler: the PlaybackScheduler thread that plays the queue
+
+            @attribute lock: held by every change to the queue, see the class docstring
+
+            @attribute snapshot_lock: held while a snapshot is built, so only one reader builds it
+
+            @attribute pending_lock: held for a moment to hand a change on to the next snapshot,
+            or to take the changes handed on. Nothing else is done holding it
+
+            @attribute control_lock: held through a whole pause or unpause, so the toggle, the
+            spotify call and the scheduler call of one are never interleaved with the other's
+
+            @param persistence: "file" rewrites Write.json on every change, "journal" appends
+            each change to Write.log and only rewrites Write.json when the log is compacted
+
+            @param write_behind: when True, a PersistenceWorker thread does the disk writes
+            so requests return without waiting on them
+
+            @param prequeue: when True the next song is pushed into the spotify device's
+            queue before the current one ends, so the device changes songs with no gap
+
+            @param spotify: the Spotify_Interface_Class to play through, the shared one
+            (created on first use) when None
         """
-        self.data = []
+        self.data = SongQueue()
+
+        self.lock = threading.RLock()
+
+        self.snapshot_lock = threading.Lock()
+
+        self.pending_lock = threading.Lock()
+
+        self.control_lock = threading.Lock()
 
         #PSUEDO CODE FOR NOW UNTIL MOCK COMES: self.spotify = Spotify_Interface_Class()
 
@@ -60,79 +146,125 @@ class UniversalQueue:
 
         self.idCount = 0
 
-        self.spotify = Spotify_Interface_Class()
+        self.spotify = spotify if spotify is not None else get_shared_interface()
+
+        self.broadcaster = QueueBroadcaster()
+
+        self.version = 0
+
+        self.epoch = uuid.uuid4().hex[:8]
+
+        #the snapshot built last, which the changes in self.pending are applied to
+        self.built = QueueSnapshot(self.version, self.epoch)
+        #changes to self.data since, see stage(), and the version and id counter they lead to
+        self.pending = []
+        self.staged = (self.version, self.idCount)
+        #the QueueSnapshot of the current version, None when a change hasn't been read yet
+        self.current = self.built
+
+        self.changelog = QueueChangelog()
 
-        self.flush_exit = threading.Event()
+        self.position_ms = 0
 
-        self.pause_exit = threading.Event()
+        self.persistence = persistence
+
+        self.journal = None
+        if self.persistence == "journal":
+            #with a persistence worker the worker fsyncs the log, so requests never wait on the disk
+            self.journal = QueueJournal(fsync_every=None if write_behind else FSYNC_BATCH)
+        elif self.persistence != "file":
+            raise ValueError(f"unknown persistence mode {persistence}")
+
+        self.writer = None
+        if write_behind:
+            self.writer = PersistenceWorker(self.persist)
+            atexit.register(self.shutdown)
+
+        self.update_ui() #so websites that connect before the first song get an empty queue
+
+        self.scheduler = PlaybackScheduler(self, prequeue=prequeue)
 
     def insert(self, song, recover = False): 
         """
         When queue not suspended
         inserts a song into the queue with a unique id using the song classes set_id() method
-        and calls update_UI()
+        and calls update_UI(). Returns straight away, the scheduler starts playback
+        when the song reaches the head of the queue.
 
         @param song: a song object that contains all of the attributes needed
         to display info to UI and playback
         """
-        if recover == False:
-            if self.suspend_toggle == False:
-                song.set_id(self.idCount)
-                self.idCount += 1 #update the next id to be unique for the next set
-                self.data.append(song)
-                self.write()
-
-                if len(self.data) == 1:
-                    self.flush_queue()
-            else:
-                raise ValueError('can not insert')
-        else: #special recovery version (doesn't write())
-            if self.suspend_toggle == False:
-                song.set_id(self.idCount)
-                self.idCount += 1 #update the next id to be unique for the next set
-                self.data.append(song)
-
-                if len(self.data) == 1:
-                    self.flush_queue()
-            else:
+        with self.lock:
+            if self.suspend_toggle == True:
                 raise ValueError('can not insert')
+            song.set_id(self.idCount)
+            self.idCount += 1 #update the next id to be unique for the next set
+            self.data.append(song)
+            self.queue_changed({'op': 'insert', 'song': self.song_view(song)}, song)
+            if recover == False: #special recovery version doesn't write()
+                self.write({'op': 'insert', 'song': self.song_record(song)})
+        self.scheduler.notify()
             
 
 
-    def flush_queue(self):
+    def advance(self, song):
         """
-        Goes through queue and plays songs or pauses, updating display queue
-        as necessary by calling update_UI() 
+        called by the scheduler when the song at the head of the queue has finished
+        or was skipped. Removes it and updates the UI.
 
+        @param song: the song that was playing
         """
-        #Queue the song for playback
-        #while the queue is not empty
-        #use the spotify interface instance to play the song at the front of queue
-        #sleep until the song is finished playing, using a time with respect to song.s_len
-        #if puase_queue == True use spotify interface instance to pause and stop timer
-        #when song is finished delete it from queue
-        #call update_UI()
-        #call write()
+        with self.lock:
+            #a restore may have replaced the queue while the song was playing
+            if self.data.peek() is not song:
+                return
+            self.data.popleft()
+            self.position_ms = 0
+            self.queue_changed({'op': 'advance', 'id': song.id})
+            self.write({'op': 'advance', 'id': song.id})
+
+    def record_pause(self, position_ms):
+        """
+        called by the scheduler when playback is paused part way through the head song
 
-        just_unpaused = False
+        @param position_ms: how far into the song playback was paused
+        """
+        with self.lock:
+            self.position_ms = position_ms
+            self.write({'op': 'position', 'position_ms': self.position_ms})
 
-        while len(self.data) != 0:
-            if just_unpaused == False:
-                self.spotify.play(self.data[0].uri)
-            else: 
-                just_unpaused = False
-            self.flush_exit.wait((self.data[0].s_len / 1000))
-            print("WAIT ENDED")
+    def playback_position(self):
+        """
+        read from the local playback state, so it doesn't cost a call to spotify
 
-            if self.pause_toggle == True:
-                remaining_time = self.data[0].s_len - self.spotify.get_current_playback_info().progress_ms
-                self.data[0].s_len = remaining_time
-                self.pause_exit.wait()
-                just_unpaused = True
+        @return: how far into the song at the head of the queue playback is, in milliseconds
+        """
+        #a single read of the head, so it doesn't build a snapshot on every change
+        head = self.data.peek()
+        state = self.spotify.state
+        if head is not None and state.track_id == head.uri:
+            return state.progress_ms()
+        return self.position_ms
+
+    def now_playing(self):
+        """
+        what the "now playing" progress bar shows. Answered from the local playback
+        state, which is only checked against spotify once it is stale.
 
-                continue
-            
-            self.data = self.data[1:]
+        @return: a jsonifiable dictionary of the submissionID of the head song, its
+        progress and length in milliseconds and whether it is playing, or None when
+        the queue is empty
+        """
+        head = self.snapshot().peek()
+        if head is None:
+            return None
+        state = self.spotify.current_state()
+        return {
+                'submissionID': head.id,
+                'progress_ms': self.playback_position(),
+                'duration_ms': head.s_len,
+                'is_playing': state.is_playing and state.track_id == head.uri,
+            }
 
     def pause_queue(self, cookie):
         """
@@ -145,12 +277,14 @@ class UniversalQueue:
         if not self.cookie_is_valid(cookie):
             raise ValueError('invalid id')
 
-        if self.pause_toggle == False:
+        #not the queue lock, which must not be held while calling the scheduler
+        with self.control_lock:
+            if self.pause_toggle == True:
+                return
             self.pause_toggle = True
-            
+
             self.spotify.pause()
-            self.flush_exit.set()
-            self.flush_exit.clear()
+            self.scheduler.pause()
         
 
 
@@ -165,30 +299,136 @@ class UniversalQueue:
         if not self.cookie_is_valid(cookie):
             raise ValueError('invalid id')
 
-        if self.pause_toggle == True:
-            self.pause_toggle = False 
-            
+        with self.control_lock:
+            if self.pause_toggle == False:
+                print("Queue is currently Playing")
+                return
+            self.pause_toggle = False
+
             self.spotify.unpause()
-            self.pause_exit.set()
-            self.pause_exit.clear()
+            self.scheduler.resume()
+
+
+    def queue_view(self):
+        """
+        breaks the queue down into the song data the website queue displays
+        O(n) complexity, where n is len(self.data)
 
+        @return: a list of jsonifiable song dictionaries in queue order
+        """
+        return [self.song_view(song) for song in self.snapshot()]
+
+    def song_view(self, song):
+        """
+        @param song: a song in the queue
 
+        @return: the jsonifiable dictionary the website queue displays for that song
+        """
+        return {
+                'name': song.name,
+                'artist': song.artist,
+                'albumname': song.album,
+                'albumcover': song.image,
+                'submissionID': song.id,
+            }
+
+    def snapshot(self):
+        """
+        returns the queue as of the last change. Changes are only handed on, and the first
+        read after them applies them to the last snapshot and serializes it, O(n) plus the
+        songs that are new. A burst of changes is built once. Reads never take self.lock,
+        so they never wait on a writer or its disk I/O, and reads of a queue that hasn't
+        changed are a reference lookup.
 
+        @return: the current QueueSnapshot, with its version, songs, json and etag
+        """
+        current = self.current
+        if current is not None:
+            return current
+        with self.snapshot_lock:
+            with self.pending_lock:
+                changes, self.pending = self.pending, []
+                version, idCount = self.staged
+            #a reader that held the snapshot lock before us may have built it already
+            if changes:
+                self.built = QueueSnapshot(version, self.epoch, idCount, self.built.apply(changes),
+                                           self.song_view, self.built)
+            with self.pending_lock:
+                #a change made while building needs another build
+                if not self.pending:
+                    self.current = self.built
+            return self.built
+
+    def stage(self, op, value):
+        """
+        hands a change to self.data on to the next snapshot(), with self.lock held. O(1)
+
+        @param op: "insert", "remove" or "restore", see QueueSnapshot.apply()
+        @param value: the song inserted, the id removed or the songs restored
+        """
+        with self.pending_lock:
+            self.pending.append((op, value))
+            self.staged = (self.version, self.idCount)
+            self.current = None
+
+    def queue_changed(self, change, song = None):
+        """
+        called after every mutation of self.data, with self.lock held. Moves the queue on
+        to a new version, records the change in the changelog and sends the queue to the UI.
+
+        @param change: a change dictionary as described in QueueChangelog
+        @param song: the song an insert added
+        """
+        self.version += 1
+        self.changelog.record(self.version, change)
+        if change['op'] == 'insert':
+            self.stage('insert', song)
         else:
-            print("Queue is currently Playing")
+            #advance and remove both take a song out
+            self.stage('remove', change['id'])
+        self.update_ui()
 
+    def changes_since(self, version, epoch=None):
+        """
+        returns what a website needs to bring its copy of the queue up to date.
+        When the changelog no longer reaches back to the given version, or the
+        version comes from a previous server run, the whole queue is sent instead.
+
+        @param version: the last version the website has applied
+        @param epoch: the epoch the website got that version from
+
+        @return: a json string with the epoch and new version and either
+        "changes" (full is false) or the whole "queue" (full is true)
+        """
+        changes = None
+        if version is not None and (epoch is None or epoch == self.epoch):
+            changes, latest = self.changelog.since(version)
+
+        if changes is None:
+            snapshot = self.snapshot()
+            #splice the serialized snapshot in rather than serializing the queue again
+            return '{"epoch": %s, "version": %d, "full": true, "queue": %s}' % (
+                json.dumps(snapshot.epoch), snapshot.version, snapshot.json)
+
+        return json.dumps({'epoch': self.epoch, 'version': latest, 'full': False, 'changes': changes})
 
     def update_ui(self):
         """
-        Sends the current state of the queue to the UI for all users. It will handle requests from users
-        with long polling and will be called after any change is made to the queue. This is due
-        axios only being able to send requests to the back end.
-        
+        Sends the current state of the queue to the UI for all users. Websites subscribe
+        through the /queue_stream Server-Sent Events route, and this is called after any
+        change is made to the queue so they only receive the queue when it changes.
 
-        @return the current state of the queue to all users
+        The queue is serialized when it is next read (by the first subscriber to pick the
+        change up, or the first poll), not by the change, see snapshot().
         """
-        #loop through the users and send them the current state of the queue
-        
+        self.broadcaster.publish(self.queue_json)
+
+    def queue_json(self):
+        """
+        @return: the json list of song views of the current snapshot, what update_ui() sends
+        """
+        return self.snapshot().json
+
     def request_update(self, user):
         """
         allows a specific user to request the current state of the queue to be displayed for them
@@ -214,30 +454,29 @@ class UniversalQueue:
        
         """
         #IMPORTANT removal of first song starts playing next song is checked manually
-        #IMPORTANT this operation is curretnly O(n). Look into making it O(1) with dictionary
+        #songs are looked up by id in the SongQueue index, so removal is O(1)
         if self.cookie_is_valid(cookie):
 
-            for s in self.data:
-                if s.id == id:
-                    #If we're removing the first item in the queue which is currently playing, just kill the
-                    #current wait call on flush queue as it will remove the first item 
-                    if s.id == self.data[0].id:
-                        self.flush_exit.set()
-                        self.flush_exit.clear()
-                        #if the last song is being deleted, stop playback
-                        if len(self.data) == 1:
-                            self.spotify.pause()
-                        
-                    #If we're removing anything else, just remove it from the queue
-                    else:
-                        
-                        self.data.remove(s)
-                        
-                        
-                    self.write()
-                    return
-            #If no song retuns
-            raise ValueError(f"id {id} was not a song in the queue")
+            with self.lock:
+                if id not in self.data:
+                    raise ValueError(f"id {id} was not a song in the queue")
+
+                #If we're removing the first item in the queue which is currently playing, just
+                #tell the scheduler to skip it as it will remove the first item
+                playing = id == self.data.peek().id
+                last = len(self.data) == 1
+
+                #If we're removing anything else, just remove it from the queue
+                if not playing:
+                    self.data.remove(id)
+                    self.queue_changed({'op': 'remove', 'id': id})
+                    self.write({'op': 'remove', 'id': id})
+
+            if playing:
+                self.scheduler.skip(id)
+                #if the last song is being deleted, stop playback
+                if last:
+                    self.spotify.pause()
         else:
             raise ValueError(f"Cookie {cookie} was invalid")
 
@@ -292,87 +531,238 @@ class UniversalQueue:
         sets the queue back to an empty list
         """
 
-    def write(self):
+    def song_record(self, song):
+        """
+        @param song: a song in the queue
+
+        @return: the jsonifiable dictionary a song is journaled as
+        """
+        return {
+                "uri": song.uri,
+                "s_len": song.s_len,
+                "name" : song.name,
+                "album": song.album,
+                "artist": song.artist,
+                "image": song.image,
+                "id": song.id
+            }
+
+    def persisted_state(self):
+        """
+        breaks the queue down into everything needed to resume it exactly after a restart:
+        the songs with their ids and artwork, the id counter, the position in the head song,
+        and the version, which the next run carries on from (under an epoch of its own).
+        Read from the current snapshot, so it doesn't hold up changes to the queue.
+        O(n) complexity, where n is len(self.data)
+
+        @return: a jsonifiable dictionary
+        """
+        snapshot = self.snapshot()
+        return {
+                "version": snapshot.version,
+                "idCount": snapshot.idCount,
+                "position_ms": self.playback_position(),
+                "songs": [self.song_record(song) for song in snapshot]
+            }
+
+    def write(self, record = None):
         """
         Writes the queue to a file in json format on
         the hosts local machine
         O(n) complexity, where n is len(self.data)
 
-        @param file: the file we are writing to, created during startup 
+        In journal persistence mode only the change record is appended to the log,
+        which is O(1), and the whole queue is written when the log is compacted.
+
+        With write_behind the disk work is left to the persistence worker thread,
+        which coalesces a burst of changes into a single write.
+
+        Called with self.lock held, so records reach the journal in version order.
+
+        @param record: the change that was just made to the queue, see QueueJournal
         """ 
+        if self.journal is not None:
+            if record is None:
+                #an explicit write folds the log into a fresh snapshot
+                self.journal.compact(self.persisted_state)
+                return
+            record['version'] = self.version
+            record.setdefault('position_ms', self.playback_position())
+            self.journal.append(record)
+
+        if self.writer is not None:
+            self.writer.mark_dirty()
+        else:
+            self.persist()
+
+    def persist(self):
+        """
+        does the disk work behind write(): compacts the journal when it is due, or
+        rewrites Write.json in file mode. When there is a persistence worker this runs
+        on its thread, which also fsyncs the journal so requests never wait on the disk.
+        """
+        if self.journal is not None:
+            if self.writer is not None:
+                self.journal.sync()
+            if self.journal.needs_compaction():
+                #the state is read inside the journal lock, so no change is logged in between and lost.
+                #Changes take the queue lock before the journal lock, and so does this, as a change
+                #reaches the snapshot before it is logged and would otherwise be replayed twice
+                with self.lock:
+                    self.journal.compact(self.persisted_state)
+            return
 
         #break down the song objects into jsonifiable data
         #write to the file
-        data = []
-        for i in range(len(self.data)):
-            songObject = {
-                    "uri": self.data[i].uri,
-                    "s_len": self.data[i].s_len,
-                    "name" : self.data[i].name,
-                    "album": self.data[i].album,
-                    "artist": self.data[i].artist
-                }
-            data.append(songObject)
+        data = self.persisted_state()
         
-        with open("Write.json", "w") as json_file:
+        #write a temp file and rename it over Write.json so a crash never leaves it truncated
+        with open("Write.json.tmp", "w") as json_file:
                 json.dump(data, json_file)
+                json_file.flush()
+                os.fsync(json_file.fileno())
+        os.replace("Write.json.tmp", "Write.json")
+
+    def shutdown(self):
+        """
+        flush-on-shutdown hook, registered with atexit when there is a persistence
+        worker. Stops the scheduler, writes out every change that is still pending and
+        closes the journal. A queue that was shut down is unregistered, so the hook
+        doesn't keep it alive or write it out again when the interpreter exits
+        """
+        self.scheduler.stop()
+        if self.writer is not None:
+            atexit.unregister(self.shutdown)
+            self.writer.stop()
+        if self.journal is not None:
+            self.journal.close()
  
 
           
 
+    def restore_bulk(self, songs, idCount = 0, position_ms = 0, version = None):
+        """
+        replaces the queue with a list of songs in one pass, used by recover().
+        Songs keep the ids they were persisted with and get a new one otherwise, and
+        the id counter moves past every id in use. Websites are sent the whole queue.
+        O(n) complexity, where n is len(songs)
+
+        @param songs: list of song objects in queue order
+        @param idCount: the persisted id counter
+        @param position_ms: how far into the head song playback had got
+        @param version: the persisted queue version. The version carries on past it, but
+        under the epoch of this server run: changes websites saw may not have reached the
+        disk before a crash, so a version of an old epoch can't be trusted to mean the same
+        queue, and websites are sent the whole queue again
+        """
+        with self.lock:
+            self.idCount = max(self.idCount, idCount)
+            for song in songs:
+                if song.id is not None and song.id >= self.idCount:
+                    self.idCount = song.id + 1
+            for song in songs:
+                if song.id is None:
+                    song.set_id(self.idCount)
+                    self.idCount += 1
+
+            self.data = SongQueue(songs)
+            self.position_ms = position_ms if len(self.data) != 0 else 0
+
+            self.version = max(self.version, version or 0) + 1
+
+            #deltas from before the restore no longer apply
+            self.changelog.clear(self.version)
+            self.stage('restore', tuple(songs))
+            self.update_ui()
+
+            #fold the old log into a fresh snapshot of the restored queue
+            if self.journal is not None:
+                self.journal.compact(self.persisted_state)
+
     def recover(self, instance):
         """
         recovers the current state of the queue. in case of a system crash.
+        The songs are restored into this queue, so no second spotify interface is created.
 
         @param file: the file we are reading from (same file as the one we wrote to)
+
+        @return: this queue, holding the recovered songs
         """
         #when there's a system crash
         #read from the file
-        #re insert all of the song objects back into a new queue
+        #restore all of the song objects back into the queue in one pass
         #update_ui
 
-        #initialize a new queue
-        newUniQueue = UniversalQueue()
-
         try:
-            with open("Write.json", "r+") as json_file:
-                json_file_data = json_file.read()
-                myList = json.loads(json_file_data)
-                for myDict in myList:
-                    myJson = json.dumps(myDict)
-                    SongObject = Song(myJson, True) #need special version of song initializer that takes in just the song data snippet
-                    newUniQueue.insert(SongObject, True) #need special version of insert since it originally rewrites Write.json
-                
-                #update the UI (website queue)
-
-                return newUniQueue
+            if self.journal is not None:
+                #the snapshot with every logged change applied on top
+                myState = self.journal.replay()
+            else:
+                with open("Write.json", "r") as json_file:
+                    myState = json.load(json_file)
 
         except FileNotFoundError:
-            print(f"Error: File 'Write.json' not found.")   
+            print(f"Error: File 'Write.json' not found.")
+            return self
+
+        #files written before the rest of the state was persisted are just the list of songs
+        if isinstance(myState, list):
+            myState = {"songs": myState}
+
+        self.restore_bulk([Song.from_dict(myDict) for myDict in myState["songs"]],
+                          myState.get("idCount", 0), myState.get("position_ms", 0),
+                          myState.get("version"))
+
+        #resume playback of the recovered queue without holding up the caller
+        self.scheduler.notify()
 
+        return self
 
 
-UQ = UniversalQueue()
 
-@app.route('/return_results', methods=['GET', 'POST'])
+def get_local_ip():
+    """
+    @return: the address of this machine on the local network, the one websites reach the server on
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(("8.8.8.8", 80))
+        return s.getsockname()[0]
+    finally:
+        s.close()
+
+@routes.route('/return_results', methods=['GET', 'POST'])
 @cross_origin()
 def return_results():
     search_string = request.args.get('search_string')
-    response = {'search_string': UQ.spotify.return_data(search_string)}
+    response = {'search_string': SPOTIFY.return_data(search_string)}
     print(response)
     return response
 
 
-@app.route('/return_results_from_url', methods=['GET', 'POST'])
+@routes.route('/search_cache_stats', methods=['GET'])
+@cross_origin()
+def search_cache_stats():
+    return dict(SPOTIFY.search_cache.stats(), **SPOTIFY.search_flight.stats())
+
+@routes.route('/spotify_latency_stats', methods=['GET'])
+@cross_origin()
+def spotify_latency_stats():
+    return SPOTIFY.sender.metrics.stats()
+
+@routes.route('/return_results_from_url', methods=['GET', 'POST'])
 @cross_origin()
 def return_results_from_url():
     url = request.args.get('spotify_url')
-    # response = {'spotify_url': UQ.spotify.from_url(url)}
+    # response = {'spotify_url': SPOTIFY.from_url(url)}
 
-    print(UQ.spotify.from_url(url)['results'][0])
+    # look the track up once, repeat urls are answered from the track cache
+    search_results = SPOTIFY.from_url(url)['results'][0]
+    search_results['name'] = search_results['title']
+    print(search_results)
     pre_dump = {
         'status': 200,
-        'search_results': UQ.spotify.from_url(url)['results'][0]
+        'search_results': search_results
     }
     song_data = json.dumps(pre_dump)
     print(song_data)
@@ -381,7 +771,7 @@ def return_results_from_url():
     UQ.insert(song)
     return song_data
 
-@app.route('/submit_song', methods=['GET', 'POST'])
+@routes.route('/submit_song', methods=['GET', 'POST'])
 @cross_origin()
 def submit_song():
 
@@ -400,50 +790,71 @@ def submit_song():
 
 
 
-@app.route('/pause', methods=['GET', 'POST'])
+@routes.route('/pause', methods=['GET', 'POST'])
 @cross_origin()
 def pause_route():
     UQ.pause_queue()
 
-@app.route('/unpause', methods=['GET', 'POST'])
+@routes.route('/unpause', methods=['GET', 'POST'])
 @cross_origin()
 def unpause_route():
     UQ.unpause_queue()
 
-@app.route('/request_update', methods=['GET', 'POST'])
+@routes.route('/request_update', methods=['GET', 'POST'])
 @cross_origin()
 def update_visual_queue():
 
-    # current_queue_data = UQ.datak
-    # current_queue_data = json.dumps(current_queue_data)
-    data = []
-    for i in range(len(UQ.data)):
-        songObject = {
-                'name': UQ.data[i].name,
-                'artist': UQ.data[i].artist,
-                'albumname': UQ.data[i].album,
-                'albumcover': UQ.data[i].image,
-                'submissionID': UQ.data[i].id,
-                    }
-        # print( "NAMENAMENAMENAMENAMENANEMEANE " + UQ.data[i].name, songObject['name'])
-        data.append(songObject)
-
-    jsonData = json.dumps(data)
+    snapshot = UQ.snapshot()
     # print('#################' + jsonData + '#################')
-    return jsonData
 
-@app.route('/verify_host', methods=['GET', 'POST'])
+    # the queue only changes when its version does, so a client that already has
+    # this version gets a 304 Not Modified without a body
+    response = make_response(snapshot.json)
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@routes.route('/queue_changes', methods=['GET'])
+@cross_origin()
+def queue_changes():
+    # only the operations applied since ?since=<version>, or the full queue if that is too far back
+    since = request.args.get('since', type=int)
+    epoch = request.args.get('epoch')
+    return Response(UQ.changes_since(since, epoch), mimetype='application/json')
+
+@routes.route('/now_playing', methods=['GET'])
+@cross_origin()
+def now_playing():
+    # where the head song has got to, for a progress bar the website animates locally
+    return {'now_playing': UQ.now_playing()}
+
+@routes.route('/queue_stream', methods=['GET'])
+@cross_origin()
+def queue_stream():
+    # one long lived response per website, written to only when the queue changes
+    broadcaster = UQ.broadcaster
+    mailbox = broadcaster.subscribe(current_app.config["MAX_STREAMS"])
+    if mailbox is None:
+        # every stream holds a worker thread, past the cap the website polls instead
+        return Response(status=204)
+    response = Response(broadcaster.stream(mailbox=mailbox), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # the server closes the response when the client goes, even if the stream never started
+    response.call_on_close(lambda: broadcaster.unsubscribe(mailbox))
+    return response
+
+@routes.route('/verify_host', methods=['GET', 'POST'])
 @cross_origin()
 def verify_host():
     if request.method == 'GET':
         incomingIP = request.remote_addr
-        if incomingIP == local_ip:
+        if incomingIP == current_app.config["LOCAL_IP"]:
             return {"updateIsHost": True, "updateCookie": UQ.hostCookie}
         else:
             return {"updateIsHost": False, "updateCookie": ""}
 
 
-@app.route('/remove_song', methods=['GET', 'POST'])
+@routes.route('/remove_song', methods=['GET', 'POST'])
 @cross_origin()
 def remove_song():
     id_to_remove = int(request.json['id'])
@@ -451,35 +862,117 @@ def remove_song():
     UQ.remove_from_queue(id_to_remove, cookie)
     return str(id)
 
-@app.route('/suspend_queue', methods=['GET', 'POST'])
+@routes.route('/suspend_queue', methods=['GET', 'POST'])
 @cross_origin()
 def suspend_queue():
     cookie =request.json['cookie']
     UQ.set_suspend_toggle(True, cookie)
     return ""
 
-@app.route('/unsuspend_queue', methods=['GET', 'POST'])
+@routes.route('/unsuspend_queue', methods=['GET', 'POST'])
 @cross_origin()
 def unsuspend_queue():
     cookie =request.json['cookie']
     UQ.set_suspend_toggle(False, cookie)
     return ""
 
-@app.route('/pause_music', methods=['GET', 'POST'])
+@routes.route('/pause_music', methods=['GET', 'POST'])
 @cross_origin()
 def pause_music():
     cookie =request.json['cookie']
     UQ.pause_queue(cookie)
     return ""
 
-@app.route('/unpause_music', methods=['GET', 'POST'])
+@routes.route('/unpause_music', methods=['GET', 'POST'])
 @cross_origin()
 def unpause_music():
     cookie =request.json['cookie']
     UQ.unpause_queue(cookie)
     return ""
 
-with open(path + '/../m3-frontend/.env', 'w') as f_obj:
-    f_obj.write('REACT_APP_BACKEND_IP="'+local_ip+'"')
 
-app.run(host = '0.0.0.0', port=8080) 
+
+def create_app(queue = None, spotify = None, config = None):
+    """
+    builds the Flask application serving the Universal Queue routes. Creating it
+    doesn't start a server, see serve(). The routes use the queue and spotify
+    interface they are given, so the same application runs against spotify or
+    against a FakeSpotifyInterface for tests and load generation.
+
+    @param queue: the UniversalQueue the routes serve. When None one is built from
+    the PERSISTENCE, WRITE_BEHIND and PREQUEUE settings, playing through spotify
+    @param spotify: the spotify interface searches and url lookups go through, the
+    queue's when None (the shared Spotify_Interface_Class when both are None)
+    @param config: a dictionary of settings that replace those in DEFAULT_CONFIG,
+    and of any Flask settings
+
+    @return: the Flask application
+    """
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config or {})
+
+    if queue is None:
+        queue = UniversalQueue(app.config["PERSISTENCE"], app.config["WRITE_BEHIND"],
+                               app.config["PREQUEUE"], spotify)
+    app.extensions["universal_queue"] = queue
+    app.extensions["spotify"] = spotify if spotify is not None else queue.spotify
+
+    CORS(app)
+    app.register_blueprint(routes)
+    return app
+
+
+def serve(app, server = SERVER, threads = THREADS, port = PORT):
+    """
+    serves the application on every interface until interrupted
+
+    @param app: the Flask application, see create_app()
+    @param server: one of SERVERS
+    @param threads: the number of worker threads of the waitress server
+    @param port: the port to listen on
+    """
+    if server == "waitress":
+        #only needed by the production server, the development server runs without it
+        import waitress
+        #waitress sends every write straight out, so /queue_stream events aren't held back
+        waitress.serve(app, host = '0.0.0.0', port = port, threads = threads)
+    elif server == "development":
+        app.run(host = '0.0.0.0', port = port, threaded = True)
+    else:
+        raise ValueError(f"unknown server {server}, expected one of {SERVERS}")
+
+
+def main(server = SERVER, threads = THREADS):
+    """
+    runs the Universal Queue server until interrupted: recovers the queue from the last
+    run, points the website at this machine and serves the routes on PORT.
+    Nothing happens when this module is only imported.
+
+    @param server: one of SERVERS
+    @param threads: the number of worker threads of the waitress server
+    """
+    local_ip = get_local_ip()
+    print(local_ip)
+
+    app = create_app(config = {"LOCAL_IP": local_ip, "MAX_STREAMS": threads // 2})
+    queue = app.extensions["universal_queue"]
+    #find the playback device now, so a missing device stops the server before it starts
+    queue.spotify.find_device()
+
+    #pick up where the last run left off: same ids, same artwork, same place in the current song
+    queue.recover(None)
+
+    with open(path + '/../m3-frontend/.env', 'w') as f_obj:
+        f_obj.write('REACT_APP_BACKEND_IP="'+local_ip+'"')
+
+    serve(app, server, threads)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "runs the Universal Queue server")
+    parser.add_argument("--server", choices = SERVERS, default = SERVER)
+    parser.add_argument("--threads", type = int, default = THREADS)
+    args = parser.parse_args()
+    main(args.server, args.threads)
+ 
@@ -0,0 +1,79 @@
+""" This module implements the asyncio search server, which answers song searches without a thread per request """
+import os
+import sys
+
+from aiohttp import web
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from async_interface import AsyncSpotifyInterface
+
+#the Flask server keeps 8080, the website sends searches here when REACT_APP_SEARCH_PORT is set
+SEARCH_PORT = 8081
+
+SPOTIFY = web.AppKey("spotify", AsyncSpotifyInterface)
+
+
+@web.middleware
+async def cors(request, handler):
+    """
+    allows the website, served from another port, to call the search server
+    """
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = '*'
+    return response
+
+
+async def return_results(request):
+    search_string = request.query.get('search_string', '')
+    spotify = request.app[SPOTIFY]
+    return web.json_response({'search_string': await spotify.return_data(search_string)})
+
+
+async def search_cache_stats(request):
+    spotify = request.app[SPOTIFY]
+    return web.json_response(dict(spotify.search_cache.stats(), **spotify.search_flight.stats()))
+
+
+async def spotify_latency_stats(request):
+    return web.json_response(request.app[SPOTIFY].sender.metrics.stats())
+
+
+def create_app(spotify):
+    """
+    builds the search server
+
+    @param spotify: the AsyncSpotifyInterface the searches go through
+    @return: the aiohttp application
+    """
+    app = web.Application(middlewares=[cors])
+    app[SPOTIFY] = spotify
+    app.router.add_route('*', '/return_results', return_results)
+    app.router.add_get('/search_cache_stats', search_cache_stats)
+    app.router.add_get('/spotify_latency_stats', spotify_latency_stats)
+
+    async def close_spotify(app):
+        await app[SPOTIFY].close()
+
+    app.on_cleanup.append(close_spotify)
+    return app
+
+
+async def start():
+    return create_app(await AsyncSpotifyInterface.create())
+
+
+def main(port=SEARCH_PORT):
+    """
+    runs the search server until interrupted
+    """
+    web.run_app(start(), host='0.0.0.0', port=port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+""" This module benchmarks the SongQueue against the plain list the Universal Queue used to store songs in """
+import os
+import sys
+import timeit
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/..")
+
+from SongQueue import SongQueue
+
+N = 10000
+
+
+class BenchSong:
+    """
+    stand-in for Song that only carries the id the queue operations look at
+    """
+
+    def __init__(self, id):
+        self.id = id
+
+
+def list_remove_by_id(data, id):
+    """
+    the old remove_from_queue lookup: linear scan followed by list.remove
+    """
+    for s in data:
+        if s.id == id:
+            data.remove(s)
+            return
+
+
+def bench_list():
+    data = [BenchSong(i) for i in range(N)]
+
+    #remove every other song from the back half, the way a host would prune the queue
+    for id in range(N // 2, N, 2):
+        list_remove_by_id(data, id)
+
+    #then let the rest of the songs finish playing
+    while len(data) != 0:
+        data = data[1:]
+
+
+def bench_song_queue():
+    data = SongQueue(BenchSong(i) for i in range(N))
+
+    for id in range(N // 2, N, 2):
+        data.remove(id)
+
+    while len(data) != 0:
+        data.popleft()
+
+
+if __name__ == "__main__":
+    repeat = 3
+    list_time = min(timeit.repeat(bench_list, number=1, repeat=repeat))
+    queue_time = min(timeit.repeat(bench_song_queue, number=1, repeat=repeat))
+
+    print(f"{N} songs, {N // 4} removals by id, then drained from the head (best of {repeat})")
+    print(f"list:      {list_time * 1000:10.2f} ms")
+    print(f"SongQueue: {queue_time * 1000:10.2f} ms")
+    print(f"speedup:   {list_time / queue_time:10.1f}x")
@@ -0,0 +1,107 @@
+""" This module stress tests the Universal Queue from many threads against an in-memory spotify, measuring write and read throughput """
+import os
+import sys
+import tempfile
+import threading
+import time
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/..")
+
+from fixtures import make_song
+from UniversalQueueDesign import UniversalQueue
+from fake_interface import FakeSpotifyInterface
+
+WRITERS = 8
+READERS = 8
+DURATION = 3.0
+
+#songs each writer keeps queued, so the queue stays the size of a busy party
+BACKLOG = 25
+
+#seconds a reader waits between polls. Each reader thread stands in for many websites,
+#a reader that never sleeps only measures how the GIL is shared out
+READ_INTERVAL = 0.001
+
+
+def writer(queue, stop, counts, index):
+    """
+    a guest submitting songs as fast as it can, and the host removing them again
+    """
+    mine = []
+    ops = 0
+    while not stop.is_set():
+        song = make_song(index)
+        queue.insert(song)
+        mine.append(song.id)
+        ops += 1
+        if len(mine) > BACKLOG:
+            queue.remove_from_queue(mine.pop(0), queue.hostCookie)
+            ops += 1
+    counts[index] = ops
+
+
+def reader(queue, stop, counts, latencies, index):
+    """
+    websites polling /request_update and /queue_changes
+    """
+    ops = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        snapshot = queue.snapshot()
+        queue.changes_since(snapshot.version - 1, snapshot.epoch)
+        latencies[index].append(time.perf_counter() - started)
+        ops += 1
+        time.sleep(READ_INTERVAL)
+    counts[index] = ops
+
+
+def run(writers, readers, duration=DURATION):
+    """
+    @return: (writes per second, reads per second, 99th percentile read in milli seconds, the queue)
+    """
+    queue = UniversalQueue(persistence="journal", write_behind=True, spotify=FakeSpotifyInterface())
+    #a head song that is never removed, so removals don't go through the scheduler
+    queue.insert(make_song(-1))
+
+    stop = threading.Event()
+    write_counts = [0] * writers
+    read_counts = [0] * readers
+    latencies = [[] for i in range(readers)]
+    threads = [threading.Thread(target=writer, args=(queue, stop, write_counts, i)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(queue, stop, read_counts, latencies, i)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    queue.shutdown()
+
+    reads = sorted(latency for samples in latencies for latency in samples)
+    p99 = reads[int(len(reads) * 0.99)] * 1000 if reads else 0.0
+    return sum(write_counts) / duration, sum(read_counts) / duration, p99, queue
+
+
+def check(queue):
+    """
+    every id handed out once, the queue holds what the journal holds
+    """
+    ids = [song.id for song in queue.data]
+    assert len(ids) == len(set(ids)), "duplicate ids"
+    assert queue.idCount > max(ids), "id counter fell behind"
+    replayed = queue.journal.replay()
+    assert [song["id"] for song in replayed["songs"]] == ids, "journal lost a change"
+
+
+if __name__ == "__main__":
+    print(f"{WRITERS} writer and {READERS} reader threads for {DURATION:.0f}s each, in-memory spotify")
+    print(f"{'workload':<22}{'writes/s':>12}{'reads/s':>12}{'p99 read ms':>16}")
+    for name, writers, readers in (("writers only", WRITERS, 0), ("readers only", 0, READERS),
+                                   ("mixed", WRITERS, READERS)):
+        #a fresh Write.json and Write.log for every run
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            writes, reads, worst, queue = run(writers, readers)
+            check(queue)
+            print(f"{name:<22}{writes:>12.0f}{reads:>12.0f}{worst:>16.2f}")
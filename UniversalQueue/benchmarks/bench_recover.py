@@ -0,0 +1,120 @@
+""" This module benchmarks restoring a 50k song queue with UniversalQueue.recover() in file and journal mode, against the old per-song recover path """
+import json
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/..")
+
+from QueueJournal import COMPACT_EVERY
+from Song import Song
+from SongQueue import SongQueue
+from UniversalQueueDesign import UniversalQueue
+from fake_interface import FakeSpotifyInterface
+
+N = 50000
+
+
+def make_write_file(file_name):
+    data = []
+    for i in range(N):
+        data.append({
+                "uri": "5oD2Z1OOx1Tmcu2mc9sLY2",
+                "s_len": 4933,
+                "name" : "You Suffer",
+                "album": "Scum",
+                "artist": "Napalm Death",
+                "image": "https://i.scdn.co/image/ab67616d0000b273",
+                "id": i
+            })
+    with open(file_name, "w") as json_file:
+        json.dump(data, json_file)
+
+
+def old_recover(file_name):
+    """
+    the old recover(): every song dictionary is dumped back to json, parsed again by
+    Song(..., True) and inserted one at a time with a fresh id
+    """
+    data = SongQueue()
+    idCount = 0
+    with open(file_name, "r+") as json_file:
+        myList = json.loads(json_file.read())
+        for myDict in myList:
+            myJson = json.dumps(myDict)
+            SongObject = Song(myJson, True)
+            SongObject.set_id(idCount)
+            idCount += 1
+            data.append(SongObject)
+    return data
+
+
+def write_journal(directory, logged=COMPACT_EVERY - 1):
+    """
+    the journal of a queue of N songs that hasn't been compacted for a while: a snapshot
+    of the first N - logged songs and a log with an insert record for each of the rest
+    """
+    file_name = os.path.join(directory, "Write.json")
+    make_write_file(file_name)
+    with open(file_name) as json_file:
+        songs = json.load(json_file)
+    with open(file_name, "w") as json_file:
+        json.dump({"version": N - logged, "idCount": N - logged, "position_ms": 0,
+                   "songs": songs[:N - logged]}, json_file)
+    with open(os.path.join(directory, "Write.log"), "w") as log_file:
+        for song in songs[N - logged:]:
+            log_file.write(json.dumps({"op": "insert", "song": song}, separators=(",", ":")) + "\n")
+
+
+def time_restore(directory, persistence, repeat):
+    """
+    times UniversalQueue.recover(), which hands the songs to restore_bulk(), and the
+    first read of the restored queue, which builds and serializes its snapshot. The files
+    are written again before every run, as a journal restore compacts them
+
+    @return: the best (recover, first read) times in seconds
+    """
+    best = None
+    for i in range(repeat):
+        if persistence == "journal":
+            write_journal(directory)
+        else:
+            make_write_file(os.path.join(directory, "Write.json"))
+        queue = UniversalQueue(persistence=persistence, spotify=FakeSpotifyInterface())
+        #the scheduler would start playing the restored queue
+        queue.scheduler.stop()
+
+        started = time.perf_counter()
+        queue.recover(None)
+        restored = time.perf_counter()
+        queue.snapshot()
+        elapsed = (restored - started, time.perf_counter() - restored)
+
+        assert len(queue.data) == N
+        queue.shutdown()
+        best = elapsed if best is None or sum(elapsed) < sum(best) else best
+    return best
+
+
+if __name__ == "__main__":
+    repeat = 3
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "Write.json")
+        make_write_file(file_name)
+        old_time = min(timeit.repeat(lambda: old_recover(file_name), number=1, repeat=repeat))
+
+        #recover() reads Write.json and Write.log from the working directory
+        os.chdir(directory)
+        file_time = time_restore(directory, "file", repeat)
+        journal_time = time_restore(directory, "journal", repeat)
+
+    #the old path also built a second UniversalQueue, and with it a second Spotify client,
+    #which costs network round trips on top of the times below
+    print(f"restoring {N} songs (best of {repeat}), in ms")
+    print(f"{'':<32}{'recover':>10}{'first read':>12}")
+    print(f"{'old per-song json round trip':<32}{old_time * 1000:>10.2f}")
+    for name, (restore, read) in (("recover(), file mode", file_time), ("recover(), journal mode", journal_time)):
+        print(f"{name:<32}{restore * 1000:>10.2f}{read * 1000:>12.2f}")
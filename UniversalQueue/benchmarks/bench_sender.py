@@ -0,0 +1,62 @@
+""" This module benchmarks the PooledSender against a sender that opens a new connection per call """
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import sys
+import threading
+import timeit
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/../Spotify_Interface")
+
+import httpx
+import tekore as tk
+from sender import PooledSender
+
+N = 500
+
+
+class StubSpotify(BaseHTTPRequestHandler):
+    """
+    stand-in for the spotify API: answers every call with a small json body over HTTP/1.1
+    """
+    protocol_version = "HTTP/1.1"
+    #headers and body are written separately, without this delayed acks stall every kept-alive call
+    disable_nagle_algorithm = True
+    body = b'{"id": "5oD2Z1OOx1Tmcu2mc9sLY2", "name": "stub"}'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench(sender, url):
+    request = tk.Request(method="GET", url=url + "/v1/tracks/5oD2Z1OOx1Tmcu2mc9sLY2")
+    for _ in range(N):
+        sender.send(request)
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSpotify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    #keep-alive disabled, every call pays for a new connection the way it does without a pool
+    transient = PooledSender(httpx.Client(limits=httpx.Limits(max_keepalive_connections=0)))
+    pooled = PooledSender()
+
+    repeat = 3
+    transient_time = min(timeit.repeat(lambda: bench(transient, url), number=1, repeat=repeat))
+    pooled_time = min(timeit.repeat(lambda: bench(pooled, url), number=1, repeat=repeat))
+
+    print(f"{N} calls to a local stub server (best of {repeat})")
+    print(f"new connection per call: {transient_time * 1000:10.2f} ms")
+    print(f"PooledSender:            {pooled_time * 1000:10.2f} ms")
+    print(f"speedup:                 {transient_time / pooled_time:10.1f}x")
+    print(pooled.metrics.stats())
+    server.shutdown()
@@ -0,0 +1,221 @@
+""" This module drives the Flask application with simulated guests against an in-memory spotify, in process or over HTTP """
+import argparse
+import contextlib
+import cProfile
+import http.client
+import json
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/..")
+
+from UniversalQueueDesign import UniversalQueue, create_app
+from fake_interface import FakeSpotifyInterface
+
+GUESTS = 32
+DURATION = 5.0
+
+#seconds a guest waits between requests, a website polls about once a second
+THINK_TIME = 0.01
+
+#what a guest does on each turn, the rest of the time it polls the queue
+SEARCH_SHARE = 0.2
+SUBMIT_SHARE = 0.05
+
+#the host removes songs beyond this many, so the queue stays the size of a busy party
+MAX_QUEUE = 60
+
+QUERIES = ["taylor swift", "queen", "daft punk", "abba", "the beatles", "beyonce", "drake", "adele"]
+
+
+class InProcessClient:
+    """
+    sends requests straight into the application through Flask's test client, so only
+    the application is measured (and profiled), not sockets or a server
+    """
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, url, headers=None):
+        response = self.client.get(url, headers=headers)
+        return response.status_code, response.headers, response.data
+
+    def post(self, url, payload):
+        response = self.client.post(url, json=payload)
+        return response.status_code, response.headers, response.data
+
+
+class HttpClient:
+    """
+    sends requests to a running server over a keep-alive connection
+    """
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection("127.0.0.1", port)
+
+    def request(self, method, url, body=None, headers=None):
+        self.connection.request(method, url, body=body, headers=headers or {})
+        response = self.connection.getresponse()
+        return response.status, response.headers, response.read()
+
+    def get(self, url, headers=None):
+        return self.request("GET", url, headers=headers)
+
+    def post(self, url, payload):
+        return self.request("POST", url, json.dumps(payload), {"Content-Type": "application/json"})
+
+
+class Guest:
+    """
+    a website: polls the queue with its ETag, searches, and now and then submits a song
+    """
+
+    def __init__(self, client, seed, timings):
+        self.client = client
+        self.random = random.Random(seed)
+        self.timings = timings
+        self.etag = None
+        self.results = []
+
+    def timed(self, route, send):
+        started = time.perf_counter()
+        status, headers, body = send()
+        self.timings.setdefault(route, []).append(time.perf_counter() - started)
+        return status, headers, body
+
+    def turn(self):
+        roll = self.random.random()
+        if roll < SUBMIT_SHARE and self.results:
+            song = self.random.choice(self.results)
+            self.timed("/submit_song", lambda: self.client.post("/submit_song", {"status": 200, "search_results": song}))
+        elif roll < SUBMIT_SHARE + SEARCH_SHARE:
+            query = self.random.choice(QUERIES)
+            status, headers, body = self.timed("/return_results", lambda: self.client.get(
+                    "/return_results?search_string=" + query.replace(" ", "%20")))
+            self.results = json.loads(body)["search_string"]["results"]
+        else:
+            headers = {"If-None-Match": self.etag} if self.etag else {}
+            status, headers, body = self.timed("/request_update", lambda: self.client.get("/request_update", headers))
+            self.etag = headers.get("ETag", self.etag)
+
+
+def host(queue, stop):
+    """
+    the host, taking the oldest songs behind the one playing off a queue that grows too long
+    """
+    while not stop.is_set():
+        songs = queue.snapshot().songs
+        for song in songs[1:len(songs) - MAX_QUEUE + 1]:
+            try:
+                queue.remove_from_queue(song.id, queue.hostCookie)
+            except ValueError:
+                pass
+        stop.wait(0.05)
+
+
+def run(queue, make_client, guests=GUESTS, duration=DURATION, profiler=None):
+    """
+    @param profiler: a cProfile.Profile. It only sees the thread it runs on, so a single
+    guest then makes its requests from this thread back to back
+
+    @return: dictionary from route to the list of request durations in seconds
+    """
+    stop = threading.Event()
+    timings = [{} for i in range(guests)]
+
+    def visit(index):
+        guest = Guest(make_client(), index, timings[index])
+        while not stop.is_set():
+            guest.turn()
+            time.sleep(THINK_TIME)
+
+    threads = [threading.Thread(target=host, args=(queue, stop))]
+    if profiler is None:
+        threads += [threading.Thread(target=visit, args=(i,)) for i in range(guests)]
+    for thread in threads:
+        thread.start()
+
+    if profiler is None:
+        time.sleep(duration)
+    else:
+        guest = Guest(make_client(), 0, timings[0])
+        end = time.monotonic() + duration
+        profiler.enable()
+        while time.monotonic() < end:
+            guest.turn()
+        profiler.disable()
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    merged = {}
+    for guest_timings in timings:
+        for route, samples in guest_timings.items():
+            merged.setdefault(route, []).extend(samples)
+    return merged
+
+
+def report(timings, duration):
+    print(f"{'route':<20}{'requests/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for route, samples in sorted(timings.items()):
+        samples.sort()
+        p50 = samples[len(samples) // 2] * 1000
+        p99 = samples[int(len(samples) * 0.99)] * 1000
+        print(f"{route:<20}{len(samples) / duration:>12.0f}{p50:>10.2f}{p99:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--guests", type=int, default=GUESTS)
+    parser.add_argument("--duration", type=float, default=DURATION)
+    parser.add_argument("--http", action="store_true", help="serve the application with waitress and send real requests")
+    parser.add_argument("--threads", type=int, default=64, help="waitress worker threads, with --http")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every fake spotify call takes")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile a single guest making requests back to back and print the top functions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        #Write.json and Write.log land in a scratch directory
+        os.chdir(directory)
+        spotify = FakeSpotifyInterface(args.latency)
+        queue = UniversalQueue(persistence="journal", write_behind=True, spotify=spotify)
+        app = create_app(queue)
+
+        server = None
+        if args.http:
+            import waitress
+            server = waitress.create_server(app, host="127.0.0.1", port=0, threads=args.threads)
+            threading.Thread(target=server.run, daemon=True).start()
+            make_client = lambda: HttpClient(server.effective_port)
+        else:
+            make_client = lambda: InProcessClient(app)
+
+        profiler = cProfile.Profile() if args.profile else None
+        guests = 1 if args.profile else args.guests
+        #the routes print every request, which would swamp the numbers
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            timings = run(queue, make_client, guests, args.duration, profiler)
+
+        if server is not None:
+            server.close()
+        queue.shutdown()
+
+    print(f"{guests} guests for {args.duration:.0f}s, {'waitress' if args.http else 'in process'}, "
+          f"spotify latency {args.latency * 1000:.0f} ms, {len(queue.data)} songs queued at the end")
+    report(timings, args.duration)
+    print(f"spotify calls: {dict(spotify.calls)}")
+    if profiler is not None:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+
+if __name__ == "__main__":
+    main()
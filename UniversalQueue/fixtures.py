@@ -0,0 +1,11 @@
+""" This module holds the fixtures shared by the tests and benchmarks of the Universal Queue """
+from Song import Song
+
+
+def make_song(i):
+    """
+    @param i: the number the song is named after
+    @return: a song long enough that the scheduler never moves on during a test or benchmark
+    """
+    return Song.from_dict({"uri": "uri%d" % i, "s_len": 600000, "name": "song%d" % i,
+                           "album": "album", "artist": "artist", "image": "cover"})
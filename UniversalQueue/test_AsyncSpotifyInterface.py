@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+import httpx
+from aiohttp.test_utils import TestClient, TestServer
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from async_interface import AsyncSpotifyInterface
+from async_server import create_app
+from sender import AsyncPooledSender
+
+def artist_json(name):
+    return {'id': 'a' * 22, 'href': 'h', 'type': 'artist', 'uri': 'u', 'external_urls': {}, 'name': name}
+
+def track_json(track_id, name):
+    return {'id': track_id, 'href': 'h', 'type': 'track', 'uri': 'spotify:track:' + track_id,
+            'artists': [artist_json('Queen')], 'disc_number': 1, 'duration_ms': 1000,
+            'explicit': False, 'external_urls': {}, 'is_local': False, 'name': name,
+            'preview_url': None, 'track_number': 1, 'external_ids': {}, 'popularity': 1,
+            'album': {'id': 'b' * 22, 'href': 'h', 'type': 'album', 'uri': 'u', 'album_type': 'album',
+                      'artists': [artist_json('Queen')], 'external_urls': {},
+                      'images': [{'url': 'cover', 'height': 1, 'width': 1}], 'name': 'A Night at the Opera',
+                      'total_tracks': 1, 'release_date': '1975', 'release_date_precision': 'year'}}
+
+class TestAsyncSpotifyInterface(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            if request.url.path == '/v1/search':
+                return httpx.Response(200, json={'tracks': {
+                    'href': 'h', 'items': [track_json('5oD2Z1OOx1Tmcu2mc9sLY2', 'Bohemian Rhapsody')],
+                    'limit': 5, 'next': None, 'offset': 0, 'previous': None, 'total': 1}})
+            if request.url.path == '/v1/tracks':
+                ids = request.url.params['ids'].split(',')
+                return httpx.Response(200, json={'tracks': [track_json(i, 'track ' + i) for i in ids]})
+            return httpx.Response(204)
+
+        sender = AsyncPooledSender(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        self.spotify = AsyncSpotifyInterface('token', 'device', sender=sender)
+
+    async def asyncTearDown(self):
+        await self.spotify.close()
+
+    async def test_return_data_is_cached(self):
+        data = await self.spotify.return_data('Bohemian  rhapsody')
+        self.assertEqual(data['results'][0]['title'], 'Bohemian Rhapsody')
+        self.assertEqual(data['results'][0]['image'], 'cover')
+        self.assertEqual(await self.spotify.return_data('bohemian rhapsody'), data)
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_from_url_batches_and_caches(self):
+        urls = ['https://open.spotify.com/track/' + c * 22 for c in 'cde']
+        results = await asyncio.gather(*(self.spotify.from_url(url) for url in urls))
+        self.assertEqual([r['results'][0]['uri'] for r in results], [c * 22 for c in 'cde'])
+        self.assertEqual(len(self.requests), 1)
+
+        await self.spotify.from_url(urls[0])
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_play(self):
+        self.assertEqual(await self.spotify.play('c' * 22), 0)
+        self.assertEqual(self.requests[0].url.path, '/v1/me/player/play')
+        self.assertEqual(self.requests[0].url.params['device_id'], 'device')
+
+    async def test_optimistic_pause_and_unpause_are_one_call(self):
+        self.assertEqual(await self.spotify.pause(), 0)
+        self.assertEqual(await self.spotify.unpause(), 0)
+        self.assertEqual([r.url.path for r in self.requests], ['/v1/me/player/pause', '/v1/me/player/play'])
+        self.assertTrue(self.spotify.state.is_playing)
+
+    async def test_confirmed_unpause_reports_a_mismatch(self):
+        self.spotify.optimistic = False
+        #the device reports that nothing is playing
+        self.assertEqual(await self.spotify.unpause(), 1)
+        self.assertEqual([r.url.path for r in self.requests], ['/v1/me/player/play', '/v1/me/player'])
+        self.assertIsNone(self.spotify.pending_check)
+
+    @patch('async_interface.VERIFY_DELAY', 0)
+    async def test_burst_of_commands_is_checked_once(self):
+        await self.spotify.pause()
+        task = self.spotify.pending_check
+        await self.spotify.unpause()
+        await self.spotify.seek(1000)
+        self.assertIs(self.spotify.pending_check, task)
+
+        await task
+        paths = [r.url.path for r in self.requests]
+        self.assertEqual(paths.count('/v1/me/player/currently-playing'), 1)
+        #the check found nothing playing
+        self.assertFalse(self.spotify.state.is_playing)
+
+    async def test_search_server(self):
+        async with TestClient(TestServer(create_app(self.spotify))) as client:
+            response = await client.get('/return_results', params={'search_string': 'queen'})
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.headers['Access-Control-Allow-Origin'], '*')
+            body = await response.json()
+            self.assertEqual(body['search_string']['results'][0]['artist'], 'Queen')
+
+            response = await client.get('/spotify_latency_stats')
+            self.assertEqual((await response.json())['GET /v1/search']['count'], 1)
+
+if __name__ == "__main__":
+    unittest.main()
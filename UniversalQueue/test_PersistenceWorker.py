@@ -0,0 +1,64 @@
+import unittest
+import threading
+import time
+from PersistenceWorker import PersistenceWorker
+
+class TestPersistenceWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.writes = 0
+        self.written = threading.Event()
+
+    def persist(self):
+        self.writes += 1
+        self.written.set()
+
+    def test_coalesce(self):
+        worker = PersistenceWorker(self.persist, window=0.05)
+
+        #a burst of changes inside the window is written once
+        for _ in range(100):
+            worker.mark_dirty()
+
+        self.assertTrue(self.written.wait(1))
+        time.sleep(0.1)
+        self.assertEqual(self.writes, 1)
+
+        worker.stop()
+
+    def test_idle(self):
+        worker = PersistenceWorker(self.persist, window=0.01)
+        time.sleep(0.05)
+        self.assertEqual(self.writes, 0)
+        worker.stop()
+
+    def test_flush_on_stop(self):
+        #a long window, so only the shutdown hook can have written the change
+        worker = PersistenceWorker(self.persist, window=60)
+        worker.mark_dirty()
+
+        start = time.time()
+        worker.stop()
+
+        self.assertEqual(self.writes, 1)
+        self.assertLess(time.time() - start, 5)
+        self.assertFalse(worker.thread.is_alive())
+
+    def test_failed_write_is_retried(self):
+        attempts = []
+
+        def persist():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("disk full")
+            self.written.set()
+
+        worker = PersistenceWorker(persist, window=0.01)
+        worker.mark_dirty()
+
+        self.assertTrue(self.written.wait(1))
+        self.assertEqual(len(attempts), 2)
+        worker.stop()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,254 @@
+import os
+import sys
+import time
+import unittest
+from PlaybackScheduler import PlaybackScheduler
+from QueueSnapshot import QueueSnapshot
+from SongQueue import SongQueue
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from playback_state import PlaybackState
+
+class ShortSong:
+    def __init__(self, id, s_len=50):
+        self.id = id
+        self.uri = 'uri%d' % id
+        self.s_len = s_len
+
+class RecordingSpotify:
+    def __init__(self):
+        self.calls = []
+        self.state = PlaybackState()
+
+    def play(self, uri):
+        self.calls.append(('play', uri))
+        self.state.played(uri)
+
+    def seek(self, position_ms):
+        self.calls.append(('seek', position_ms))
+
+    def queue_next(self, uri):
+        self.calls.append(('queue_next', uri))
+
+    def skip(self):
+        self.calls.append(('skip',))
+
+    def pause(self):
+        self.calls.append(('pause',))
+        self.state.paused()
+
+    def get_current_playback_info(self):
+        raise ConnectionError('no playback state in tests')
+
+class ScheduledQueue:
+    """
+    the parts of UniversalQueue the scheduler uses
+    """
+    def __init__(self, prequeue=False):
+        self.data = SongQueue()
+        self.spotify = RecordingSpotify()
+        self.position_ms = 0
+        self.advanced = []
+        self.paused_at = []
+        self.scheduler = PlaybackScheduler(self, retry_delay=0.01, prequeue=prequeue)
+
+    def insert(self, song):
+        self.data.append(song)
+        self.scheduler.notify()
+
+    def snapshot(self):
+        return QueueSnapshot(0, None, songs=self.data, view=lambda song: {})
+
+    def advance(self, song):
+        self.data.popleft()
+        self.position_ms = 0
+        self.advanced.append(song.id)
+
+    def record_pause(self, position_ms):
+        self.position_ms = position_ms
+        self.paused_at.append(position_ms)
+
+class TestPlaybackScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = ScheduledQueue()
+        self.scheduler = self.queue.scheduler
+
+    def tearDown(self):
+        self.scheduler.stop()
+        self.scheduler.thread.join(1)
+
+    def test_insert_returns_immediately(self):
+        start = time.monotonic()
+        self.queue.insert(ShortSong(0, s_len=10000))
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_plays_in_order(self):
+        for id in range(3):
+            self.queue.insert(ShortSong(id))
+
+        self.assertTrue(self.scheduler.wait_until_idle(2))
+        self.assertEqual(self.queue.advanced, [0, 1, 2])
+        self.assertEqual(self.queue.spotify.calls, [('play', 'uri0'), ('play', 'uri1'), ('play', 'uri2')])
+
+    def test_skip(self):
+        self.queue.insert(ShortSong(0, s_len=10000))
+        self.queue.insert(ShortSong(1))
+        time.sleep(0.05)
+
+        self.scheduler.skip(0)
+        self.assertTrue(self.scheduler.wait_until_idle(2))
+        self.assertEqual(self.queue.advanced, [0, 1])
+
+    def test_stale_skip_is_ignored(self):
+        self.queue.insert(ShortSong(0, s_len=200))
+        time.sleep(0.05)
+        #a song that already left the queue
+        self.scheduler.skip(7)
+        time.sleep(0.05)
+        self.assertEqual(self.queue.advanced, [])
+        self.assertTrue(self.scheduler.wait_until_idle(2))
+
+    def test_pause_and_resume(self):
+        self.queue.insert(ShortSong(0, s_len=150))
+        time.sleep(0.05)
+
+        self.queue.spotify.pause()
+        self.scheduler.pause()
+        time.sleep(0.2)
+        #the song doesn't end while paused, and the position comes from the local playback state
+        self.assertEqual(self.queue.advanced, [])
+        self.assertEqual(len(self.queue.paused_at), 1)
+        self.assertTrue(30 <= self.queue.paused_at[0] <= 150)
+
+        self.scheduler.resume()
+        self.assertTrue(self.scheduler.wait_until_idle(2))
+        #resuming doesn't start the song again
+        self.assertEqual(self.queue.spotify.calls, [('play', 'uri0'), ('pause',)])
+
+    def test_skip_while_paused(self):
+        self.queue.insert(ShortSong(0, s_len=10000))
+        time.sleep(0.03)
+        self.scheduler.pause()
+        time.sleep(0.03)
+
+        self.scheduler.skip(0)
+        time.sleep(0.05)
+        self.assertEqual(self.queue.advanced, [0])
+
+    def test_progress_corrects_the_deadline(self):
+        samples = []
+        start = time.monotonic()
+
+        class Item:
+            id = 'uri0'
+            duration_ms = 2300
+
+        class Playing:
+            item = Item()
+            is_playing = True
+
+            def __init__(self):
+                #spotify started the song 200 ms after it was asked to
+                self.progress_ms = int((time.monotonic() - start) * 1000) - 200
+
+        def get_current_playback_info():
+            samples.append(time.monotonic())
+            return Playing()
+
+        self.queue.spotify.get_current_playback_info = get_current_playback_info
+        self.queue.insert(ShortSong(0, s_len=2300))
+        self.assertTrue(self.scheduler.wait_until_idle(5))
+
+        #sampled just before the final window, which pushes the end back by 200 ms
+        self.assertLessEqual(len(samples), 2)
+        self.assertGreater(time.monotonic() - start, 2.4)
+        self.assertEqual(self.queue.advanced, [0])
+
+    def test_play_failure_is_retried(self):
+        failures = []
+
+        def play(uri):
+            if len(failures) < 2:
+                failures.append(uri)
+                raise ConnectionError('spotify is down')
+
+        self.queue.spotify.play = play
+        self.queue.insert(ShortSong(0))
+        self.assertTrue(self.scheduler.wait_until_idle(2))
+        self.assertEqual(failures, ['uri0', 'uri0'])
+
+class TestPrequeue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = ScheduledQueue(prequeue=True)
+        self.scheduler = self.queue.scheduler
+
+    def tearDown(self):
+        self.scheduler.stop()
+        self.scheduler.thread.join(1)
+
+    def test_device_starts_the_next_song(self):
+        self.queue.insert(ShortSong(0, s_len=300))
+        self.queue.insert(ShortSong(1))
+
+        self.assertTrue(self.scheduler.wait_until_idle(3))
+        self.assertEqual(self.queue.advanced, [0, 1])
+        #no play call for the second song, the device moved on by itself
+        self.assertEqual(self.queue.spotify.calls, [('play', 'uri0'), ('queue_next', 'uri1')])
+        self.assertEqual(self.queue.spotify.state.track_id, 'uri1')
+
+    def test_prequeued_song_removed(self):
+        for id in range(3):
+            self.queue.insert(ShortSong(id, s_len=300))
+        time.sleep(0.1)
+
+        #the host removes the song waiting in the device queue
+        self.queue.data.remove(1)
+
+        self.assertTrue(self.scheduler.wait_until_idle(3))
+        self.assertEqual(self.queue.advanced, [0, 2])
+        self.assertEqual(self.queue.spotify.calls, [('play', 'uri0'), ('queue_next', 'uri1'), ('play', 'uri2')])
+
+    def test_prequeued_last_song_removed(self):
+        self.queue.insert(ShortSong(0, s_len=300))
+        self.queue.insert(ShortSong(1))
+        time.sleep(0.1)
+        self.queue.data.remove(1)
+
+        self.assertTrue(self.scheduler.wait_until_idle(3))
+        time.sleep(0.05)
+        #the device played on into the removed song, so playback is stopped
+        self.assertEqual(self.queue.spotify.calls, [('play', 'uri0'), ('queue_next', 'uri1'), ('pause',)])
+
+    def test_skip_to_prequeued_song(self):
+        self.queue.insert(ShortSong(0, s_len=1500))
+        self.queue.insert(ShortSong(1))
+        time.sleep(0.1)
+
+        self.scheduler.skip(0)
+        self.assertTrue(self.scheduler.wait_until_idle(3))
+        self.assertEqual(self.queue.spotify.calls, [('play', 'uri0'), ('queue_next', 'uri1'), ('skip',)])
+
+    def test_device_did_not_move_on(self):
+        class Item:
+            id = 'something else'
+            duration_ms = 1000
+
+        class Playing:
+            item = Item()
+            is_playing = True
+            progress_ms = 0
+
+        self.queue.spotify.get_current_playback_info = lambda: Playing()
+        self.queue.insert(ShortSong(0, s_len=300))
+        self.queue.insert(ShortSong(1, s_len=300))
+
+        self.assertTrue(self.scheduler.wait_until_idle(3))
+        self.assertEqual(self.queue.spotify.calls,
+                         [('play', 'uri0'), ('queue_next', 'uri1'), ('play', 'uri1')])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import unittest
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from playback_state import PlaybackState
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class Item:
+    def __init__(self, id, duration_ms):
+        self.id = id
+        self.duration_ms = duration_ms
+
+class CurrentlyPlaying:
+    def __init__(self, item, progress_ms, is_playing=True):
+        self.item = item
+        self.progress_ms = progress_ms
+        self.is_playing = is_playing
+
+class TestPlaybackState(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.state = PlaybackState(stale_after=30, clock=self.clock)
+
+    def test_progress_moves_while_playing(self):
+        self.state.played('track', 180000)
+        self.clock.now += 12.5
+        self.assertEqual(self.state.progress_ms(), 12500)
+
+        #never past the end of the track
+        self.clock.now += 1000
+        self.assertEqual(self.state.progress_ms(), 180000)
+
+    def test_pause_and_resume(self):
+        self.state.played('track', 180000, position_ms=1000)
+        self.clock.now += 2
+        self.state.paused()
+        self.clock.now += 60
+        self.assertEqual(self.state.progress_ms(), 3000)
+        self.assertFalse(self.state.is_playing)
+
+        self.state.resumed()
+        self.clock.now += 1
+        self.assertEqual(self.state.progress_ms(), 4000)
+
+    def test_seek(self):
+        self.state.played('track')
+        self.state.seeked(90000)
+        self.clock.now += 1
+        self.assertEqual(self.state.progress_ms(), 91000)
+
+    def test_observe(self):
+        self.state.played('track', 180000)
+        self.clock.now += 10
+        #spotify took a second to start the track
+        self.state.observe(CurrentlyPlaying(Item('track', 180000), 9000), self.clock.now)
+        self.assertEqual(self.state.progress_ms(), 9000)
+
+        self.state.observe(None)
+        self.assertFalse(self.state.is_playing)
+
+    def test_staleness(self):
+        self.assertTrue(self.state.is_stale())
+        self.state.observe(CurrentlyPlaying(Item('track', 180000), 0))
+        self.assertFalse(self.state.is_stale())
+
+        #our own commands don't make the model any less stale
+        self.clock.now += 31
+        self.state.played('other')
+        self.assertTrue(self.state.is_stale())
+
+        self.state.observe(CurrentlyPlaying(Item('other', 1000), 0))
+        self.state.invalidate()
+        self.assertTrue(self.state.is_stale())
+
+    def test_view(self):
+        self.state.played('track', 180000)
+        self.clock.now += 1
+        self.assertEqual(self.state.view(), {'track_id': 'track', 'progress_ms': 1000,
+                                             'duration_ms': 180000, 'is_playing': True})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import unittest
+import httpx
+import tekore as tk
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from sender import PooledSender, endpoint
+
+class TestPooledSender(unittest.TestCase):
+
+    def setUp(self):
+        def handler(request):
+            if request.url.path.endswith('/missing'):
+                return httpx.Response(404, json={'error': 'not found'})
+            return httpx.Response(200, json={'ok': True})
+
+        self.sender = PooledSender(httpx.Client(transport=httpx.MockTransport(handler)))
+
+    def request(self, path, method='GET'):
+        return tk.Request(method=method, url='https://api.spotify.com' + path)
+
+    def test_endpoint(self):
+        self.assertEqual(endpoint(self.request('/v1/tracks/5oD2Z1OOx1Tmcu2mc9sLY2')),
+                         'GET /v1/tracks/{id}')
+        self.assertEqual(endpoint(self.request('/v1/me/player/play', 'PUT')),
+                         'PUT /v1/me/player/play')
+
+    def test_send_records_latency(self):
+        response = self.sender.send(self.request('/v1/tracks/5oD2Z1OOx1Tmcu2mc9sLY2'))
+        self.assertEqual(response.content, {'ok': True})
+        self.sender.send(self.request('/v1/tracks/3n3Ppam7vgaVa1iaRUc9Lp'))
+        self.sender.send(self.request('/v1/tracks/missing'))
+
+        stats = self.sender.metrics.stats()
+        self.assertEqual(stats['GET /v1/tracks/{id}']['count'], 2)
+        self.assertEqual(stats['GET /v1/tracks/{id}']['errors'], 0)
+        self.assertEqual(stats['GET /v1/tracks/missing']['errors'], 1)
+        for key in ('mean_ms', 'p50_ms', 'p95_ms', 'max_ms'):
+            self.assertGreaterEqual(stats['GET /v1/tracks/{id}'][key], 0)
+
+    def test_default_client_is_bounded(self):
+        sender = PooledSender(pool_size=3, read_timeout=7)
+        self.assertEqual(sender.client.timeout.read, 7)
+        sender.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import queue
+from QueueBroadcast import QueueBroadcaster
+
+class TestQueueBroadcaster(unittest.TestCase):
+
+    def setUp(self):
+        self.broadcaster = QueueBroadcaster()
+
+    def test_publish_to_subscribers(self):
+        mailbox1 = self.broadcaster.subscribe()
+        mailbox2 = self.broadcaster.subscribe()
+
+        self.broadcaster.publish('[1]')
+
+        self.assertEqual(mailbox1.get_nowait(), '[1]')
+        self.assertEqual(mailbox2.get_nowait(), '[1]')
+
+    def test_only_latest_is_kept(self):
+        mailbox = self.broadcaster.subscribe()
+
+        self.broadcaster.publish('[1]')
+        self.broadcaster.publish('[1, 2]')
+
+        self.assertEqual(mailbox.get_nowait(), '[1, 2]')
+        self.assertRaises(queue.Empty, mailbox.get_nowait)
+
+    def test_new_subscriber_gets_latest(self):
+        self.broadcaster.publish('[]')
+        mailbox = self.broadcaster.subscribe()
+        self.assertEqual(mailbox.get_nowait(), '[]')
+
+    def test_unsubscribe(self):
+        mailbox = self.broadcaster.subscribe()
+        self.broadcaster.unsubscribe(mailbox)
+        self.broadcaster.publish('[1]')
+
+        self.assertRaises(queue.Empty, mailbox.get_nowait)
+        self.assertEqual(len(self.broadcaster.subscribers), 0)
+
+    def test_stream(self):
+        self.broadcaster.publish('[1]')
+        stream = self.broadcaster.stream(keepalive=0.01)
+
+        self.assertEqual(next(stream), 'data: [1]\n\n')
+        self.assertEqual(next(stream), ': keep-alive\n\n')
+
+        self.broadcaster.publish('[1, 2]')
+        self.assertEqual(next(stream), 'data: [1, 2]\n\n')
+
+        #closing the stream (client disconnect) unsubscribes it
+        stream.close()
+        self.assertEqual(len(self.broadcaster.subscribers), 0)
+
+    def test_payload_function_is_called_when_picked_up(self):
+        calls = []
+        self.broadcaster.publish(lambda: calls.append(1) or '[1]')
+        self.broadcaster.publish(lambda: calls.append(2) or '[1, 2]')
+        self.assertEqual(calls, [])
+
+        stream = self.broadcaster.stream()
+        self.assertEqual(next(stream), 'data: [1, 2]\n\n')
+        self.assertEqual(calls, [2])
+        stream.close()
+
+if __name__ == "__main__":
+    unittest.main()
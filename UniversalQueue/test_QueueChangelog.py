@@ -0,0 +1,45 @@
+import unittest
+from QueueChangelog import QueueChangelog
+
+class TestQueueChangelog(unittest.TestCase):
+
+    def setUp(self):
+        self.changelog = QueueChangelog(size=3)
+
+    def test_empty(self):
+        self.assertEqual(self.changelog.since(0), ([], 0))
+        self.assertEqual(self.changelog.since(5), (None, 0))
+
+    def test_since(self):
+        self.changelog.record(1, {'op': 'insert', 'song': {'submissionID': 0}})
+        self.changelog.record(2, {'op': 'remove', 'id': 0})
+
+        self.assertEqual(self.changelog.since(2), ([], 2))
+        self.assertEqual(self.changelog.since(1), ([{'op': 'remove', 'id': 0}], 2))
+
+        changes, version = self.changelog.since(0)
+        self.assertEqual([c['op'] for c in changes], ['insert', 'remove'])
+        self.assertEqual(version, 2)
+
+    def test_too_far_behind(self):
+        for version in range(1, 6):
+            self.changelog.record(version, {'op': 'advance', 'id': version})
+
+        #only versions 3, 4 and 5 are remembered
+        self.assertEqual(self.changelog.since(1), (None, 5))
+        changes, version = self.changelog.since(2)
+        self.assertEqual([c['id'] for c in changes], [3, 4, 5])
+
+    def test_clear(self):
+        self.changelog.record(1, {'op': 'advance', 'id': 0})
+        self.changelog.clear(2)
+
+        self.assertEqual(self.changelog.since(2), ([], 2))
+        self.assertEqual(self.changelog.since(1), (None, 2))
+
+    def test_unknown_version(self):
+        self.changelog.record(1, {'op': 'advance', 'id': 0})
+        self.assertEqual(self.changelog.since(7), (None, 1))
+
+if __name__ == "__main__":
+    unittest.main()
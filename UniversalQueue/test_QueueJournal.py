@@ -0,0 +1,126 @@
+import unittest
+import json
+import os
+import tempfile
+import threading
+from QueueJournal import QueueJournal
+
+class TestQueueJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.snapshot_file = os.path.join(self.dir.name, 'Write.json')
+        self.log_file = os.path.join(self.dir.name, 'Write.log')
+        self.journal = QueueJournal(self.snapshot_file, self.log_file, fsync_every=2, compact_every=4)
+
+    def tearDown(self):
+        self.journal.close()
+        self.dir.cleanup()
+
+    def song(self, id):
+        return {"uri": f"uri{id}", "s_len": 1000, "name": "breh", "album": "the breh album",
+                "artist": "dude", "image": None, "id": id}
+
+    def test_replay_empty(self):
+        self.assertEqual(self.journal.replay(),
+                         {"version": 0, "idCount": 0, "position_ms": 0, "songs": []})
+
+    def test_append_and_replay(self):
+        for id in range(3):
+            self.journal.append({"op": "insert", "song": self.song(id)})
+        self.journal.append({"op": "remove", "id": 1})
+
+        self.assertEqual([s["id"] for s in self.journal.replay()["songs"]], [0, 2])
+
+        #one line per change, the queue is never rewritten
+        with open(self.log_file) as log_file:
+            self.assertEqual(len(log_file.readlines()), 4)
+        self.assertFalse(os.path.exists(self.snapshot_file))
+
+    def test_batched_fsync(self):
+        self.journal.append({"op": "insert", "song": self.song(0)})
+        self.assertEqual(self.journal.unsynced, 1)
+        self.journal.append({"op": "insert", "song": self.song(1)})
+        self.assertEqual(self.journal.unsynced, 0)
+
+    def test_sync_left_to_the_owner(self):
+        journal = QueueJournal(self.snapshot_file + "2", self.log_file + "2", fsync_every=None)
+        for id in range(5):
+            journal.append({"op": "insert", "song": self.song(id)})
+        self.assertEqual(journal.unsynced, 5)
+        journal.sync()
+        self.assertEqual(journal.unsynced, 0)
+        journal.close()
+
+    def test_compact(self):
+        for id in range(4):
+            self.journal.append({"op": "insert", "song": self.song(id)})
+        self.assertTrue(self.journal.needs_compaction())
+
+        state = self.journal.replay()
+        state["idCount"] = 10
+        self.journal.compact(state)
+        self.assertFalse(self.journal.needs_compaction())
+
+        with open(self.snapshot_file) as json_file:
+            self.assertEqual(json.load(json_file), state)
+        self.assertEqual(os.path.getsize(self.log_file), 0)
+
+        #changes after the compaction are applied on top of the snapshot
+        self.journal.append({"op": "advance", "id": 0})
+        self.journal.append({"op": "insert", "song": self.song(4)})
+        state = self.journal.replay()
+        self.assertEqual([s["id"] for s in state["songs"]], [1, 2, 3, 4])
+        self.assertEqual(state["idCount"], 10)
+
+    def test_compact_reads_state_under_the_lock(self):
+        self.journal.append({"op": "insert", "song": self.song(0)})
+        appended = threading.Event()
+
+        def state():
+            #an append from another thread has to wait until the log has been emptied
+            thread = threading.Thread(target=lambda: (self.journal.append({"op": "insert", "song": self.song(1)}),
+                                                      appended.set()))
+            thread.start()
+            self.assertFalse(appended.wait(0.1))
+            return {"songs": [self.song(0)]}
+
+        self.journal.compact(state)
+        self.assertTrue(appended.wait(1))
+        self.assertEqual([song["id"] for song in self.journal.replay()["songs"]], [0, 1])
+
+    def test_partial_last_record(self):
+        self.journal.append({"op": "insert", "song": self.song(0)})
+        self.journal.log.write('{"op":"insert","so')
+        self.journal.log.flush()
+
+        self.assertEqual([s["id"] for s in self.journal.replay()["songs"]], [0])
+
+    def test_snapshot_without_ids(self):
+        with open('WriteTest.json') as json_file:
+            legacy = json.load(json_file)
+        with open(self.snapshot_file, 'w') as json_file:
+            json.dump(legacy, json_file)
+
+        self.assertEqual(self.journal.replay()["songs"], legacy)
+
+    def test_persisted_state(self):
+        self.journal.append({"op": "insert", "song": self.song(0), "version": 1, "position_ms": 0})
+        self.journal.append({"op": "insert", "song": self.song(1), "version": 2, "position_ms": 1500})
+        self.journal.append({"op": "position", "version": 2, "position_ms": 2500})
+        self.journal.append({"op": "remove", "id": 1, "version": 3})
+
+        state = self.journal.replay()
+        self.assertEqual(state["version"], 3)
+        self.assertEqual(state["idCount"], 2)
+        self.assertEqual(state["position_ms"], 2500)
+
+        #a new head song starts from the beginning
+        self.journal.append({"op": "advance", "id": 0, "version": 4})
+        state = self.journal.replay()
+        self.assertEqual(state["position_ms"], 0)
+        self.assertEqual(state["idCount"], 2)
+        self.assertEqual(state["songs"], [])
+
+if __name__ == "__main__":
+    unittest.main()
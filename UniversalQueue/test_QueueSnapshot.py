@@ -0,0 +1,64 @@
+import unittest
+import json
+from QueueSnapshot import QueueSnapshot
+
+class ViewedSong:
+    def __init__(self, id):
+        self.id = id
+        self.name = 'song%d' % id
+
+class TestQueueSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.viewed = []
+
+    def view(self, song):
+        self.viewed.append(song.id)
+        return {'name': song.name, 'submissionID': song.id}
+
+    def test_json_matches_dumps(self):
+        songs = [ViewedSong(i) for i in range(3)]
+        snapshot = QueueSnapshot(3, 'epoch', 3, songs, self.view)
+        self.assertEqual(snapshot.json, json.dumps([self.view(song) for song in songs]))
+        self.assertEqual(QueueSnapshot(0, 'epoch').json, json.dumps([]))
+
+    def test_reuses_serialized_songs(self):
+        songs = [ViewedSong(i) for i in range(3)]
+        first = QueueSnapshot(3, 'epoch', 3, songs, self.view)
+        self.viewed.clear()
+
+        songs = songs[1:] + [ViewedSong(3)]
+        second = QueueSnapshot(5, 'epoch', 4, songs, self.view, first)
+        self.assertEqual(self.viewed, [3])
+        self.assertEqual([song['submissionID'] for song in json.loads(second.json)], [1, 2, 3])
+
+    def test_restored_song_with_same_id_is_serialized_again(self):
+        first = QueueSnapshot(1, 'epoch', 1, [ViewedSong(0)], self.view)
+        restored = ViewedSong(0)
+        restored.name = 'restored'
+        second = QueueSnapshot(2, 'epoch', 1, [restored], self.view, first)
+        self.assertEqual(json.loads(second.json)[0]['name'], 'restored')
+
+    def test_apply_replays_changes_in_order(self):
+        songs = [ViewedSong(i) for i in range(3)]
+        snapshot = QueueSnapshot(3, 'epoch', 3, songs, self.view)
+        changes = [('remove', 0), ('insert', ViewedSong(3)), ('insert', ViewedSong(4)), ('remove', 3)]
+        self.assertEqual([song.id for song in snapshot.apply(changes)], [1, 2, 4])
+
+        #a restore drops everything before it
+        restored = [ViewedSong(7), ViewedSong(5)]
+        changes = [('insert', ViewedSong(3)), ('restore', restored), ('insert', ViewedSong(8))]
+        self.assertEqual([song.id for song in snapshot.apply(changes)], [7, 5, 8])
+        self.assertEqual([song.id for song in snapshot], [0, 1, 2])
+
+    def test_published_snapshot_does_not_change(self):
+        songs = [ViewedSong(i) for i in range(2)]
+        snapshot = QueueSnapshot(2, 'epoch', 2, songs, self.view)
+        songs.append(ViewedSong(2))
+        self.assertEqual(len(snapshot), 2)
+        self.assertEqual(snapshot.peek().id, 0)
+        self.assertIsNone(QueueSnapshot(0, 'epoch').peek())
+        self.assertEqual(snapshot.etag, 'epoch-2')
+
+if __name__ == "__main__":
+    unittest.main()
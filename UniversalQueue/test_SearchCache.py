@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from search_cache import SearchCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def results(*titles, artist='Taylor Swift'):
+    return {'status': 200, 'results': [{'id': 0, 'uri': title, 's_len': 1000, 'title': title,
+                                        'artist': artist, 'album': 'Album', 'image': None} for title in titles]}
+
+class TestSearchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = SearchCache(maxsize=8, ttl=10, clock=self.clock)
+        self.cache.set(('taylor swi', 2), results('Shake It Off', 'Love Story', 'Style'))
+
+    def test_exact(self):
+        self.assertEqual(self.cache.lookup(('taylor swi', 2)), results('Shake It Off', 'Love Story', 'Style'))
+        self.assertEqual(self.cache.stats()['prefix_hits'], 0)
+
+    def test_shorter_query_from_longer(self):
+        data = self.cache.lookup(('taylor s', 2))
+        self.assertEqual([track['title'] for track in data['results']], ['Shake It Off', 'Love Story'])
+        self.assertEqual(self.cache.stats()['prefix_hits'], 1)
+        #the approximate answer isn't cached as the real one
+        self.assertIsNone(self.cache.get(('taylor s', 2)))
+
+    def test_longer_query_filters_results(self):
+        data = self.cache.lookup(('taylor swi st', 1))
+        self.assertIsNone(data)
+        self.cache.set(('taylor swi', 1), results('Shake It Off', 'Style'))
+        data = self.cache.lookup(('taylor swi st', 1))
+        self.assertEqual([track['title'] for track in data['results']], ['Style'])
+
+    def test_too_few_matches(self):
+        self.assertIsNone(self.cache.lookup(('taylor swi lo', 2)))
+
+    def test_too_far_or_too_short(self):
+        self.assertIsNone(self.cache.lookup(('tay', 2)))
+        self.assertIsNone(self.cache.lookup(('taylor swift love', 2)))
+        self.assertIsNone(self.cache.lookup(('taylor swi', 5)))
+
+    def test_expiry(self):
+        self.clock.now = 10
+        self.assertIsNone(self.cache.lookup(('taylor s', 2)))
+
+if __name__ == "__main__":
+    unittest.main()
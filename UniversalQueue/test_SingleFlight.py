@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from single_flight import AsyncSingleFlight, SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def fetch(self):
+        self.calls += 1
+        self.release.wait(5)
+        return 'results'
+
+    def run_concurrently(self, flight, count, fetch):
+        results = []
+
+        def search():
+            try:
+                results.append(flight.do('queen', fetch))
+            except ValueError as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=search) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        #wait for the followers to join the call in flight
+        while flight.stats()['shared'] < count - 1:
+            pass
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_concurrent_calls_are_shared(self):
+        flight = SingleFlight()
+        results = self.run_concurrently(flight, 5, self.fetch)
+        self.assertEqual(results, ['results'] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(flight.stats(), {'shared': 4, 'in_flight': 0})
+
+    def test_finished_calls_are_forgotten(self):
+        flight = SingleFlight()
+        self.release.set()
+        flight.do('queen', self.fetch)
+        flight.do('queen', self.fetch)
+        self.assertEqual(self.calls, 2)
+
+    def test_error_is_shared(self):
+        def fail():
+            self.release.wait(5)
+            raise ValueError('spotify is down')
+
+        results = self.run_concurrently(SingleFlight(), 3, fail)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+class TestAsyncSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_calls_are_shared(self):
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return 'results'
+
+        flight = AsyncSingleFlight()
+        results = await asyncio.gather(*(flight.do('queen', fetch) for i in range(5)))
+        self.assertEqual(results, ['results'] * 5)
+        self.assertEqual(calls, 1)
+        self.assertEqual(flight.stats(), {'shared': 4, 'in_flight': 0})
+
+    async def test_cancelled_request_does_not_cancel_the_call(self):
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return 'results'
+
+        flight = AsyncSingleFlight()
+        first = asyncio.ensure_future(flight.do('queen', fetch))
+        second = asyncio.ensure_future(flight.do('queen', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, 'results')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -43,6 +43,33 @@ class TestSong(unittest.TestCase):
         
         self.assertRaises(ValueError, Song, self.SongTest2_data)
 
+    def test_init_recover(self):
+        with open('WriteTest.json', 'r') as file:
+            written = json.load(file)
+
+        song = Song(json.dumps(written[0]), True)
+
+        self.assertEqual(song.uri, "asadfas")
+        self.assertEqual(song.s_len, 123)
+        self.assertEqual(song.name, "breh")
+        self.assertEqual(song.album, "the breh album")
+        self.assertEqual(song.artist, "dude")
+        self.assertEqual(song.id, None)
+
+    def test_from_dict(self):
+        with open('WriteTest.json', 'r') as file:
+            written = json.load(file)
+
+        song = Song.from_dict(written[0])
+        self.assertEqual(song.uri, "asadfas")
+        self.assertEqual(song.s_len, 123)
+        self.assertEqual(song.artist, "dude")
+        self.assertEqual(song.image, None)
+        self.assertEqual(song.id, None)
+
+        written[0]['id'] = 7
+        self.assertEqual(Song.from_dict(written[0]).id, 7)
+
     def test_set_id(self):
 
         song1 = Song(self.SongTest_data)
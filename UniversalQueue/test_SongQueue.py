@@ -0,0 +1,82 @@
+import unittest
+from SongQueue import SongQueue
+from Song import Song
+
+class TestSongQueue(unittest.TestCase):
+
+    def setUp(self):
+        with open('SongTest.json', 'r') as file:
+            self.SongTest_data = file.read()
+
+        self.songs = []
+        for i in range(5):
+            song = Song(self.SongTest_data)
+            song.set_id(i)
+            self.songs.append(song)
+
+        self.queue = SongQueue(self.songs)
+
+    def test_init(self):
+        self.assertEqual(len(SongQueue()), 0)
+        self.assertFalse(SongQueue())
+        self.assertEqual(len(self.queue), 5)
+        self.assertEqual([s.id for s in self.queue], [0, 1, 2, 3, 4])
+
+    def test_append(self):
+        song = Song(self.SongTest_data)
+        song.set_id(5)
+        self.queue.append(song)
+
+        self.assertEqual(self.queue[-1], song)
+        self.assertIn(5, self.queue)
+
+        #ids have to be unique
+        self.assertRaises(ValueError, self.queue.append, song)
+
+    def test_popleft(self):
+        self.assertEqual(self.queue.popleft(), self.songs[0])
+        self.assertEqual(self.queue[0], self.songs[1])
+        self.assertNotIn(0, self.queue)
+
+        for _ in range(4):
+            self.queue.popleft()
+
+        self.assertEqual(len(self.queue), 0)
+        self.assertIsNone(self.queue.peek())
+        self.assertRaises(IndexError, self.queue.popleft)
+
+    def test_remove(self):
+        #middle, tail then head
+        self.assertEqual(self.queue.remove(2), self.songs[2])
+        self.assertEqual(self.queue.remove(4), self.songs[4])
+        self.assertEqual(self.queue.remove(0), self.songs[0])
+
+        self.assertEqual([s.id for s in self.queue], [1, 3])
+        self.assertEqual(self.queue.peek(), self.songs[1])
+        self.assertEqual(self.queue[-1], self.songs[3])
+
+        self.assertRaises(ValueError, self.queue.remove, 2)
+
+        #removing everything leaves an empty, reusable queue
+        self.queue.remove(1)
+        self.queue.remove(3)
+        self.assertEqual(list(self.queue), [])
+        self.queue.append(self.songs[0])
+        self.assertEqual(self.queue[0], self.songs[0])
+
+    def test_get_and_index(self):
+        self.assertEqual(self.queue.get(3), self.songs[3])
+        self.assertIsNone(self.queue.get(99))
+        self.assertEqual(self.queue[2], self.songs[2])
+        self.assertEqual(self.queue[-2], self.songs[3])
+        self.assertRaises(IndexError, self.queue.__getitem__, 5)
+        self.assertRaises(IndexError, SongQueue().__getitem__, 0)
+
+    def test_remove_while_iterating(self):
+        for song in self.queue:
+            self.queue.remove(song.id)
+
+        self.assertEqual(len(self.queue), 0)
+
+if __name__ == "__main__":
+    unittest.main()
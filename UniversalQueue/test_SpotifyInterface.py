@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, call, patch
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+import auth
+import player
+import spotify_interface_class
+from sender import PooledSender
+from spotify_interface_class import Spotify_Interface_Class, get_shared_interface
+
+class TestLazyInitialization(unittest.TestCase):
+
+    def setUp(self):
+        spotify_interface_class._shared_interface = None
+        auth._token = None
+
+    def tearDown(self):
+        spotify_interface_class._shared_interface = None
+        auth._token = None
+
+    def test_import_does_not_log_in(self):
+        #nothing at module level reads creds.config or holds a token
+        self.assertFalse(hasattr(spotify_interface_class, 'token'))
+        self.assertFalse(hasattr(player, 'device'))
+
+    @patch('spotify_interface_class.get_first_available_device')
+    @patch('spotify_interface_class.get_user_token', return_value='access')
+    def test_shared_interface_is_created_once(self, get_token, find_device):
+        interfaces = []
+        threads = [threading.Thread(target=lambda: interfaces.append(get_shared_interface())) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(map(id, interfaces))), 1)
+        get_token.assert_called_once()
+        #the account can be checked without a device running
+        find_device.assert_not_called()
+
+    @patch('spotify_interface_class.get_first_available_device', return_value=SimpleNamespace(id='device'))
+    def test_device_is_found_on_first_use(self, find_device):
+        spotify = Spotify_Interface_Class(token='access')
+        find_device.assert_not_called()
+        self.assertEqual(spotify.device_id, 'device')
+        self.assertEqual(spotify.device_id, 'device')
+        find_device.assert_called_once()
+
+    def test_sender_can_be_configured(self):
+        sender = PooledSender(pool_size=4, read_timeout=2.0)
+        self.addCleanup(sender.client.close)
+        spotify = Spotify_Interface_Class(token='access', sender=sender)
+        self.assertIs(spotify.sender, sender)
+        self.assertIs(spotify.spotify.sender, sender)
+
+    @patch('auth.TokenManager.from_config', return_value='manager')
+    def test_user_token_is_shared(self, from_config):
+        self.assertEqual(auth.get_user_token(), 'manager')
+        self.assertEqual(auth.get_user_token(), 'manager')
+        from_config.assert_called_once()
+
+class TestOptimisticControl(unittest.TestCase):
+
+    def setUp(self):
+        #a stubbed tekore client records every API call
+        patcher = patch('spotify_interface_class.tk.Spotify')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        #the background check is started by hand
+        timer = patch('spotify_interface_class.threading.Timer')
+        self.timer = timer.start()
+        self.addCleanup(timer.stop)
+
+    def make_interface(self, optimistic=True):
+        spotify = Spotify_Interface_Class(optimistic=optimistic, token='access')
+        spotify.state.observe = Mock()
+        return spotify
+
+    def test_optimistic_pause_and_unpause_are_one_call(self):
+        spotify = self.make_interface()
+        self.assertEqual(spotify.pause(), 0)
+        self.assertEqual(spotify.spotify.method_calls, [call.playback_pause()])
+        self.assertEqual(spotify.unpause(), 0)
+        self.assertEqual(spotify.spotify.method_calls, [call.playback_pause(), call.playback_resume()])
+        self.assertTrue(spotify.state.is_playing)
+
+    def test_confirmed_pause_reports_a_mismatch(self):
+        spotify = self.make_interface(optimistic=False)
+        spotify.spotify.playback.return_value = SimpleNamespace(is_playing=True)
+        self.assertEqual(spotify.pause(), 1)
+        spotify.spotify.playback.assert_called_once()
+
+        spotify.spotify.playback.return_value = SimpleNamespace(is_playing=False)
+        self.assertEqual(spotify.unpause(), 1)
+        self.assertEqual(spotify.pause(), 0)
+        #nothing is left to check later
+        self.timer.assert_not_called()
+
+    def test_burst_of_commands_is_checked_once(self):
+        spotify = self.make_interface()
+        spotify.pause()
+        spotify.unpause()
+        spotify.pause()
+        self.timer.assert_called_once_with(spotify_interface_class.VERIFY_DELAY, spotify.verify)
+
+        spotify.verify()
+        spotify.spotify.playback_currently_playing.assert_called_once()
+        spotify.state.observe.assert_called_once()
+
+        #the next command schedules a new check
+        spotify.unpause()
+        self.assertEqual(self.timer.call_count, 2)
+
+    def test_sample_older_than_a_command_is_ignored(self):
+        spotify = self.make_interface()
+
+        def sample():
+            #the host pauses while the sample is on its way
+            spotify.pause()
+            return SimpleNamespace(is_playing=True)
+
+        spotify.spotify.playback_currently_playing.side_effect = sample
+        spotify.get_current_playback_info()
+        spotify.state.observe.assert_not_called()
+
+        spotify.spotify.playback_currently_playing.side_effect = None
+        spotify.get_current_playback_info()
+        spotify.state.observe.assert_called_once()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from cache import TTLCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get('taylor swift'))
+        self.cache.set('taylor swift', [1])
+        self.assertEqual(self.cache.get('taylor swift'), [1])
+
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2})
+
+    def test_expiry(self):
+        self.cache.set('mr brightside', [1])
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get('mr brightside'), [1])
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get('mr brightside'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        #using a makes b the least recently used
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_no_ttl(self):
+        cache = TTLCache(maxsize=2, clock=self.clock)
+        cache.set('a', 1)
+        self.clock.now = 10 ** 9
+        self.assertEqual(cache.get('a'), 1)
+
+    def test_peek(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        #peeking doesn't count, or save a from eviction
+        self.assertEqual(self.cache.peek('a'), 1)
+        self.assertEqual(self.cache.stats()['hits'], 0)
+        self.cache.set('c', 3)
+        self.assertIsNone(self.cache.peek('a'))
+        self.clock.now = 10
+        self.assertEqual(self.cache.peek('b', 'expired'), 'expired')
+
+    def test_default(self):
+        self.assertEqual(self.cache.get('a', 'missing'), 'missing')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import configparser
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import tekore as tk
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from token_manager import ACCESS_VAR, EXPIRES_VAR, TokenManager
+
+def make_token(access_token, expires_in=3600, refresh_token='refresh'):
+    return tk.Token({'access_token': access_token, 'token_type': 'Bearer',
+                     'expires_in': expires_in, 'refresh_token': refresh_token}, uses_pkce=False)
+
+class CountingCredentials:
+    """
+    stands in for tk.Credentials, handing out numbered tokens
+    """
+    def __init__(self, expires_in=3600, fail=0):
+        self.refreshes = 0
+        self.expires_in = expires_in
+        self.fail = fail
+        self.refreshed = threading.Event()
+
+    def refresh_user_token(self, refresh_token):
+        if self.fail > 0:
+            self.fail -= 1
+            raise ConnectionError('spotify is down')
+        self.refreshes += 1
+        self.refreshed.set()
+        return make_token('access%d' % self.refreshes, self.expires_in, refresh_token=None)
+
+class TestTokenManager(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.config_file = tempfile.mkstemp(suffix='.config')
+        os.close(handle)
+        tk.config_to_file(self.config_file, ('id', 'secret', 'http://localhost', 'refresh'))
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            manager.stop()
+        os.remove(self.config_file)
+
+    def manage(self, *args, **kwargs):
+        manager = TokenManager(*args, **kwargs)
+        self.managers.append(manager)
+        return manager
+
+    def read_config(self):
+        config = configparser.RawConfigParser()
+        config.optionxform = str
+        config.read(self.config_file)
+        return config['DEFAULT']
+
+    def test_str_is_the_access_token(self):
+        manager = self.manage(CountingCredentials(), make_token('access0'))
+        self.assertEqual(str(manager), 'access0')
+        self.assertEqual(manager.access_token, 'access0')
+
+    def test_refreshes_ahead_of_expiry(self):
+        credentials = CountingCredentials()
+        #expires in 10 seconds, refreshed with 9.9 seconds to spare
+        manager = self.manage(credentials, make_token('access0', expires_in=10), self.config_file, margin=9.9)
+
+        self.assertTrue(credentials.refreshed.wait(2))
+        self.assertEqual(str(manager), 'access1')
+        #the refresh token is kept when spotify doesn't send a new one
+        self.assertEqual(manager.refresh_token, 'refresh')
+
+        #joins the thread, so the refreshed token has been written
+        manager.stop()
+        config = self.read_config()
+        self.assertEqual(config[ACCESS_VAR], 'access1')
+        self.assertEqual(int(config[EXPIRES_VAR]), manager.token.expires_at)
+        #tekore's own keys are left alone
+        self.assertEqual(config[tk.client_id_var], 'id')
+        self.assertEqual(config[tk.user_refresh_var], 'refresh')
+
+    def test_failed_refresh_keeps_the_old_token(self):
+        credentials = CountingCredentials(fail=1)
+        manager = self.manage(credentials, make_token('access0', expires_in=10), margin=9.9, retry_delay=0.05)
+
+        self.assertTrue(credentials.refreshed.wait(2))
+        self.assertEqual(str(manager), 'access1')
+
+    def test_from_config_reuses_a_valid_token(self):
+        manager = self.manage(CountingCredentials(), make_token('access0'), self.config_file)
+        manager.persist()
+
+        restarted = TokenManager.from_config(self.config_file)
+        self.managers.append(restarted)
+        self.assertEqual(str(restarted), 'access0')
+        self.assertEqual(restarted.refresh_token, 'refresh')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+import tekore as tk
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/Spotify_Interface")
+
+from batcher import AsyncTrackBatcher, TrackBatcher
+
+
+def http_error(error_type, message):
+    return error_type(message, request=None, response=None)
+
+
+class TestTrackBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def fetch_tracks(self, track_ids):
+        self.calls.append(list(track_ids))
+        if 'busy' in track_ids:
+            self.release.wait(5)
+        return [None if track_id == 'missing' else 'track ' + track_id for track_id in track_ids]
+
+    def lookup_concurrently(self, batcher, track_ids):
+        results = {}
+
+        def lookup(track_id):
+            try:
+                results[track_id] = batcher.get(track_id)
+            except ValueError as e:
+                results[track_id] = e
+
+        threads = [threading.Thread(target=lookup, args=(track_id,)) for track_id in track_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def keep_busy(self, batcher):
+        #a lookup in flight until self.release is set, so the lookups that follow are batched
+        thread = threading.Thread(target=batcher.get, args=('busy',))
+        thread.start()
+        while not self.calls:
+            time.sleep(0.001)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(self.release.set)
+
+    def test_single(self):
+        batcher = TrackBatcher(self.fetch_tracks, window=0.001)
+        self.assertEqual(batcher.get('a'), 'track a')
+        self.assertEqual(self.calls, [['a']])
+
+    def test_lone_lookup_does_not_wait(self):
+        batcher = TrackBatcher(self.fetch_tracks, window=10)
+        start = time.time()
+        self.assertEqual(batcher.get('a'), 'track a')
+        self.assertLess(time.time() - start, 1)
+
+    def test_burst_is_one_call(self):
+        batcher = TrackBatcher(self.fetch_tracks, window=0.2)
+        self.keep_busy(batcher)
+        track_ids = [str(i) for i in range(10)]
+
+        results = self.lookup_concurrently(batcher, track_ids + ['0', '1'])
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(sorted(self.calls[1]), sorted(track_ids))
+        for track_id in track_ids:
+            self.assertEqual(results[track_id], 'track ' + track_id)
+
+    def test_max_batch(self):
+        batcher = TrackBatcher(self.fetch_tracks, window=0.2, max_batch=4)
+        results = self.lookup_concurrently(batcher, [str(i) for i in range(8)])
+
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(len(call) <= 4 for call in self.calls))
+        self.assertEqual(sum(len(call) for call in self.calls), 8)
+
+    def test_missing_track(self):
+        batcher = TrackBatcher(self.fetch_tracks, window=0.2)
+        results = self.lookup_concurrently(batcher, ['a', 'missing'])
+
+        self.assertEqual(results['a'], 'track a')
+        self.assertIsInstance(results['missing'], ValueError)
+
+    def test_failed_call(self):
+        def fetch_tracks(track_ids):
+            raise ConnectionError('spotify is down')
+
+        batcher = TrackBatcher(fetch_tracks, window=0.001)
+        self.assertRaises(ConnectionError, batcher.get, 'a')
+
+    def test_bad_id_fails_alone(self):
+        def fetch_tracks(track_ids):
+            self.calls.append(list(track_ids))
+            if 'bad' in track_ids:
+                raise http_error(tk.BadRequest, 'invalid id')
+            return ['track ' + track_id for track_id in track_ids]
+
+        batcher = TrackBatcher(fetch_tracks)
+        batch = {'a': Future(), 'bad': Future()}
+        batcher.resolve(batch)
+
+        self.assertEqual(batch['a'].result(), 'track a')
+        self.assertRaises(tk.BadRequest, batch['bad'].result)
+        self.assertEqual(self.calls, [['a', 'bad'], ['a'], ['bad']])
+
+    def test_outage_fails_the_whole_batch(self):
+        for error in (http_error(tk.ServerError, 'unavailable'), TimeoutError('read timed out'), http_error(tk.TooManyRequests, 'slow down')):
+            calls = []
+
+            def fetch_tracks(track_ids):
+                calls.append(list(track_ids))
+                raise error
+
+            batch = {str(i): Future() for i in range(6)}
+            TrackBatcher(fetch_tracks).resolve(batch)
+
+            #one call, not one more per id
+            self.assertEqual(len(calls), 1)
+            for future in batch.values():
+                self.assertIs(future.exception(), error)
+
+class TestAsyncTrackBatcher(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.calls = []
+
+    async def fetch_tracks(self, track_ids):
+        self.calls.append(list(track_ids))
+        return [None if track_id == 'missing' else 'track ' + track_id for track_id in track_ids]
+
+    async def test_burst_is_one_call(self):
+        batcher = AsyncTrackBatcher(self.fetch_tracks, window=0.01)
+        track_ids = [str(i) for i in range(10)]
+
+        results = await asyncio.gather(*(batcher.get(track_id) for track_id in track_ids + ['0']))
+
+        self.assertEqual(self.calls, [track_ids])
+        self.assertEqual(results, ['track ' + track_id for track_id in track_ids + ['0']])
+
+    async def test_max_batch(self):
+        batcher = AsyncTrackBatcher(self.fetch_tracks, window=0.01, max_batch=4)
+        results = await asyncio.gather(*(batcher.get(str(i)) for i in range(8)))
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual(self.calls, [['0', '1', '2', '3'], ['4', '5', '6', '7']])
+
+    async def test_missing_track(self):
+        batcher = AsyncTrackBatcher(self.fetch_tracks, window=0.01)
+        results = await asyncio.gather(batcher.get('a'), batcher.get('missing'), return_exceptions=True)
+
+        self.assertEqual(results[0], 'track a')
+        self.assertIsInstance(results[1], ValueError)
+
+    async def test_outage_fails_the_whole_batch(self):
+        async def fetch_tracks(track_ids):
+            self.calls.append(list(track_ids))
+            raise http_error(tk.ServerError, 'unavailable')
+
+        batcher = AsyncTrackBatcher(fetch_tracks, window=0.01)
+        results = await asyncio.gather(*(batcher.get(str(i)) for i in range(6)), return_exceptions=True)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(all(isinstance(result, tk.ServerError) for result in results))
+
+    async def test_lone_lookup_does_not_wait(self):
+        batcher = AsyncTrackBatcher(self.fetch_tracks, window=10)
+        self.assertEqual(await asyncio.wait_for(batcher.get('a'), 1), 'track a')
+
+    async def test_cancelled_lookup_does_not_strand_its_batch(self):
+        batcher = AsyncTrackBatcher(self.fetch_tracks, window=0.05)
+        first = asyncio.ensure_future(batcher.get('a'))
+        second = asyncio.ensure_future(batcher.get('b'))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        self.assertEqual(await asyncio.wait_for(second, 1), 'track b')
+        self.assertEqual(self.calls, [['a', 'b']])
+
+if __name__ == "__main__":
+    unittest.main()
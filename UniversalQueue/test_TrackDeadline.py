@@ -0,0 +1,53 @@
+import unittest
+from TrackDeadline import FINAL_WINDOW, MAX_LEAD, TrackDeadline
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class TestTrackDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_deadline(self):
+        deadline = TrackDeadline(180000, 30000, clock=self.clock)
+        self.assertAlmostEqual(deadline.remaining(), 150)
+
+    def test_checks_tighten_towards_the_end(self):
+        deadline = TrackDeadline(180000, clock=self.clock)
+        sleeps = []
+        while True:
+            timeout, final = deadline.next_check()
+            self.clock.now += timeout
+            if final:
+                break
+            sleeps.append(timeout)
+
+        #each check comes at half the remaining time, the last one FINAL_WINDOW before the end
+        self.assertEqual(sleeps[:3], [90, 45, 22.5])
+        self.assertEqual(sleeps, sorted(sleeps, reverse=True))
+        self.assertLessEqual(len(sleeps), 8)
+        self.assertAlmostEqual(deadline.remaining(), 0)
+
+    def test_lead(self):
+        deadline = TrackDeadline(FINAL_WINDOW * 1000, lead=0.25, clock=self.clock)
+        self.assertEqual(deadline.next_check(), (FINAL_WINDOW - 0.25, True))
+
+        deadline = TrackDeadline(FINAL_WINDOW * 1000, lead=30, clock=self.clock)
+        self.assertEqual(deadline.next_check(), (FINAL_WINDOW - MAX_LEAD, True))
+
+    def test_correct(self):
+        deadline = TrackDeadline(180000, clock=self.clock)
+        self.clock.now += 90
+
+        #spotify took 1.5 seconds to start the song, so it is only 88.5 seconds in
+        deadline.correct(88500, 180000, self.clock.now)
+        self.assertAlmostEqual(deadline.remaining(), 91.5)
+        self.assertAlmostEqual(deadline.drift, 1.5)
+
+if __name__ == "__main__":
+    unittest.main()
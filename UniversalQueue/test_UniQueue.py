@@ -62,6 +62,9 @@ class TestUniQueue(unittest.TestCase):
 
         self.uniQueue.insert(self.song6)
 
+        #inserts return straight away, the scheduler thread plays the songs
+        self.assertTrue(self.uniQueue.scheduler.wait_until_idle(120))
+
 
 
 
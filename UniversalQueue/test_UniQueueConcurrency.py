@@ -0,0 +1,188 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import UniversalQueueDesign
+from fake_interface import FakeSpotifyInterface
+from fixtures import make_song
+
+class TestUniQueueConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        #Write.json and Write.log land in a scratch directory
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        self.spotify = FakeSpotifyInterface()
+        self.uniQueue = UniversalQueueDesign.UniversalQueue(persistence="journal", write_behind=True,
+                                                            spotify=self.spotify)
+
+    def tearDown(self):
+        self.uniQueue.shutdown()
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def run_threads(self, targets):
+        threads = [threading.Thread(target=target) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_snapshot_is_built_on_read(self):
+        self.uniQueue.insert(make_song(0))
+        self.uniQueue.snapshot()
+        with patch.object(UniversalQueueDesign, 'QueueSnapshot', wraps=UniversalQueueDesign.QueueSnapshot) as built:
+            for i in range(1, 50):
+                self.uniQueue.insert(make_song(i))
+            #a burst of changes is serialized once, by the first read after it
+            self.assertEqual(built.call_count, 0)
+            snapshot = self.uniQueue.snapshot()
+            self.assertIs(self.uniQueue.snapshot(), snapshot)
+            self.assertEqual(built.call_count, 1)
+
+        self.assertEqual(len(snapshot), 50)
+        self.assertEqual(snapshot.version, self.uniQueue.version)
+        self.assertEqual([song['submissionID'] for song in json.loads(snapshot.json)], list(range(50)))
+
+    def test_reads_do_not_wait_on_a_writer(self):
+        self.uniQueue.insert(make_song(0))
+        held, release = threading.Event(), threading.Event()
+
+        def write():
+            #a writer in the middle of its disk I/O
+            with self.uniQueue.lock:
+                held.set()
+                release.wait(5)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        held.wait()
+        reads = []
+        reader = threading.Thread(target=lambda: reads.append((self.uniQueue.snapshot(), release.is_set())))
+        reader.start()
+        reader.join(1)
+        release.set()
+        writer.join()
+        reader.join()
+
+        snapshot, waited = reads[0]
+        self.assertFalse(waited)
+        self.assertEqual([song.id for song in snapshot], [0])
+
+    def test_persistence_worker_fsyncs_the_journal(self):
+        for i in range(UniversalQueueDesign.FSYNC_BATCH):
+            self.uniQueue.insert(make_song(i))
+        #the request threads only flush, the worker fsyncs
+        self.assertIsNone(self.uniQueue.journal.fsync_every)
+        self.uniQueue.writer.stop()
+        self.assertEqual(self.uniQueue.journal.unsynced, 0)
+
+    def test_shutdown_unregisters_the_exit_hook(self):
+        with patch.object(UniversalQueueDesign, 'atexit') as hooks:
+            queue = UniversalQueueDesign.UniversalQueue(write_behind=True, spotify=FakeSpotifyInterface())
+            hooks.register.assert_called_once_with(queue.shutdown)
+            queue.shutdown()
+            hooks.unregister.assert_called_once_with(queue.shutdown)
+
+    def test_concurrent_inserts_get_unique_ids(self):
+        def submit(start):
+            for i in range(start, start + 100):
+                self.uniQueue.insert(make_song(i))
+
+        self.run_threads([lambda start=start: submit(start) for start in range(0, 800, 100)])
+
+        ids = [song.id for song in self.uniQueue.data]
+        self.assertEqual(len(ids), 800)
+        self.assertEqual(sorted(ids), list(range(800)))
+        self.assertEqual(self.uniQueue.idCount, 800)
+        self.assertEqual(self.uniQueue.version, 800)
+
+    def test_removes_race_with_inserts(self):
+        for i in range(400):
+            self.uniQueue.insert(make_song(i))
+        removed = []
+
+        def remove(ids):
+            for id in ids:
+                self.uniQueue.remove_from_queue(id, "host")
+                removed.append(id)
+
+        def submit():
+            for i in range(400, 800):
+                self.uniQueue.insert(make_song(i))
+
+        #the head is playing, everything behind it is removed from two threads at once
+        self.run_threads([lambda: remove(range(1, 400, 2)), lambda: remove(range(2, 400, 2)), submit])
+
+        self.assertEqual(len(removed), 399)
+        self.assertEqual([song.id for song in self.uniQueue.data], [0] + list(range(400, 800)))
+
+    def test_unpause_waits_for_a_pause_in_flight(self):
+        unpaused = threading.Event()
+        unpausing = threading.Thread(target=self.uniQueue.unpause_queue, args=("host",))
+        pause, unpause = self.spotify.pause, self.spotify.unpause
+
+        def slow_pause():
+            #the unpause arrives while spotify is still being paused
+            unpausing.start()
+            unpaused.wait(0.2)
+            return pause()
+
+        def tracked_unpause():
+            unpaused.set()
+            return unpause()
+
+        with patch.object(self.spotify, 'pause', slow_pause), patch.object(self.spotify, 'unpause', tracked_unpause):
+            self.uniQueue.pause_queue("host")
+            unpausing.join()
+
+        #the unpause ran last, so spotify and the scheduler are both playing
+        self.assertFalse(self.uniQueue.pause_toggle)
+        self.assertFalse(self.uniQueue.scheduler.paused)
+        self.assertTrue(self.spotify.state.is_playing)
+
+    def test_snapshot_reads_match_a_version(self):
+        stop = threading.Event()
+        torn = []
+
+        def read():
+            while not stop.is_set():
+                snapshot = self.uniQueue.snapshot()
+                #every insert adds one song, and nothing is removed in this test
+                if len(json.loads(snapshot.json)) != snapshot.version or len(snapshot) != snapshot.version:
+                    torn.append(snapshot.version)
+
+        def submit():
+            for i in range(300):
+                self.uniQueue.insert(make_song(i))
+            stop.set()
+
+        self.run_threads([read, read, submit])
+
+        self.assertEqual(torn, [])
+        self.assertEqual(self.uniQueue.snapshot().version, 300)
+
+    def test_journal_replays_the_final_queue(self):
+        def churn(seed):
+            generator = random.Random(seed)
+            for i in range(200):
+                self.uniQueue.insert(make_song(i))
+                queued = [song.id for song in self.uniQueue.data][1:]
+                if queued and generator.random() < 0.5:
+                    try:
+                        self.uniQueue.remove_from_queue(generator.choice(queued), "host")
+                    except ValueError:
+                        pass  #another thread removed it first
+
+        self.run_threads([lambda seed=seed: churn(seed) for seed in range(4)])
+        self.uniQueue.shutdown()
+
+        replayed = UniversalQueueDesign.QueueJournal().replay()
+        self.assertEqual([song["id"] for song in replayed["songs"]], [song.id for song in self.uniQueue.data])
+
+if __name__ == "__main__":
+    unittest.main()
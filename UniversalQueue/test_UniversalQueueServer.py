@@ -0,0 +1,164 @@
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import UniversalQueueDesign
+from fake_interface import FakeSpotifyInterface
+from fixtures import make_song
+
+class TestUniversalQueueServer(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        self.spotify = FakeSpotifyInterface()
+        self.uniQueue = UniversalQueueDesign.UniversalQueue(spotify=self.spotify)
+        self.app = UniversalQueueDesign.create_app(self.uniQueue, config={"LOCAL_IP": "10.0.0.2"})
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.uniQueue.shutdown()
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def test_request_update_is_conditional(self):
+        self.uniQueue.insert(make_song(0))
+        response = self.client.get('/request_update')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)[0]['submissionID'], 0)
+
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get('/request_update', headers={'If-None-Match': etag}).status_code, 304)
+
+        self.uniQueue.insert(make_song(1))
+        self.assertEqual(self.client.get('/request_update', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_recover_after_losing_the_tail_invalidates_etags(self):
+        queue = UniversalQueueDesign.UniversalQueue(persistence="journal", write_behind=False,
+                                                    spotify=FakeSpotifyInterface())
+        queue.insert(make_song(0))
+        #the log was folded into Write.json, which holds the version
+        queue.journal.compact(queue.persisted_state)
+        queue.insert(make_song(1))
+        app = UniversalQueueDesign.create_app(queue)
+        response = app.test_client().get('/request_update')
+        etag, old = response.headers['ETag'], queue.snapshot()
+        queue.shutdown()
+
+        #the crash took the last change with it
+        with open("Write.log") as log_file:
+            lines = log_file.readlines()
+        with open("Write.log", "w") as log_file:
+            log_file.writelines(lines[:-1])
+
+        recovered = UniversalQueueDesign.UniversalQueue(persistence="journal", write_behind=False,
+                                                        spotify=FakeSpotifyInterface()).recover(None)
+        self.addCleanup(recovered.shutdown)
+        self.assertEqual(len(recovered.snapshot()), 1)
+        #a different change may bring the version back to the one the website has
+        while recovered.snapshot().version < old.version:
+            recovered.insert(make_song(2))
+
+        client = UniversalQueueDesign.create_app(recovered).test_client()
+        response = client.get('/request_update', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(json.loads(response.data), json.loads(old.json))
+        changes = json.loads(recovered.changes_since(old.version, old.epoch))
+        self.assertTrue(changes['full'])
+
+    def test_each_app_has_the_routes(self):
+        second = UniversalQueueDesign.create_app(self.uniQueue)
+        self.assertIsNot(self.app, second)
+        rules = {rule.rule for rule in second.url_map.iter_rules()}
+        self.assertTrue({'/submit_song', '/request_update', '/queue_stream'} <= rules)
+        self.assertEqual(self.client.options('/request_update').headers['Access-Control-Allow-Origin'], '*')
+
+    def test_apps_serve_their_own_queue(self):
+        #a second application with a queue of its own, built from its config
+        other = UniversalQueueDesign.create_app(spotify=FakeSpotifyInterface(),
+                                                config={"PERSISTENCE": "file", "WRITE_BEHIND": False})
+        other_queue = other.extensions["universal_queue"]
+        self.addCleanup(other_queue.shutdown)
+        self.assertIsNot(other_queue, self.uniQueue)
+        self.assertIsNone(other_queue.journal)
+
+        self.uniQueue.insert(make_song(0))
+        self.assertEqual(len(json.loads(self.client.get('/request_update').data)), 1)
+        self.assertEqual(json.loads(other.test_client().get('/request_update').data), [])
+
+    def test_search_and_submit_through_the_injected_spotify(self):
+        results = self.client.get('/return_results?search_string=Queen').get_json()['search_string']['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.spotify.calls['search'], 1)
+        self.client.get('/return_results?search_string=queen')
+        self.assertEqual(self.spotify.calls['search'], 1)
+        self.assertEqual(self.client.get('/search_cache_stats').get_json()['hits'], 1)
+
+        self.client.post('/submit_song', json={'status': 200, 'search_results': results[0]})
+        self.assertEqual(self.uniQueue.snapshot().peek().uri, results[0]['uri'])
+
+    def test_search_as_you_type(self):
+        self.client.get('/return_results?search_string=taylor%20swi')
+        #the made up tracks are named after the query, so a shorter query matches them all
+        results = self.client.get('/return_results?search_string=taylor%20s').get_json()['search_string']['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.spotify.calls['search'], 1)
+        stats = self.client.get('/search_cache_stats').get_json()
+        self.assertEqual((stats['prefix_hits'], stats['shared']), (1, 0))
+
+    def test_verify_host_uses_the_configured_address(self):
+        host = self.client.get('/verify_host', environ_base={'REMOTE_ADDR': '10.0.0.2'}).get_json()
+        guest = self.client.get('/verify_host', environ_base={'REMOTE_ADDR': '10.0.0.3'}).get_json()
+        self.assertEqual(host, {"updateIsHost": True, "updateCookie": "host"})
+        self.assertFalse(guest["updateIsHost"])
+
+    def test_streams_leave_threads_for_the_other_routes(self):
+        import waitress
+        threads = UniversalQueueDesign.THREADS
+        server = waitress.create_server(self.app, host='127.0.0.1', port=0, threads=threads)
+        threading.Thread(target=server.run, daemon=True).start()
+        self.addCleanup(server.close)
+
+        streams = []
+        statuses = []
+        for i in range(threads + 1):
+            connection = http.client.HTTPConnection('127.0.0.1', server.effective_port, timeout=5)
+            self.addCleanup(connection.close)
+            connection.request('GET', '/queue_stream')
+            statuses.append(connection.getresponse().status)
+            streams.append(connection)
+
+        #websites past the cap are told to poll instead
+        self.assertEqual(statuses.count(200), UniversalQueueDesign.MAX_STREAMS)
+        self.assertEqual(statuses.count(204), threads + 1 - UniversalQueueDesign.MAX_STREAMS)
+
+        connection = http.client.HTTPConnection('127.0.0.1', server.effective_port, timeout=5)
+        self.addCleanup(connection.close)
+        connection.request('GET', '/request_update')
+        self.assertEqual(connection.getresponse().status, 200)
+
+        #closed streams give their place back, once a write finds the client gone
+        for connection in streams:
+            connection.close()
+        for i in range(100):
+            if len(self.uniQueue.broadcaster.subscribers) == 0:
+                break
+            self.uniQueue.insert(make_song(i))
+            threading.Event().wait(0.05)
+        self.assertEqual(len(self.uniQueue.broadcaster.subscribers), 0)
+
+    @patch('waitress.serve')
+    def test_serve_waitress(self, waitress_serve):
+        UniversalQueueDesign.serve(self.app, threads=8, port=9090)
+        waitress_serve.assert_called_once_with(self.app, host='0.0.0.0', port=9090, threads=8)
+
+    def test_serve_unknown_server(self):
+        with self.assertRaises(ValueError):
+            UniversalQueueDesign.serve(self.app, server='gunicorn')
+
+if __name__ == "__main__":
+    unittest.main()
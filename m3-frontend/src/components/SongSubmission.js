@@ -3,6 +3,9 @@ import axios from "axios";
 import debounce from "lodash.debounce";
 import "./SongSubmission.css";
 
+// searches go to the asyncio search server (UniversalQueue/async_server.py) when it is running
+const SEARCH_PORT = process.env.REACT_APP_SEARCH_PORT || 8080;
+
 /**
  * API Call to request a search for songs from the backend.
  * 
@@ -28,7 +31,7 @@ export async function searchSongs(searchbar_query) {
   try {
     const response = await axios.get(
 
-      `http://${process.env.REACT_APP_BACKEND_IP}:8080/return_results?search_string=${searchbar_query}`, {timeout: 5000}
+      `http://${process.env.REACT_APP_BACKEND_IP}:${SEARCH_PORT}/return_results?search_string=${searchbar_query}`, {timeout: 5000}
     );
 
     switch(response.data.search_string.status) {
@@ -24,6 +24,7 @@ const VERIFY_HOST_CALL = `http://${process.env.REACT_APP_BACKEND_IP}:8080/verify
 
 const REQUEST_QUEUE_CALL = `http://${process.env.REACT_APP_BACKEND_IP}:8080/request_update`
 const REQUEST_QUEUE_UPDATE_CALL = `http://${process.env.REACT_APP_BACKEND_IP}:8080/update_ui` //TODO, on backburner
+const QUEUE_STREAM_CALL = `http://${process.env.REACT_APP_BACKEND_IP}:8080/queue_stream`
 
 const DELETE_SONG_CALL = `http://${process.env.REACT_APP_BACKEND_IP}:8080/remove_song` 
 
@@ -111,15 +112,61 @@ async function requestQueue(updateQueueError, updateSongs) {
  * 										force the component to re-render)
  * @param {function} updateSongs The function from displayedQueue to change the data in
  * 									songs (and re-render the displayed queue)
+ * @param {function} stopped Returns true once polling should stop
  */
-async function autoCallRequestQueue(updateQueueError, updateSongs) {
+async function autoCallRequestQueue(updateQueueError, updateSongs, stopped = () => false) {
 	function sleep(ms) {return new Promise(resolve => setTimeout(resolve, ms))}
-	while (true) {
+	while (!stopped()) {
 		await sleep(QUEUE_POLLING_TIME)
 		requestQueue(updateQueueError, updateSongs)
 	}
 }
 
+/**
+ * Push updates - open a Server-Sent Events stream to the Universal Queue, which
+ * sends the whole queue once on connecting and again every time it changes.
+ * 
+ * Browsers without EventSource fall back to short polling, and so do websites the
+ * server turns away (204 No Content) because too many streams are open.
+ * 
+ * @param {function} updateQueueError The function to set a new error code (and
+ * 										force the component to re-render)
+ * @param {function} updateSongs The function from displayedQueue to change the data in
+ * 									songs (and re-render the displayed queue)
+ * 
+ * @return {function} A function that closes the stream
+ */
+function subscribeToQueue(updateQueueError, updateSongs) {
+	let closed = false
+	const stopped = () => closed
+
+	if (typeof EventSource === "undefined") {
+		autoCallRequestQueue(updateQueueError, updateSongs, stopped)
+		return () => {closed = true}
+	}
+
+	const stream = new EventSource(QUEUE_STREAM_CALL);
+
+	stream.onmessage = (event) => {
+		updateSongs(JSON.parse(event.data));
+		updateQueueError(0) // all is well
+	}
+
+	// EventSource reconnects by itself, and the server resends the queue on reconnect.
+	// It gives up when the server turns the stream away, then the queue is polled,
+	// which reports an error if the server is down
+	stream.onerror = () => {
+		if (stream.readyState === EventSource.CLOSED && !closed) {
+			autoCallRequestQueue(updateQueueError, updateSongs, stopped)
+		}
+	}
+
+	return () => {
+		closed = true
+		stream.close()
+	}
+}
+
 /**
  * Sends a request to the Universal Queue to notify this website instance of any
  * changes to the queue. If it gets a response, immedaitely set the displayed
@@ -446,11 +493,10 @@ function DisplayedQueue() {
 	}, [])
 
 	
-	// On startup, start an async function to request any updates to the queue
+	// On startup, subscribe to any updates to the queue
 	useEffect( () => {
-		// TEMP - long polling won't work on backend, so just short polling
 		// requestQueueUpdates(updateQueueError, updateSongs)
-		autoCallRequestQueue(updateQueueError, updateSongs)
+		return subscribeToQueue(updateQueueError, updateSongs)
 	}, [])
 
 	/* When queueError changes (aka using useEffect({},[queueError])),
@@ -546,6 +592,6 @@ function DisplayedQueue() {
 export default DisplayedQueue;
 
 // For testing only
-export {requestQueue, requestQueueUpdates};
+export {requestQueue, requestQueueUpdates, subscribeToQueue};
 export {Song};
-export {VERIFY_HOST_CALL, REQUEST_QUEUE_CALL, REQUEST_QUEUE_UPDATE_CALL};
+export {VERIFY_HOST_CALL, REQUEST_QUEUE_CALL, REQUEST_QUEUE_UPDATE_CALL, QUEUE_STREAM_CALL};
@@ -109,6 +109,7 @@ class Server:
         """
         try:
             import UniversalQueueDesign
+            UniversalQueueDesign.main()
         except Exception as e:
             logging.error("Failed to start backend: %s", str(e))
             exit()
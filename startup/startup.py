@@ -109,10 +109,11 @@ class startup:
         """
         returns True if the user's Spotify account is premium, False otherwise
         """
-        # the import is inside the function because spotify_interface_class fails if config file was not set-up
+        # the import is inside the function because the backend isn't on the path until startup runs.
+        # The check only needs the account, the backend reuses this client and finds the device later
         try:
             import spotify_interface_class
-            spotify_interface = spotify_interface_class.Spotify_Interface_Class()
+            spotify_interface = spotify_interface_class.get_shared_interface()
             cur_user = spotify_interface.get_current_user_info()
             if cur_user.product == 'premium':
                 logging.info("The user account is premium")